@@ -0,0 +1,17 @@
+#!/bin/bash
+
+# Entrypoint of the etl-agent image: start the warm runner on loopback, then
+# the Prefect worker. Deployment runs reach the runner through the
+# `python -m src.utils.warm_runner flow-run` command set in prefect.yaml, and
+# start cold when the runner is not up.
+
+# The runner only accepts clients holding the key; generate one per container
+# unless it is provided. The worker passes it on to the flow-run commands.
+if [ -z "$WARM_RUNNER_AUTHKEY" ]; then
+    WARM_RUNNER_AUTHKEY=$(python -c "import secrets; print(secrets.token_hex(32))")
+fi
+export WARM_RUNNER_AUTHKEY
+
+python -m src.utils.warm_runner --host 127.0.0.1 serve --pool-size "${WARM_RUNNER_POOL_SIZE:-2}" &
+
+exec prefect worker start --pool default-agent-pool
@@ -0,0 +1,47 @@
+/*
+
+usage (from .../cbor/ directory):
+mysql -u borarchAdmin -pkBu9pjz2vi < ./script/init/10.ddl-borarch-holdweb-agg.sql
+
+run on the docker bor-db container:
+cat ./script/init/10.ddl-borarch-holdweb-agg.sql | docker exec -i bor-db mysql -u borAllAdmin -pkBu9pjz2vi borarch
+
+Materialized holdings aggregates by fund x dimension (sector, currency).
+
+Maintained by ImportWebHoldWorkflow after each load (see src/utils/holdings_aggregates.py):
+the (date, fund_name) slices of the loaded file are rebuilt from all of their holdweb rows,
+the rest of the table is not touched. Reads go through the primary key:
+    SELECT * FROM borarch.holdweb_agg
+    WHERE dimension = 'sector' AND fund_name = 'PFCM bal' AND date = '2024-12-31';
+
+Off by default: apply this script before passing maintain_aggregates=true to the flows, or
+the refresh fails after the load.
+
+holdweb has no asset type column, so there is no fund x asset type aggregate yet; add the
+column to holdweb and the dimension to AGGREGATE_DIMENSIONS to get one.
+
+yyyymmdd   user          description
+--------   ------------  ------------------------------------------------------------
+20261019   RMenning      added holdweb_agg
+20261019   RMenning      refresh only the loaded slices, deduplicated
+20261019   RMenning      count every holdweb row, holdweb is truncated before the load
+20261019   RMenning      maintain_aggregates is off in the deployments until this is applied
+
+*/
+
+use borarch;
+
+DROP TABLE IF EXISTS holdweb_agg;
+CREATE TABLE holdweb_agg (
+    dimension VARCHAR(32) NOT NULL,
+    fund_name VARCHAR(128) NOT NULL,
+    date DATE NOT NULL,
+    dim_value VARCHAR(255) NOT NULL,
+    positions INT NOT NULL,
+    units DECIMAL(25,6),
+    cost DECIMAL(25,6),
+    mv DECIMAL(25,6),
+    weight DECIMAL(13,10),
+    PRIMARY KEY (dimension, fund_name, date, dim_value),
+    KEY idx_holdweb_agg_date (date)
+);
@@ -0,0 +1,54 @@
+/*
+
+usage (from .../cbor/ directory):
+mysql -u bormetaAdmin -pkBu9pjz2vi < ./script/init/11.ddl-bormeta-ingest-latency.sql
+
+run on the docker bor-db container:
+cat ./script/init/11.ddl-bormeta-ingest-latency.sql | docker exec -i bor-db mysql -u borAllAdmin -pkBu9pjz2vi bormeta
+
+Arrival-to-publish latency history of the ingestion workflows.
+
+One row per input file per run, written by BaseIngestionWorkflow (and the daily ingestion DAG)
+when the run ends (see src/utils/latency.py). arrived_at is when the file landed in
+ftpetl/incoming (its mtime/ctime); every phase is stamped against it:
+    queue_ms      arrival -> the run picked the file up
+    load_ms       LOAD DATA into the staging table
+    post_load_ms  reconciliation and the after_load hook (history, aggregates)
+    procedure_ms  stored procedure
+    total_ms      arrival -> published (procedure finished), the number the SLO is on
+slo_ms is the SLO in force for the workflow at the time of the run. A rerun of an unchanged file
+(same file_name and arrived_at as a successful row) is not recorded again.
+
+Off by default: pass track_latency=true to the flows once this table exists.
+
+Report p50/p95/p99 per workflow and the runs over their SLO with
+    PYTHONPATH=. python -m src.utils.latency report --days 30
+
+yyyymmdd   user          description
+--------   ------------  ------------------------------------------------------------
+20261019   RMenning      added ingest_latency
+20261019   RMenning      added idx_ingest_latency_file for the rerun check
+
+*/
+
+use bormeta;
+
+DROP TABLE IF EXISTS ingest_latency;
+CREATE TABLE ingest_latency (
+    id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+    workflow VARCHAR(64) NOT NULL,
+    target_table VARCHAR(128) NOT NULL,
+    file_name VARCHAR(255) NOT NULL,
+    arrived_at DATETIME(3) NOT NULL,
+    published_at DATETIME(3) NOT NULL,
+    queue_ms INT UNSIGNED NOT NULL,
+    load_ms INT UNSIGNED NOT NULL,
+    post_load_ms INT UNSIGNED NOT NULL,
+    procedure_ms INT UNSIGNED NOT NULL,
+    total_ms INT UNSIGNED NOT NULL,
+    slo_ms INT UNSIGNED,
+    success TINYINT(1) NOT NULL,
+    PRIMARY KEY (id),
+    KEY idx_ingest_latency_published (published_at, workflow),
+    KEY idx_ingest_latency_file (file_name, arrived_at)
+);
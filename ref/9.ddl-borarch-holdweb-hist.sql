@@ -0,0 +1,56 @@
+/*
+
+usage (from .../cbor/ directory):
+mysql -u borarchAdmin -pkBu9pjz2vi < ./script/init/9.ddl-borarch-holdweb-hist.sql
+
+run on the docker bor-db container:
+cat ./script/init/9.ddl-borarch-holdweb-hist.sql | docker exec -i bor-db mysql -u borAllAdmin -pkBu9pjz2vi borarch
+
+Date-partitioned holdings history.
+
+holdweb is truncated on every load, so it only ever holds the latest file. holdweb_hist keeps
+one LIST partition per holdings date. A new file is published by loading holdweb_xchg (same
+columns, not partitioned) and swapping it in with
+    ALTER TABLE holdweb_hist EXCHANGE PARTITION p20241231 WITH TABLE holdweb_xchg;
+which costs O(file) regardless of how much history is kept. Partitions are named pYYYYMMDD
+and added by the workflow on first use (see src/utils/partition_exchange.py).
+
+As-of-date queries prune to a single partition:
+    SELECT * FROM borarch.holdweb_hist WHERE date = '2024-12-31' AND fund_name = 'PFCM bal';
+    EXPLAIN shows partitions: p20241231
+
+Columns follow ImportWebHoldWorkflow.field_mappings.
+
+Off by default: apply this script before passing publish_history=true to the flows, or the
+publish step fails in partition_exchange.
+
+yyyymmdd   user          description
+--------   ------------  ------------------------------------------------------------
+20261019   RMenning      added holdweb_hist and holdweb_xchg
+20261019   RMenning      publish_history is off in the deployments until this is applied
+
+*/
+
+use borarch;
+
+DROP TABLE IF EXISTS holdweb_hist;
+CREATE TABLE holdweb_hist (
+    date DATE NOT NULL,
+    fund_name VARCHAR(128) NOT NULL,
+    sec_name VARCHAR(255) NOT NULL,
+    sector VARCHAR(255) NOT NULL,
+    currency VARCHAR(8),
+    units DECIMAL(21,6),
+    cost DECIMAL(21,6),
+    mv DECIMAL(21,6),
+    KEY idx_holdweb_hist_fund_sec (fund_name, sec_name)
+)
+PARTITION BY LIST (TO_DAYS(date)) (
+    -- placeholder, LIST partitioning needs at least one partition
+    PARTITION p00000000 VALUES IN (0)
+);
+
+-- exchange table: identical structure without partitioning
+DROP TABLE IF EXISTS holdweb_xchg;
+CREATE TABLE holdweb_xchg LIKE holdweb_hist;
+ALTER TABLE holdweb_xchg REMOVE PARTITIONING;
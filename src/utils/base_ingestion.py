@@ -22,21 +22,86 @@ Base ingestion workflow with parameterized file loading functionality.
 
 from typing import Dict, Any, Optional, List
 from pathlib import Path
-import mysql.connector
 from prefect import flow, task
 from prefect.tasks import task_input_hash
-from datetime import timedelta
+from datetime import datetime, timedelta
 
 from .base_workflow import BaseWorkflow
+from .file_coalescing import coalesce_files, archive_files
+from .load_planner import plan_load, format_plan, sample_file, COST_MODEL_CALIBRATED
+from .file_profiler import profile_input_file, check_load_parameters
+from .progress_monitor import ProgressMonitor, DEFAULT_INTERVAL
+from .tracing import span, open_span, file_size
+from .result_streaming import ResultHandler, ArrowFileSink
+from .db_backend import get_backend, SQLiteBackend
+from .columnar_input import columnar_format, columnar_row_count
+from .latency import LatencyTracker, record_latency, file_arrival_time, DEFAULT_LATENCY_SLO
+from .reconciliation import (
+    ReconciliationError,
+    FileControlTotals,
+    table_control_totals,
+    compare_control_totals
+)
+from .index_management import (
+    DeferredIndexError,
+    get_secondary_indexes,
+    get_foreign_keys,
+    has_unique_indexes,
+    drop_secondary_indexes,
+    rebuild_indexes,
+    restore_indexes,
+    find_unique_violations,
+    find_foreign_key_violations
+)
 
 @task(cache_key_fn=task_input_hash, cache_expiration=timedelta(hours=1))
 def check_file_exists(file_path: str) -> bool:
     """Check if file exists in the shared volume."""
-    if file_path.startswith("/var/lib/mysql-files/"):
-        # Optionally, check via MySQL if needed
-        return True  # Assume file is present for MySQL server
-    else:
-        return Path(file_path).exists()
+    with span("check_file_exists", file=file_path):
+        if file_path.startswith("/var/lib/mysql-files/"):
+            # Optionally, check via MySQL if needed
+            return True  # Assume file is present for MySQL server
+        else:
+            return Path(file_path).exists()
+
+def build_load_query(
+    file_path: str,
+    target_table: str,
+    field_mappings: Dict[str, str],
+    field_transformations: Optional[Dict[str, str]] = None,
+    delimiter: str = ',',
+    quote_char: str = '"',
+    line_terminator: str = '\n',
+    skip_lines: int = 1,
+    local: bool = False
+) -> str:
+    """Build the LOAD DATA [LOCAL] INFILE statement for a delimited file."""
+    # Build field list and transformations
+    fields = []
+    transformations = []
+    
+    for source_field, target_field in field_mappings.items():
+        if field_transformations and source_field in field_transformations:
+            fields.append(f"@{source_field}")
+            transformations.append(f"{target_field} = {field_transformations[source_field]}")
+        else:
+            fields.append(target_field)
+    
+    # Build LOAD DATA INFILE command
+    load_query = f"""
+    LOAD DATA {'LOCAL ' if local else ''}INFILE '{file_path}'
+    INTO TABLE {target_table}
+    FIELDS TERMINATED BY '{delimiter}'
+    ENCLOSED BY '{quote_char}'
+    LINES TERMINATED BY '{line_terminator}'
+    IGNORE {skip_lines} LINES
+    ({', '.join(fields)})
+    """
+    
+    if transformations:
+        load_query += f"\nSET {', '.join(transformations)}"
+    
+    return load_query
 
 @task(retries=3, retry_delay_seconds=60)
 def load_data_to_staging(
@@ -49,12 +114,31 @@ def load_data_to_staging(
     quote_char: str = '"',
     line_terminator: str = '\n',
     skip_lines: int = 1,
-    truncate_before_load: bool = False
+    truncate_before_load: bool = False,
+    deferred_indexes: bool = False,
+    progress_interval: Optional[float] = None,
+    stall_timeout: Optional[float] = None,
+    expected_rows: Optional[int] = None
 ) -> bool:
     """
     Load data from file into staging table using LOAD DATA INFILE.
     Optionally truncate the table before loading.
     
+    Parquet and Arrow files (see columnar_input.py) are streamed through
+    LOAD DATA LOCAL INFILE one row group at a time; delimiter, quote_char,
+    line_terminator and skip_lines only apply to delimited files.
+    
+    With deferred_indexes, secondary and unique indexes are dropped before the
+    load and rebuilt in one ALTER TABLE afterwards. unique_checks (and
+    foreign_key_checks when the table has foreign keys) are relaxed for the
+    session; unique keys and foreign keys are validated before commit and the
+    load is rolled back with a violation report if they do not hold.
+    
+    With progress_interval, a ProgressMonitor logs rows/sec and ETA while
+    LOAD DATA runs and, with stall_timeout, kills a load that stops making
+    progress (see progress_monitor.py). A stall_timeout alone starts the
+    monitor at DEFAULT_INTERVAL.
+    
     Args:
         file_path: Path to the input file
         db_config: Database connection configuration
@@ -66,86 +150,220 @@ def load_data_to_staging(
         line_terminator: Line terminator character
         skip_lines: Number of header lines to skip
         truncate_before_load: Boolean indicating whether to truncate the table before loading
+        deferred_indexes: Boolean indicating whether to build secondary indexes after the load
+        progress_interval: Optional seconds between progress heartbeats
+        stall_timeout: Optional seconds without progress before the load is killed
+        expected_rows: Optional expected row count, used for the ETA
     """
+    backend = get_backend(db_config)
+    columnar = columnar_format(file_path) is not None
+    if deferred_indexes and not backend.supports_deferred_indexes:
+        print(f"Deferred indexes are not supported by the {backend.name} backend, loading with indexes")
+        deferred_indexes = False
+    if stall_timeout and not progress_interval:
+        # The stall timeout is enforced by the monitor
+        progress_interval = DEFAULT_INTERVAL
+    if not backend.supports_progress_monitor:
+        progress_interval = None
+    indexes = []
+    indexes_dropped = False
+    task_span = open_span(
+        "load_data_to_staging", file=file_path, table=target_table, bytes=file_size(file_path),
+        truncate=truncate_before_load, deferred_indexes=deferred_indexes
+    )
     try:
-        conn = mysql.connector.connect(**db_config)
+        with span("connect", host=db_config.get("host"), backend=backend.name):
+            conn = backend.connect(local_infile=columnar)
         cursor = conn.cursor()
         if truncate_before_load:
-            cursor.execute(f"TRUNCATE TABLE {target_table}")
-        # Build field list and transformations
-        fields = []
-        transformations = []
-        
-        for source_field, target_field in field_mappings.items():
-            if field_transformations and source_field in field_transformations:
-                fields.append(f"@{source_field}")
-                transformations.append(f"{target_field} = {field_transformations[source_field]}")
+            with span("truncate", table=target_table):
+                backend.truncate(cursor, target_table)
+        if deferred_indexes:
+            with span("drop_secondary_indexes", table=target_table) as s:
+                indexes = get_secondary_indexes(cursor, target_table)
+                foreign_keys = get_foreign_keys(cursor, target_table)
+                # Set before the DDL: ALTER TABLE commits implicitly, so from here
+                # on the indexes must be put back whatever happens
+                indexes_dropped = True
+                drop_secondary_indexes(cursor, target_table, indexes)
+                s.set(indexes=len(indexes))
+            # A unique index that could not be dropped must still be checked row by row
+            if not has_unique_indexes(cursor, target_table):
+                cursor.execute("SET SESSION unique_checks = 0")
+            if foreign_keys:
+                cursor.execute("SET SESSION foreign_key_checks = 0")
+        load_args = {
+            "file_path": file_path,
+            "target_table": target_table,
+            "field_mappings": field_mappings,
+            "field_transformations": field_transformations
+        }
+        if columnar:
+            load = backend.load_columnar
+        else:
+            load = backend.load_file
+            load_args.update(
+                delimiter=delimiter, quote_char=quote_char, line_terminator=line_terminator, skip_lines=skip_lines
+            )
+        with span("load_data", file=file_path, table=target_table, columnar=columnar) as s:
+            if progress_interval:
+                with ProgressMonitor(
+                    db_config,
+                    conn.connection_id,
+                    f"LOAD {target_table}",
+                    expected_rows=expected_rows,
+                    interval=progress_interval,
+                    stall_timeout=stall_timeout
+                ) as monitor:
+                    if columnar:
+                        # Report the text fed into the pipe; the file size is not comparable
+                        load_args["on_feeder"] = lambda feeder: setattr(
+                            monitor, "bytes_source", lambda: feeder.bytes_written
+                        )
+                    try:
+                        rows = load(cursor, **load_args)
+                    except Exception:
+                        if monitor.killed:
+                            print(f"Load into {target_table} killed after {stall_timeout}s without progress")
+                        raise
             else:
-                fields.append(target_field)
-        
-        # Build LOAD DATA INFILE command
-        load_query = f"""
-        LOAD DATA INFILE '{file_path}'
-        INTO TABLE {target_table}
-        FIELDS TERMINATED BY '{delimiter}'
-        ENCLOSED BY '{quote_char}'
-        LINES TERMINATED BY '{line_terminator}'
-        IGNORE {skip_lines} LINES
-        ({', '.join(fields)})
-        """
+                rows = load(cursor, **load_args)
+            s.set(rows=rows)
+        task_span.set(rows=rows)
+        if deferred_indexes:
+            with span("validate_keys", table=target_table) as s:
+                violations = find_unique_violations(cursor, target_table, indexes)
+                violations += find_foreign_key_violations(cursor, target_table, foreign_keys)
+                s.set(violations=len(violations))
+            if violations:
+                raise DeferredIndexError(target_table, violations)
+        with span("commit"):
+            conn.commit()
         
-        if transformations:
-            load_query += f"\nSET {', '.join(transformations)}"
-        
-        cursor.execute(load_query)
-        conn.commit()
+        if indexes_dropped:
+            cursor.execute("SET SESSION unique_checks = 1")
+            cursor.execute("SET SESSION foreign_key_checks = 1")
+            with span("rebuild_indexes", table=target_table, indexes=len(indexes)):
+                rebuild_indexes(cursor, target_table, indexes)
+            indexes_dropped = False
         
         return True
     except Exception as e:
+        task_span.set(error=str(e))
         print(f"Error loading data: {str(e)}")
         return False
     finally:
+        if indexes_dropped:
+            # Roll back an uncommitted load and put the table back the way it was
+            put_back_indexes(backend, conn, cursor, target_table, indexes)
         if 'cursor' in locals():
             cursor.close()
         if 'conn' in locals():
             conn.close()
+        task_span.end()
+
+def put_back_indexes(backend, conn, cursor, target_table: str, indexes: List[Dict[str, Any]]) -> None:
+    """Re-create the dropped indexes that are missing, on a new connection if the load's is gone."""
+    try:
+        conn.rollback()
+        cursor.execute("SET SESSION unique_checks = 1")
+        cursor.execute("SET SESSION foreign_key_checks = 1")
+        with span("rebuild_indexes", table=target_table, indexes=len(indexes)):
+            restore_indexes(cursor, target_table, indexes)
+        return
+    except Exception as e:
+        print(f"Error rebuilding indexes on {target_table}, retrying on a new connection: {str(e)}")
+    try:
+        retry_conn = backend.connect()
+        retry_cursor = retry_conn.cursor()
+        restore_indexes(retry_cursor, target_table, indexes)
+    except Exception as e:
+        names = ", ".join(index["name"] for index in indexes)
+        print(f"Error rebuilding indexes {names} on {target_table}, re-create them by hand: {str(e)}")
+    finally:
+        if 'retry_cursor' in locals():
+            retry_cursor.close()
+        if 'retry_conn' in locals():
+            retry_conn.close()
+
 
 @task(retries=3, retry_delay_seconds=60)
 def execute_stored_procedure(
     db_config: dict,
     procedure_name: str,
-    procedure_params: Optional[Dict[str, Any]] = None
+    procedure_params: Optional[Dict[str, Any]] = None,
+    result_handler: Optional[ResultHandler] = None,
+    result_batch_size: int = 10000,
+    progress_interval: Optional[float] = None,
+    stall_timeout: Optional[float] = None
 ) -> bool:
     """
     Execute a stored procedure for data processing.
     
+    Without a result_handler the procedure is run with callproc and its result
+    sets are discarded. With one, the result sets are read through an
+    unbuffered cursor and passed to the handler in batches of
+    result_batch_size rows (see result_streaming.py).
+    
+    With progress_interval, a ProgressMonitor reports the rows modified by the
+    procedure and its current statement. With stall_timeout, a call whose rows
+    and current statement have not changed for that long is killed.
+    
     Args:
         db_config: Database connection configuration
         procedure_name: Name of the stored procedure (format: database.procedure)
         procedure_params: Optional dictionary of procedure parameters
+        result_handler: Optional callable receiving (result_index, columns, rows)
+        result_batch_size: Number of rows per result batch
+        progress_interval: Optional seconds between progress heartbeats
+        stall_timeout: Optional seconds without progress before the call is killed
     """
+    backend = get_backend(db_config)
+    monitor = None
+    if stall_timeout and not progress_interval:
+        progress_interval = DEFAULT_INTERVAL
+    task_span = open_span("execute_stored_procedure", procedure=procedure_name, streamed=bool(result_handler))
     try:
-        conn = mysql.connector.connect(**db_config)
+        with span("connect", host=db_config.get("host"), backend=backend.name):
+            conn = backend.connect()
         cursor = conn.cursor()
+        if progress_interval and backend.supports_progress_monitor:
+            monitor = ProgressMonitor(
+                db_config,
+                conn.connection_id,
+                f"CALL {procedure_name}",
+                interval=progress_interval,
+                stall_timeout=stall_timeout
+            )
+            monitor.start()
         
-        if procedure_params:
-            # Build parameter list for procedure call
-            param_names = list(procedure_params.keys())
-            param_values = list(procedure_params.values())
-            cursor.callproc(procedure_name, param_values)
-        else:
-            cursor.callproc(procedure_name)
+        row_counts = backend.call_procedure(
+            conn,
+            procedure_name,
+            procedure_params,
+            result_handler=result_handler,
+            batch_size=result_batch_size
+        )
+        if result_handler:
+            print(f"Streamed result sets from {procedure_name}: {row_counts} rows")
+            task_span.set(rows=sum(row_counts or []), result_sets=len(row_counts or []))
             
         conn.commit()
         return True
     except Exception as e:
+        task_span.set(error=str(e))
+        if monitor and monitor.killed:
+            print(f"Procedure {procedure_name} killed after {stall_timeout}s without progress")
         print(f"Error executing stored procedure: {str(e)}")
         return False
     finally:
+        if monitor:
+            monitor.stop()
         if 'cursor' in locals():
             cursor.close()
         if 'conn' in locals():
             conn.close()
+        task_span.end()
 
 class BaseIngestionWorkflow(BaseWorkflow):
     """Base class for file ingestion workflows."""
@@ -158,7 +376,17 @@ class BaseIngestionWorkflow(BaseWorkflow):
         field_transformations: Optional[Dict[str, str]] = None,
         procedure_name: Optional[str] = None,
         procedure_params: Optional[Dict[str, Any]] = None,
-        truncate_before_load: bool = False
+        truncate_before_load: bool = False,
+        deferred_indexes: bool = False,
+        result_handler: Optional[ResultHandler] = None,
+        auto_plan: bool = False,
+        profile_input: bool = False,
+        progress_interval: Optional[float] = None,
+        stall_timeout: Optional[float] = None,
+        control_totals: Optional[Dict[str, Any]] = None,
+        reconcile: bool = False,
+        track_latency: bool = False,
+        latency_slo: Optional[float] = DEFAULT_LATENCY_SLO
     ):
         super().__init__(name)
         self.target_table = target_table
@@ -167,6 +395,274 @@ class BaseIngestionWorkflow(BaseWorkflow):
         self.procedure_name = procedure_name
         self.procedure_params = procedure_params
         self.truncate_before_load = truncate_before_load
+        self.deferred_indexes = deferred_indexes
+        self.result_handler = result_handler
+        self.auto_plan = auto_plan
+        self.profile_input = profile_input
+        self.progress_interval = progress_interval
+        self.stall_timeout = stall_timeout
+        # Control totals checked after the load, see reconciliation.py
+        self.control_totals = control_totals
+        self.reconcile = reconcile
+        # Arrival-to-publish latency history and its SLO in seconds, see latency.py
+        self.track_latency = track_latency
+        self.latency_slo = latency_slo
+        
+    def build_db_config(
+        self,
+        db_host: str,
+        db_port: str,
+        db_user: str,
+        db_password: str,
+        db_name: str
+    ) -> Dict[str, Any]:
+        """Build the database connection configuration from flow parameters."""
+        if db_host.startswith("sqlite:"):
+            # Offline runs against the embedded backend, see db_backend.py
+            return {"backend": SQLiteBackend.from_url(db_host)}
+        return {
+            "host": db_host,
+            "port": int(db_port),
+            "user": db_user,
+            "password": db_password,
+            "database": db_name
+        }
+        
+    def check_backend(self, db_config: Dict[str, Any]) -> None:
+        """
+        Fail before loading anything if the workflow's options need features the backend lacks.
+        
+        Subclasses with backend-specific follow-up work (see after_load) override this.
+        """
+        pass
+        
+    def resolve_truncate(self, truncate_before_load: Optional[bool]) -> bool:
+        """Resolve the truncate flag, falling back to the workflow default."""
+        # Defensive cast for truncate_before_load
+        if isinstance(truncate_before_load, str):
+            truncate_before_load = truncate_before_load.lower() == "true"
+        if truncate_before_load is None:
+            truncate_before_load = self.truncate_before_load
+        return truncate_before_load
+        
+    def resolve_flag(self, value: Optional[bool], default: bool) -> bool:
+        """Resolve a boolean flow parameter that may arrive as a string or None."""
+        if isinstance(value, str):
+            value = value.lower() == "true"
+        if value is None:
+            value = default
+        return value
+        
+    def resolve_deferred_indexes(self, deferred_indexes: Optional[bool]) -> bool:
+        """Resolve the deferred index flag, falling back to the workflow default."""
+        return self.resolve_flag(deferred_indexes, self.deferred_indexes)
+        
+    def get_result_handler(
+        self,
+        result_output_dir: Optional[str],
+        result_format: str = "parquet"
+    ) -> Optional[ResultHandler]:
+        """Return the handler for procedure result sets, if any."""
+        if self.result_handler:
+            return self.result_handler
+        if result_output_dir:
+            prefix = f"{self.procedure_name.split('.')[-1]}-{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            return ArrowFileSink(result_output_dir, prefix, file_format=result_format)
+        return None
+        
+    def resolve_progress(
+        self,
+        progress_interval: Optional[float],
+        stall_timeout: Optional[float]
+    ) -> tuple:
+        """Resolve the progress heartbeat settings, falling back to the workflow defaults."""
+        if progress_interval is None:
+            progress_interval = self.progress_interval
+        if stall_timeout is None:
+            stall_timeout = self.stall_timeout
+        return (float(progress_interval) if progress_interval else None,
+                float(stall_timeout) if stall_timeout else None)
+        
+    def expected_rows(
+        self,
+        file_path: str,
+        profile: Optional[Dict[str, Any]],
+        plan: Optional[Dict[str, Any]],
+        delimiter: str,
+        line_terminator: str,
+        skip_lines: int
+    ) -> Optional[int]:
+        """Best available row count of the input file, for the progress ETA."""
+        if columnar_format(file_path) and Path(file_path).exists():
+            return columnar_row_count(file_path)
+        if profile and profile["records"]:
+            return max(profile["records"] - skip_lines, 0)
+        if plan:
+            return plan["file_stats"]["estimated_rows"]
+        file_stats = sample_file(file_path, delimiter, line_terminator, skip_lines)
+        return file_stats["estimated_rows"] if file_stats else None
+        
+    def check_input_profile(
+        self,
+        file_path: str,
+        delimiter: str,
+        quote_char: str,
+        line_terminator: str,
+        skip_lines: int,
+        file_totals: Optional[FileControlTotals] = None
+    ) -> Dict[str, Any]:
+        """
+        Profile the input file and raise if the load parameters do not match it.
+
+        With file_totals, the control totals of the file are filled in the same scan.
+        """
+        # Nothing in the workflow reads the row index, so none is written
+        profile = profile_input_file(
+            file_path,
+            quote_char=quote_char,
+            build_index=False,
+            on_records=file_totals.feed if file_totals is not None else None
+        )
+        if not profile["records"]:
+            self.logger.warning(f"Input file is empty: {file_path}")
+            return profile
+        self.logger.info(
+            f"Input profile: {profile['records']} records on {profile['lines']} lines, {profile['encoding']}, "
+            f"terminator {profile['line_terminator']!r}, delimiter {profile['delimiter']!r}, "
+            f"{profile['fields']} fields, header={profile['has_header']}"
+        )
+        issues = check_load_parameters(profile, delimiter, quote_char, line_terminator, skip_lines)
+        for warning in issues["warnings"]:
+            self.logger.warning(f"Input profile: {warning}")
+        if issues["errors"]:
+            raise ValueError(f"Load parameters do not match {file_path}: {'; '.join(issues['errors'])}")
+        return profile
+        
+    def start_control_totals(
+        self,
+        file_path: str,
+        load_options: Dict[str, Any],
+        truncate_before_load: bool
+    ) -> Optional[FileControlTotals]:
+        """Control totals for the input scan to fill, or None if the load cannot be reconciled."""
+        if not self.control_totals:
+            self.logger.warning(f"No control totals defined for {self.target_table}, not reconciled")
+            return None
+        if not truncate_before_load:
+            self.logger.warning(f"{self.target_table} is not truncated before the load, not reconciled")
+            return None
+        if not Path(file_path).exists():
+            self.logger.warning(f"Cannot read {file_path} from this process, not reconciled")
+            return None
+        if columnar_format(file_path):
+            self.logger.warning(f"Control totals are only computed for delimited files, {file_path} not reconciled")
+            return None
+        return FileControlTotals(
+            file_path,
+            self.field_mappings,
+            self.control_totals,
+            field_transformations=self.field_transformations,
+            **load_options
+        )
+        
+    def scan_control_totals(
+        self,
+        file_path: str,
+        load_options: Dict[str, Any],
+        truncate_before_load: bool
+    ) -> Optional[FileControlTotals]:
+        """Fill the control totals of a file with a profiler scan, when profile_input has not done it."""
+        file_totals = self.start_control_totals(file_path, load_options, truncate_before_load)
+        if file_totals is not None:
+            with span("control_totals", file=file_path):
+                profile_input_file(
+                    file_path,
+                    quote_char=load_options["quote_char"],
+                    build_index=False,
+                    on_records=file_totals.feed
+                )
+        return file_totals
+        
+    def check_control_totals(
+        self,
+        db_config: Dict[str, Any],
+        file_totals: FileControlTotals
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Reconcile the loaded table with the control totals of its file; raise ReconciliationError on a mismatch.
+
+        Returns None, with a warning, if the file could not be decoded for its totals.
+        """
+        if file_totals.unreadable:
+            self.logger.warning(f"Control totals of {file_totals.file_path} not built, {file_totals.unreadable}; not reconciled")
+            return None
+        backend = get_backend(db_config)
+        try:
+            conn = backend.connect()
+            cursor = conn.cursor()
+            table_totals = table_control_totals(cursor, self.target_table, self.control_totals)
+        finally:
+            if 'cursor' in locals():
+                cursor.close()
+            if 'conn' in locals():
+                conn.close()
+        
+        totals = file_totals.result()
+        differences = compare_control_totals(totals, table_totals, self.control_totals.get("group_by"))
+        if differences:
+            raise ReconciliationError(self.target_table, differences)
+        self.logger.info(
+            f"Reconciled {self.target_table} with {file_totals.file_path}: {totals['rows']} rows, "
+            f"{len(totals['groups'])} groups"
+        )
+        return totals
+        
+    def record_run_latency(
+        self,
+        db_config: Dict[str, Any],
+        tracker: LatencyTracker,
+        success: bool,
+        published: Optional[float] = None
+    ) -> None:
+        """Write the latency rows of a run; a failed write is logged, not raised."""
+        records = tracker.records(success, published)
+        recorded = record_latency(db_config=db_config, records=records)
+        if recorded is None:
+            self.logger.warning(f"Could not record the latency of {self.name}")
+            return
+        written = {record["file_name"] for record in recorded}
+        for record in records:
+            if record["file_name"] not in written:
+                self.logger.info(
+                    f"{record['file_name']} was already published with this arrival time, latency not recorded again"
+                )
+        records = recorded
+        label = "Arrival-to-publish latency" if success else "Time from arrival to failure"
+        for record in records:
+            breach = " (over SLO)" if success and record["slo_ms"] and record["total_ms"] > record["slo_ms"] else ""
+            self.logger.info(
+                f"{label} of {record['file_name']}: {record['total_ms'] / 1000:.1f}s "
+                f"(queue {record['queue_ms'] / 1000:.1f}s, load {record['load_ms'] / 1000:.1f}s, "
+                f"procedure {record['procedure_ms'] / 1000:.1f}s){breach}"
+            )
+        
+    def after_load(
+        self,
+        db_config: Dict[str, Any],
+        file_path: str,
+        load_options: Dict[str, Any]
+    ) -> None:
+        """
+        Hook run after a successful staging load, before the stored procedure.
+        
+        Subclasses override this for per-load follow-up work. Raise to fail the workflow.
+        
+        Args:
+            db_config: Database connection configuration
+            file_path: Path of the file that was loaded
+            load_options: delimiter, quote_char, line_terminator and skip_lines used for the load
+        """
+        pass
         
     @flow(name="File Ingestion Workflow")
     def execute(
@@ -181,7 +677,20 @@ class BaseIngestionWorkflow(BaseWorkflow):
         quote_char: str = '"',
         line_terminator: str = '\n',
         skip_lines: int = 1,
-        truncate_before_load: bool = None
+        truncate_before_load: Optional[bool] = None,
+        deferred_indexes: Optional[bool] = None,
+        result_output_dir: Optional[str] = None,
+        result_format: str = "parquet",
+        auto_plan: Optional[bool] = None,
+        dry_run: bool = False,
+        profile_input: Optional[bool] = None,
+        progress_interval: Optional[float] = None,
+        stall_timeout: Optional[float] = None,
+        trace_dir: Optional[str] = None,
+        cpu_profile: bool = False,
+        reconcile: Optional[bool] = None,
+        track_latency: Optional[bool] = None,
+        arrival_time: Optional[float] = None
     ) -> bool:
         """
         Main workflow for file ingestion process.
@@ -198,11 +707,35 @@ class BaseIngestionWorkflow(BaseWorkflow):
             line_terminator: Line terminator character
             skip_lines: Number of header lines to skip
             truncate_before_load: Boolean indicating whether to truncate the table before loading
+            deferred_indexes: Boolean indicating whether to build secondary indexes after the load
+            result_output_dir: Optional directory to stream the procedure result sets to
+            result_format: Result file format, "parquet" or "arrow"
+            auto_plan: Plan the load strategy from table statistics; the plan is only logged until the
+                cost model is calibrated (see load_planner.COST_MODEL_CALIBRATED), then it overrides deferred_indexes
+            dry_run: Log the load plan and stop; the database is only read (table metadata) with auto_plan
+            profile_input: Profile the file first and fail fast if the load parameters do not match it
+            progress_interval: Seconds between progress heartbeats (defaults to the workflow setting, which is off)
+            stall_timeout: Seconds without progress before a load or procedure is killed
+            trace_dir: Optional directory to write a span trace of the run to
+            cpu_profile: Also write a sampling CPU profile (folded stacks) to trace_dir
+            reconcile: Check the loaded table against the file's control totals and fail on a mismatch;
+                the totals are built in the profile_input scan, or in a scan of their own without it
+            track_latency: Record the file's arrival-to-publish latency in bormeta.ingest_latency
+            arrival_time: When the input arrived, if file_path was derived from it (e.g. converted);
+                defaults to file_path's mtime/ctime
         
         Returns:
             bool: True if workflow completed successfully, False otherwise
         """
+        # Queue time runs from the file's arrival until here
+        tracker = LatencyTracker(
+            self.name, self.target_table, [file_path], self.latency_slo,
+            arrivals={file_path: arrival_time} if arrival_time else None
+        )
+        track_latency = self.resolve_flag(track_latency, self.track_latency)
         try:
+            self.start_tracing(trace_dir, self.resolve_flag(cpu_profile, False))
+            
             # Log workflow start
             self.log_workflow_start({
                 "file_path": file_path,
@@ -214,52 +747,321 @@ class BaseIngestionWorkflow(BaseWorkflow):
             })
             
             # Configure database connection
-            db_config = {
-                "host": db_host,
-                "port": int(db_port),
-                "user": db_user,
-                "password": db_password,
-                "database": db_name
-            }
-            
-            # Defensive cast for truncate_before_load
-            if isinstance(truncate_before_load, str):
-                truncate_before_load = truncate_before_load.lower() == "true"
-            if truncate_before_load is None:
-                truncate_before_load = self.truncate_before_load
+            db_config = self.build_db_config(db_host, db_port, db_user, db_password, db_name)
+            self.check_backend(db_config)
+            truncate_before_load = self.resolve_truncate(truncate_before_load)
+            deferred_indexes = self.resolve_deferred_indexes(deferred_indexes)
+            auto_plan = self.resolve_flag(auto_plan, self.auto_plan)
+            dry_run = self.resolve_flag(dry_run, False)
+            profile_input = self.resolve_flag(profile_input, self.profile_input)
+            reconcile = self.resolve_flag(reconcile, self.reconcile)
+            progress_interval, stall_timeout = self.resolve_progress(progress_interval, stall_timeout)
             
             # Check if file exists
             if not check_file_exists(file_path):
                 raise FileNotFoundError(f"File not found: {file_path}")
             
+            load_options = {
+                "delimiter": delimiter,
+                "quote_char": quote_char,
+                "line_terminator": line_terminator,
+                "skip_lines": skip_lines
+            }
+            
+            # Profile the input and check the load parameters against it;
+            # the scan also builds the control totals to reconcile with
+            profile = None
+            file_totals = None
+            columnar = columnar_format(file_path) is not None
+            if profile_input:
+                if reconcile and not dry_run:
+                    file_totals = self.start_control_totals(file_path, load_options, truncate_before_load)
+                if columnar:
+                    self.logger.info(f"{file_path} is a columnar file, nothing to profile")
+                elif Path(file_path).exists():
+                    with span("profile_input", file=file_path):
+                        profile = self.check_input_profile(
+                            file_path, delimiter, quote_char, line_terminator, skip_lines, file_totals
+                        )
+                else:
+                    self.logger.warning(f"Cannot profile {file_path} from this process")
+            
+            # Plan the load strategy
+            plan = None
+            if auto_plan or dry_run:
+                if not columnar:
+                    with span("plan_load", file=file_path, table=self.target_table):
+                        plan = plan_load(
+                            file_path=file_path,
+                            db_config=db_config,
+                            target_table=self.target_table,
+                            field_transformations=self.field_transformations,
+                            delimiter=delimiter,
+                            line_terminator=line_terminator,
+                            skip_lines=skip_lines,
+                            truncate_before_load=truncate_before_load,
+                            profile=profile,
+                            # A dry run on its own does not connect to the database
+                            read_table=auto_plan
+                        )
+                if columnar:
+                    self.logger.warning(f"No load plan for {file_path}: load plans are only made for delimited files")
+                elif plan is None:
+                    self.logger.warning(f"No load plan for {file_path}: not readable from this process or not a MySQL database")
+                else:
+                    self.logger.info(format_plan(plan))
+                    if auto_plan and plan["strategy"]:
+                        if COST_MODEL_CALIBRATED:
+                            deferred_indexes = plan["strategy"] == "deferred_indexes"
+                        else:
+                            self.logger.info(
+                                f"Load plan is advisory, the cost model is not calibrated: "
+                                f"loading with deferred_indexes={deferred_indexes}"
+                            )
+                if dry_run:
+                    self.logger.info("Dry run, nothing loaded")
+                    self.log_workflow_end(True)
+                    return True
+            
+            if reconcile and not profile_input:
+                file_totals = self.scan_control_totals(file_path, load_options, truncate_before_load)
+            
             # Load data to staging
-            if not load_data_to_staging(
-                file_path=file_path,
-                db_config=db_config,
-                target_table=self.target_table,
-                field_mappings=self.field_mappings,
-                field_transformations=self.field_transformations,
-                delimiter=delimiter,
-                quote_char=quote_char,
-                line_terminator=line_terminator,
-                skip_lines=skip_lines,
-                truncate_before_load=truncate_before_load
-            ):
+            expected_rows = self.expected_rows(file_path, profile, plan, delimiter, line_terminator, skip_lines)
+            with tracker.phase("load"):
+                loaded = load_data_to_staging(
+                    file_path=file_path,
+                    db_config=db_config,
+                    target_table=self.target_table,
+                    field_mappings=self.field_mappings,
+                    field_transformations=self.field_transformations,
+                    delimiter=delimiter,
+                    quote_char=quote_char,
+                    line_terminator=line_terminator,
+                    skip_lines=skip_lines,
+                    truncate_before_load=truncate_before_load,
+                    deferred_indexes=deferred_indexes,
+                    progress_interval=progress_interval,
+                    stall_timeout=stall_timeout,
+                    expected_rows=expected_rows
+                )
+            if not loaded:
                 raise Exception("Failed to load data to staging")
             
+            with tracker.phase("post_load"):
+                if file_totals is not None:
+                    with span("reconcile", file=file_path, table=self.target_table):
+                        self.check_control_totals(db_config, file_totals)
+                
+                with span("after_load", file=file_path):
+                    self.after_load(db_config, file_path, load_options)
+            
             # Execute stored procedure if specified
             if self.procedure_name:
-                if not execute_stored_procedure(
-                    db_config=db_config,
-                    procedure_name=self.procedure_name,
-                    procedure_params=self.procedure_params
-                ):
+                result_handler = self.get_result_handler(result_output_dir, result_format)
+                with tracker.phase("procedure"):
+                    executed = execute_stored_procedure(
+                        db_config=db_config,
+                        procedure_name=self.procedure_name,
+                        procedure_params=self.procedure_params,
+                        result_handler=result_handler,
+                        progress_interval=progress_interval,
+                        stall_timeout=stall_timeout
+                    )
+                if not executed:
                     raise Exception("Failed to execute stored procedure")
+                if getattr(result_handler, "files", None):
+                    self.logger.info(f"Procedure results written to {result_handler.files}")
+            
+            if track_latency:
+                self.record_run_latency(db_config, tracker, True)
             
             # Log successful completion
             self.log_workflow_end(True)
             return True
             
         except Exception as e:
+            if track_latency and 'db_config' in locals():
+                self.record_run_latency(db_config, tracker, False)
+            self.handle_workflow_error(e)
+            return False
+
+    @flow(name="Coalesced File Ingestion Workflow")
+    def execute_coalesced(
+        self,
+        file_paths: List[str],
+        db_host: str,
+        db_port: str,
+        db_user: str,
+        db_password: str,
+        db_name: str,
+        delimiter: str = ',',
+        quote_char: str = '"',
+        line_terminator: str = '\n',
+        skip_lines: int = 1,
+        truncate_before_load: Optional[bool] = None,
+        deferred_indexes: Optional[bool] = None,
+        staging_dir: Optional[str] = None,
+        max_batch_bytes: int = 64 * 1024 * 1024,
+        window_seconds: Optional[float] = None,
+        remove_coalesced: bool = True,
+        archive_sources: bool = True,
+        archive_dir: Optional[str] = None,
+        progress_interval: Optional[float] = None,
+        stall_timeout: Optional[float] = None,
+        trace_dir: Optional[str] = None,
+        cpu_profile: bool = False,
+        track_latency: Optional[bool] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Ingest many small files with one LOAD DATA and one procedure call per batch.
+        
+        Compatible files (same header lines, within the size and arrival
+        window) are concatenated into a single file before loading. When
+        truncate_before_load is set, the table is only truncated before the
+        first batch so later batches do not wipe earlier ones. Once a batch is
+        loaded and its procedure has run, its source files are moved to the
+        archive directory so a later run of the same pattern does not load
+        them again.
+        
+        Args:
+            file_paths: Paths to the input files in the shared volume
+            db_host: Database host
+            db_port: Database port (as string, will be cast to int)
+            db_user: Database user
+            db_password: Database password
+            db_name: Database name
+            delimiter: Field delimiter character
+            quote_char: Quote character
+            line_terminator: Line terminator character
+            skip_lines: Number of header lines to skip in each file
+            truncate_before_load: Boolean indicating whether to truncate the table before the first batch
+            deferred_indexes: Boolean indicating whether to build secondary indexes after each load
+            staging_dir: Directory for coalesced files, must be readable by the database server
+                (defaults to the staging sibling of the incoming directory)
+            max_batch_bytes: Upper bound on the total size of one batch
+            window_seconds: Optional arrival window for one batch
+            remove_coalesced: Remove coalesced files after a successful load
+            archive_sources: Move the source files of a loaded batch out of the incoming directory
+            archive_dir: Directory for archived source files (defaults to the archive sibling of the incoming directory)
+            progress_interval: Seconds between progress heartbeats (defaults to the workflow setting, which is off)
+            stall_timeout: Seconds without progress before a load or procedure is killed
+            trace_dir: Optional directory to write a span trace of the run to
+            cpu_profile: Also write a sampling CPU profile (folded stacks) to trace_dir
+            track_latency: Record the arrival-to-publish latency of every source file in bormeta.ingest_latency
+        
+        Returns:
+            List of loaded batches with per-source-file row counts for lineage
+        """
+        # Coalescing does not keep the source files' timestamps
+        arrivals = {path: file_arrival_time(path) for path in file_paths}
+        track_latency = self.resolve_flag(track_latency, self.track_latency)
+        try:
+            self.start_tracing(trace_dir, self.resolve_flag(cpu_profile, False))
+            self.log_workflow_start({
+                "file_paths": file_paths,
+                "target_table": self.target_table,
+                "db_host": db_host,
+                "db_port": db_port,
+                "db_user": db_user,
+                "db_name": db_name,
+                "max_batch_bytes": max_batch_bytes,
+                "window_seconds": window_seconds
+            })
+            
+            db_config = self.build_db_config(db_host, db_port, db_user, db_password, db_name)
+            self.check_backend(db_config)
+            truncate_before_load = self.resolve_truncate(truncate_before_load)
+            deferred_indexes = self.resolve_deferred_indexes(deferred_indexes)
+            progress_interval, stall_timeout = self.resolve_progress(progress_interval, stall_timeout)
+            
+            missing = [p for p in file_paths if not Path(p).exists()]
+            if missing:
+                raise FileNotFoundError(f"Files not found: {missing}")
+            
+            batches = coalesce_files(
+                file_paths=file_paths,
+                target_table=self.target_table,
+                staging_dir=staging_dir,
+                skip_lines=skip_lines,
+                line_terminator=line_terminator,
+                max_batch_bytes=max_batch_bytes,
+                window_seconds=window_seconds
+            )
+            
+            for batch_num, batch in enumerate(batches, 1):
+                self.logger.info(
+                    f"Loading batch {batch_num}/{len(batches)}: {len(batch['lineage'])} files, "
+                    f"{batch['rows']} rows from {batch['file_path']}"
+                )
+                for item in batch["lineage"]:
+                    self.logger.info(
+                        f"  {item['source_file']}: {item['rows']} rows (line {item['first_line']})"
+                    )
+                
+                # Files of later batches queue until their batch starts
+                tracker = LatencyTracker(
+                    self.name, self.target_table, [item["source_file"] for item in batch["lineage"]],
+                    self.latency_slo, arrivals=arrivals
+                )
+                with tracker.phase("load"):
+                    loaded = load_data_to_staging(
+                        file_path=batch["file_path"],
+                        db_config=db_config,
+                        target_table=self.target_table,
+                        field_mappings=self.field_mappings,
+                        field_transformations=self.field_transformations,
+                        delimiter=delimiter,
+                        quote_char=quote_char,
+                        line_terminator=line_terminator,
+                        skip_lines=skip_lines,
+                        truncate_before_load=truncate_before_load and batch_num == 1,
+                        deferred_indexes=deferred_indexes,
+                        progress_interval=progress_interval,
+                        stall_timeout=stall_timeout,
+                        expected_rows=batch["rows"]
+                    )
+                if not loaded:
+                    raise Exception(f"Failed to load batch {batch['file_path']}")
+                
+                with tracker.phase("post_load"), span("after_load", file=batch["file_path"]):
+                    self.after_load(db_config, batch["file_path"], {
+                        "delimiter": delimiter,
+                        "quote_char": quote_char,
+                        "line_terminator": line_terminator,
+                        "skip_lines": skip_lines
+                    })
+                
+                if self.procedure_name:
+                    with tracker.phase("procedure"):
+                        executed = execute_stored_procedure(
+                            db_config=db_config,
+                            procedure_name=self.procedure_name,
+                            procedure_params=self.procedure_params,
+                            progress_interval=progress_interval,
+                            stall_timeout=stall_timeout
+                        )
+                    if not executed:
+                        raise Exception("Failed to execute stored procedure")
+                
+                if track_latency:
+                    self.record_run_latency(db_config, tracker, True)
+                    tracker = None
+                
+                if remove_coalesced:
+                    Path(batch["file_path"]).unlink(missing_ok=True)
+                
+                if archive_sources:
+                    archived = archive_files([item["source_file"] for item in batch["lineage"]], archive_dir)
+                    for item, path in zip(batch["lineage"], archived):
+                        item["archived_to"] = path
+                    self.logger.info(f"Archived {len(archived)} source files of batch {batch_num}")
+            
+            self.log_workflow_end(True)
+            return batches
+            
+        except Exception as e:
+            if track_latency and locals().get('tracker') is not None:
+                self.record_run_latency(db_config, tracker, False)
             self.handle_workflow_error(e)
-            return False 
\ No newline at end of file
+            return []
@@ -6,20 +6,44 @@ from prefect import flow, get_run_logger
 from prefect.context import get_run_context
 from datetime import datetime
 
+from .tracing import start_trace, stop_trace, open_span, tracing_enabled
+
 class BaseWorkflow:
     """Base class for all workflows with common functionality."""
     
     def __init__(self, name: str):
         self.name = name
         self.logger = get_run_logger()
+        self.run_span = None
+        self.owns_trace = False
+        
+    def start_tracing(self, trace_dir: Optional[str], cpu_profile: bool = False) -> None:
+        """Trace this run into trace_dir (see tracing.py); no-op without a directory."""
+        if not trace_dir or tracing_enabled():
+            return
+        start_trace(self.name, trace_dir, cpu_profile=cpu_profile)
+        self.owns_trace = True
+        
+    def stop_tracing(self, **attrs) -> None:
+        """End the run span and, if this workflow started the trace, write it out."""
+        if self.run_span is not None:
+            self.run_span.set(**attrs)
+            self.run_span.end()
+            self.run_span = None
+        if self.owns_trace:
+            self.owns_trace = False
+            for kind, path in stop_trace().items():
+                self.logger.info(f"Wrote {kind.replace('_', ' ')} to {path}")
         
     def log_workflow_start(self, params: Dict[str, Any]) -> None:
         """Log workflow start with parameters."""
         self.logger.info(f"Starting workflow {self.name}")
         self.logger.info(f"Parameters: {params}")
+        self.run_span = open_span(f"workflow {self.name}", **params)
         
     def log_workflow_end(self, success: bool, error: Optional[Exception] = None) -> None:
         """Log workflow completion."""
+        self.stop_tracing(success=success)
         if success:
             self.logger.info(f"Workflow {self.name} completed successfully")
         else:
@@ -37,5 +61,6 @@ class BaseWorkflow:
     def handle_workflow_error(self, error: Exception) -> None:
         """Handle workflow errors consistently."""
         self.logger.error(f"Workflow error in {self.name}: {str(error)}")
+        self.stop_tracing(success=False, error=str(error))
         # Add any common error handling logic here
         raise error 
\ No newline at end of file
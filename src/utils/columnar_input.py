@@ -0,0 +1,229 @@
+"""
+Parquet and Arrow IPC input files for the ingestion tasks.
+
+Columnar files are read one row group (Parquet) or record batch (Arrow) at
+a time, with only the columns named in field_mappings. Memory therefore
+stays bounded by one batch whatever the file size.
+
+For MySQL, each batch is encoded in Arrow compute kernels into LOAD DATA
+text:
+    - tab-separated, newline-terminated
+    - backslash escapes
+    - \\N for NULL
+The text is written into a named pipe that a `LOAD DATA LOCAL INFILE` on
+the same connection reads from. Encoding and the server-side load overlap,
+nothing is written to disk, and no number goes through Python objects.
+The same field_transformations apply as for delimited files.
+
+pyarrow is only needed when a columnar file is loaded.
+"""
+import os
+import shutil
+import tempfile
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+
+COLUMNAR_EXTENSIONS = {
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow",
+    ".ipc": "arrow",
+}
+
+
+def columnar_format(file_path: str) -> Optional[str]:
+    """'parquet' or 'arrow' for columnar input files, None for delimited text."""
+    return COLUMNAR_EXTENSIONS.get(os.path.splitext(file_path)[1].lower())
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as e:
+        raise ImportError("pyarrow is required to load Parquet/Arrow files") from e
+
+
+def _open(file_path: str):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if columnar_format(file_path) == "parquet":
+        return pq.ParquetFile(file_path)
+    return pa.ipc.open_file(pa.memory_map(file_path, "r"))
+
+
+def columnar_row_count(file_path: str) -> int:
+    """Row count from the file metadata, without reading any data."""
+    _require_pyarrow()
+    source = _open(file_path)
+    if columnar_format(file_path) == "parquet":
+        return source.metadata.num_rows
+    return sum(source.get_batch(i).num_rows for i in range(source.num_record_batches))
+
+
+def iter_batches(file_path: str, columns: List[str]) -> Iterator[Any]:
+    """
+    Yield the projected columns of a file one row group / record batch at a time.
+
+    Raises:
+        ValueError: If a mapped column is missing from the file
+    """
+    _require_pyarrow()
+    source = _open(file_path)
+    schema = source.schema_arrow if columnar_format(file_path) == "parquet" else source.schema
+    missing = [column for column in columns if column not in schema.names]
+    if missing:
+        raise ValueError(f"Columns {missing} not found in {file_path} (has {schema.names})")
+
+    if columnar_format(file_path) == "parquet":
+        for i in range(source.num_row_groups):
+            yield source.read_row_group(i, columns=columns)
+    else:
+        for i in range(source.num_record_batches):
+            yield source.get_batch(i).select(columns)
+
+
+def as_text(column) -> Any:
+    """Cast one column to LOAD DATA text: escaped strings, \\N for NULL."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    data_type = column.type
+    if pa.types.is_dictionary(data_type):
+        column = pc.cast(column, data_type.value_type)
+        data_type = data_type.value_type
+    if pa.types.is_boolean(data_type):
+        column = pc.cast(column, pa.int8())
+    if pa.types.is_string(data_type) or pa.types.is_large_string(data_type):
+        for raw, escaped in (("\\", "\\\\"), ("\t", "\\t"), ("\n", "\\n")):
+            column = pc.replace_substring(column, raw, escaped)
+    column = pc.cast(column, pa.large_string())
+    return pc.fill_null(column, "\\N")
+
+
+def encode_batch(batch) -> Any:
+    """Encode a table / record batch as tab-separated LOAD DATA text, returned as a pyarrow Buffer."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if batch.num_rows == 0:
+        return pa.py_buffer(b"")
+    columns = [as_text(column) for column in batch.columns]
+    text = pa.large_string()
+    lines = pc.binary_join_element_wise(*columns, pa.scalar("\t", text))
+    # Appending the separator to every line leaves one contiguous buffer to send
+    lines = pc.binary_join_element_wise(lines, pa.scalar("", text), pa.scalar("\n", text))
+    if isinstance(lines, pa.ChunkedArray):
+        lines = lines.combine_chunks()
+    _, offsets, data = lines.buffers()
+    offsets = pa.Array.from_buffers(pa.int64(), len(lines) + 1, [None, offsets], offset=lines.offset)
+    start, end = offsets[0].as_py(), offsets[-1].as_py()
+    return data.slice(start, end - start)
+
+
+class PipeFeeder(threading.Thread):
+    """Writes the encoded batches of a file into a named pipe read by LOAD DATA LOCAL."""
+
+    def __init__(self, file_path: str, columns: List[str]):
+        super().__init__(name="columnar-feeder", daemon=True)
+        self.file_path = file_path
+        self.columns = columns
+        self.directory = tempfile.mkdtemp(prefix="bor-load-")
+        self.pipe_path = os.path.join(self.directory, "rows.tsv")
+        os.mkfifo(self.pipe_path)
+        self.bytes_written = 0
+        self.rows_written = 0
+        self.error: Optional[BaseException] = None
+        self.cancelled = threading.Event()
+
+    def run(self) -> None:
+        try:
+            # Blocks until the connector opens the pipe for reading
+            with open(self.pipe_path, "wb") as pipe:
+                for batch in iter_batches(self.file_path, self.columns):
+                    if self.cancelled.is_set():
+                        break
+                    data = encode_batch(batch)
+                    pipe.write(data)
+                    self.bytes_written += len(data)
+                    self.rows_written += batch.num_rows
+        except BaseException as e:
+            self.error = e
+
+    def finish(self) -> None:
+        """Wait for the writer; stops and drains it if the load did not read the pipe to the end."""
+        if self.is_alive():
+            self.cancelled.set()
+            # Holding a read end open lets the writer's open() and pending write() return
+            fd = os.open(self.pipe_path, os.O_RDONLY | os.O_NONBLOCK)
+            try:
+                while self.is_alive():
+                    try:
+                        os.read(fd, 1 << 16)
+                    except BlockingIOError:
+                        pass
+                    self.join(0.01)
+            finally:
+                os.close(fd)
+        self.join()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def load_columnar_mysql(
+    cursor,
+    file_path: str,
+    target_table: str,
+    field_mappings: Dict[str, str],
+    field_transformations: Optional[Dict[str, str]] = None,
+    on_feeder: Optional[Any] = None
+) -> int:
+    """
+    Stream a columnar file into a table with LOAD DATA LOCAL INFILE from a named pipe.
+
+    The connection must allow local infile. on_feeder is called with the
+    PipeFeeder before the load starts, e.g. to report its byte counter.
+    """
+    # Imported here, base_ingestion imports this module through db_backend
+    from .base_ingestion import build_load_query
+
+    _require_pyarrow()
+    feeder = PipeFeeder(file_path, list(field_mappings))
+    if on_feeder:
+        on_feeder(feeder)
+    feeder.start()
+    try:
+        load_query = build_load_query(
+            file_path=feeder.pipe_path,
+            target_table=target_table,
+            field_mappings=field_mappings,
+            field_transformations=field_transformations,
+            delimiter='\t',
+            quote_char='',
+            line_terminator='\n',
+            skip_lines=0,
+            local=True
+        )
+        cursor.execute(load_query)
+        rows = cursor.rowcount
+    finally:
+        feeder.finish()
+    if feeder.error is not None:
+        raise RuntimeError(f"Reading {file_path} failed: {feeder.error}") from feeder.error
+    return rows
+
+
+def iter_rows(file_path: str, columns: List[str]) -> Iterator[List[List[Any]]]:
+    """Yield the rows of each batch as lists of Python values, for the SQLite backend."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    for batch in iter_batches(file_path, columns):
+        values = []
+        for column in batch.columns:
+            data_type = column.type
+            # Types sqlite3 cannot bind go over as text, like LOAD DATA reads them
+            if pa.types.is_decimal(data_type) or pa.types.is_temporal(data_type):
+                column = pc.cast(column, pa.string())
+            values.append(column.to_pylist())
+        yield [list(row) for row in zip(*values)]
@@ -0,0 +1,425 @@
+"""
+Database backends for the ingestion tasks.
+
+The tasks in base_ingestion.py do their database work through a backend:
+connect, truncate, bulk-load a delimited or columnar file and call a procedure.
+
+MySQLBackend is what runs in production. It connects with mysql.connector,
+loads with LOAD DATA INFILE and calls real stored procedures. The driver is
+imported when a MySQL connection is opened, here and in the MySQL-only
+modules, so SQLite runs do not need it installed.
+
+SQLiteBackend runs the same pipeline in-process, without the bor-db
+container, for offline testing and benchmarking:
+    - borarch and bormeta are ATTACHed databases, so `borarch.holdweb` resolves as usual
+    - files are parsed with the csv module into a temporary table and moved into the
+      target table with one INSERT ... SELECT that applies the field transformations
+      (`@Field` references become column references; NULLIF, TRIM, UPPER, ... work as is)
+    - Parquet/Arrow files fill the same temporary table, one row group at a time
+    - procedures are stand-ins: a SQL statement or a Python callable per procedure name
+    - CRC32 and CONCAT_WS are registered as functions, so the reconciliation queries run as is
+
+The backend is chosen by the db_config the tasks receive: a "backend" entry
+holding a backend object selects it, anything else is a mysql.connector
+config. BaseIngestionWorkflow.build_db_config maps a db_host of the form
+"sqlite:////path/to/bor.db" (or "sqlite://" for in-memory) to a SQLiteBackend.
+
+The holdings aggregates run on both. Deferred indexes, the progress monitor,
+the load planner and history partitions use MySQL-specific SQL and stay
+MySQL-only; the first three are skipped under SQLite, publishing history is
+refused before anything is loaded (see BaseIngestionWorkflow.check_backend).
+"""
+import csv
+import itertools
+from abc import ABC, abstractmethod
+import re
+import sqlite3
+import uuid
+import zlib
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Union
+
+from .result_streaming import ResultHandler, stream_procedure_results
+from .columnar_input import load_columnar_mysql, iter_rows
+
+# Rows per executemany batch when filling the SQLite load table
+SQLITE_LOAD_BATCH = 10000
+
+# SQLite versions of the borarch staging tables (see ref/8.ddl-borarch-tables.sql),
+# of borarch.holdweb_agg (ref/10.ddl-borarch-holdweb-agg.sql)
+# and of bormeta.ingest_latency (ref/11.ddl-bormeta-ingest-latency.sql)
+SQLITE_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS borarch.FundClassFee (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        FundCode TEXT NOT NULL,
+        FundName TEXT NOT NULL,
+        Class TEXT NOT NULL,
+        Description TEXT NOT NULL,
+        Mer NUMERIC,
+        Trailer NUMERIC,
+        PerformanceFee TEXT,
+        MinInvestmentInitial TEXT,
+        MinInvestmentSubsequent TEXT,
+        Currency TEXT NOT NULL,
+        UNIQUE (FundCode, Class)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS borarch.holdweb (
+        date TEXT NOT NULL,
+        fund_name TEXT NOT NULL,
+        sec_name TEXT NOT NULL,
+        sector TEXT NOT NULL,
+        currency TEXT,
+        units NUMERIC,
+        cost NUMERIC,
+        mv NUMERIC
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS borarch.holdweb_agg (
+        dimension TEXT NOT NULL,
+        fund_name TEXT NOT NULL,
+        date TEXT NOT NULL,
+        dim_value TEXT NOT NULL,
+        positions INTEGER NOT NULL,
+        units NUMERIC,
+        cost NUMERIC,
+        mv NUMERIC,
+        weight NUMERIC,
+        PRIMARY KEY (dimension, fund_name, date, dim_value)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS bormeta.ingest_latency (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        workflow TEXT NOT NULL,
+        target_table TEXT NOT NULL,
+        file_name TEXT NOT NULL,
+        arrived_at TEXT NOT NULL,
+        published_at TEXT NOT NULL,
+        queue_ms INTEGER NOT NULL,
+        load_ms INTEGER NOT NULL,
+        post_load_ms INTEGER NOT NULL,
+        procedure_ms INTEGER NOT NULL,
+        total_ms INTEGER NOT NULL,
+        slo_ms INTEGER,
+        success INTEGER NOT NULL
+    )
+    """
+]
+
+# Stand-ins for the bormeta procedures; both return the loaded staging rows
+SQLITE_PROCEDURES: Dict[str, Union[str, Callable]] = {
+    "bormeta.usp_FundClassFee_Load": (
+        "SELECT FundCode, FundName, Class, Description, Mer, Trailer, PerformanceFee, "
+        "MinInvestmentInitial, MinInvestmentSubsequent, Currency FROM borarch.FundClassFee"
+    ),
+    "bormeta.usp_holdweb_process": (
+        "SELECT date, fund_name, sec_name, sector, currency, units, cost, mv FROM borarch.holdweb"
+    )
+}
+
+
+class DatabaseBackend(ABC):
+    """Interface used by the ingestion tasks."""
+
+    name = "base"
+    supports_deferred_indexes = False
+    supports_progress_monitor = False
+    supports_partition_exchange = False
+    # Query parameter marker of the driver
+    placeholder = "%s"
+
+    @abstractmethod
+    def connect(self, local_infile: bool = False):
+        """Open a DB-API connection."""
+
+    @abstractmethod
+    def truncate(self, cursor, target_table: str) -> None:
+        """Empty target_table."""
+
+    @abstractmethod
+    def load_file(
+        self,
+        cursor,
+        file_path: str,
+        target_table: str,
+        field_mappings: Dict[str, str],
+        field_transformations: Optional[Dict[str, str]] = None,
+        delimiter: str = ',',
+        quote_char: str = '"',
+        line_terminator: str = '\n',
+        skip_lines: int = 1
+    ) -> int:
+        """Bulk-load a delimited file into target_table; returns the rows loaded."""
+
+    @abstractmethod
+    def load_columnar(
+        self,
+        cursor,
+        file_path: str,
+        target_table: str,
+        field_mappings: Dict[str, str],
+        field_transformations: Optional[Dict[str, str]] = None,
+        on_feeder: Optional[Callable] = None
+    ) -> int:
+        """Bulk-load a Parquet/Arrow file into target_table; returns the rows loaded."""
+
+    @abstractmethod
+    def call_procedure(
+        self,
+        conn,
+        procedure_name: str,
+        procedure_params: Optional[Dict[str, Any]] = None,
+        result_handler: Optional[ResultHandler] = None,
+        batch_size: int = 10000
+    ) -> Optional[List[int]]:
+        """Call a procedure; with a handler, returns the row count per streamed result set."""
+
+
+class MySQLBackend(DatabaseBackend):
+    """bor-db via mysql.connector and LOAD DATA INFILE."""
+
+    name = "mysql"
+    supports_deferred_indexes = True
+    supports_progress_monitor = True
+    supports_partition_exchange = True
+
+    def __init__(self, db_config: dict):
+        self.db_config = db_config
+
+    def connect(self, local_infile: bool = False):
+        # Imported here, so runs on the SQLite backend do not need the driver
+        import mysql.connector
+        if local_infile:
+            return mysql.connector.connect(**self.db_config, allow_local_infile=True)
+        return mysql.connector.connect(**self.db_config)
+
+    def truncate(self, cursor, target_table: str) -> None:
+        cursor.execute(f"TRUNCATE TABLE {target_table}")
+
+    def load_file(self, cursor, file_path, target_table, field_mappings, field_transformations=None,
+                  delimiter=',', quote_char='"', line_terminator='\n', skip_lines=1) -> int:
+        # Imported here, base_ingestion imports this module
+        from .base_ingestion import build_load_query
+        cursor.execute(build_load_query(
+            file_path=file_path,
+            target_table=target_table,
+            field_mappings=field_mappings,
+            field_transformations=field_transformations,
+            delimiter=delimiter,
+            quote_char=quote_char,
+            line_terminator=line_terminator,
+            skip_lines=skip_lines
+        ))
+        return cursor.rowcount
+
+    def load_columnar(self, cursor, file_path, target_table, field_mappings, field_transformations=None,
+                      on_feeder=None) -> int:
+        return load_columnar_mysql(cursor, file_path, target_table, field_mappings, field_transformations, on_feeder)
+
+    def call_procedure(self, conn, procedure_name, procedure_params=None, result_handler=None,
+                       batch_size=10000) -> Optional[List[int]]:
+        if result_handler:
+            return stream_procedure_results(conn, procedure_name, procedure_params, result_handler, batch_size)
+        cursor = conn.cursor()
+        try:
+            if procedure_params:
+                cursor.callproc(procedure_name, list(procedure_params.values()))
+            else:
+                cursor.callproc(procedure_name)
+        finally:
+            cursor.close()
+        return None
+
+
+class SQLiteBackend(DatabaseBackend):
+    """
+    In-process stand-in for bor-db.
+
+    Args:
+        database: SQLite file for the main schema, or ":memory:"
+        schemas: Schemas to ATTACH; files are created next to `database`
+        procedures: Procedure stand-ins by name, defaults to SQLITE_PROCEDURES
+        create_tables: Create the borarch staging tables from SQLITE_DDL
+    """
+
+    name = "sqlite"
+    placeholder = "?"
+
+    def __init__(
+        self,
+        database: str = ":memory:",
+        schemas: Sequence[str] = ("borarch", "bormeta"),
+        procedures: Optional[Dict[str, Union[str, Callable]]] = None,
+        create_tables: bool = True
+    ):
+        self.schemas = list(schemas)
+        self.procedures = dict(SQLITE_PROCEDURES if procedures is None else procedures)
+        if database == ":memory:":
+            # Shared-cache memory databases live as long as one connection is open
+            tag = uuid.uuid4().hex
+            self.database = f"file:bor-{tag}?mode=memory&cache=shared"
+            self.schema_files = {s: f"file:bor-{tag}-{s}?mode=memory&cache=shared" for s in self.schemas}
+        else:
+            base = database[:-3] if database.endswith(".db") else database
+            self.database = f"file:{database}"
+            self.schema_files = {s: f"file:{base}-{s}.db" for s in self.schemas}
+        self._keepalive = self.connect()
+        if create_tables:
+            self._keepalive.executescript(";\n".join(SQLITE_DDL))
+            self._keepalive.commit()
+
+    @classmethod
+    def from_url(cls, url: str) -> "SQLiteBackend":
+        """Build from sqlite:///relative.db or sqlite:////absolute.db; sqlite:// is in-memory."""
+        if url in ("sqlite://", "sqlite:///:memory:"):
+            return cls()
+        return cls(url[len("sqlite:///"):])
+
+    def connect(self, local_infile: bool = False):
+        conn = sqlite3.connect(self.database, uri=True, check_same_thread=False)
+        # MySQL functions used by the reconciliation queries
+        conn.create_function("CRC32", 1, sqlite_crc32, deterministic=True)
+        conn.create_function("CONCAT_WS", -1, sqlite_concat_ws, deterministic=True)
+        for schema, location in self.schema_files.items():
+            conn.execute(f"ATTACH DATABASE ? AS {schema}", (location,))
+        return conn
+
+    def close(self) -> None:
+        self._keepalive.close()
+
+    def truncate(self, cursor, target_table: str) -> None:
+        cursor.execute(f"DELETE FROM {target_table}")
+
+    def load_file(self, cursor, file_path, target_table, field_mappings, field_transformations=None,
+                  delimiter=',', quote_char='"', line_terminator='\n', skip_lines=1) -> int:
+        rows = read_delimited(file_path, delimiter, quote_char, line_terminator, skip_lines, len(field_mappings))
+
+        def batches():
+            while True:
+                batch = list(itertools.islice(rows, SQLITE_LOAD_BATCH))
+                if not batch:
+                    return
+                yield batch
+        return self.load_batches(cursor, batches(), target_table, field_mappings, field_transformations)
+
+    def load_columnar(self, cursor, file_path, target_table, field_mappings, field_transformations=None,
+                      on_feeder=None) -> int:
+        batches = iter_rows(file_path, list(field_mappings))
+        return self.load_batches(cursor, batches, target_table, field_mappings, field_transformations)
+
+    def load_batches(self, cursor, batches, target_table, field_mappings, field_transformations=None) -> int:
+        """Fill a temporary load table from row batches, then move it into target_table."""
+        field_transformations = field_transformations or {}
+        sources = list(field_mappings)
+        stage = f"load_{uuid.uuid4().hex[:8]}"
+        columns = ", ".join(f'"{source}"' for source in sources)
+        cursor.execute(f"CREATE TEMP TABLE {stage} ({columns})")
+        try:
+            placeholders = ", ".join("?" * len(sources))
+            for batch in batches:
+                cursor.executemany(f"INSERT INTO {stage} VALUES ({placeholders})", batch)
+
+            targets = []
+            expressions = []
+            for source, target in field_mappings.items():
+                targets.append(target)
+                if source in field_transformations:
+                    expressions.append(translate_transformation(field_transformations[source]))
+                else:
+                    expressions.append(f'"{source}"')
+            cursor.execute(
+                f"INSERT INTO {target_table} ({', '.join(targets)}) "
+                f"SELECT {', '.join(expressions)} FROM {stage}"
+            )
+            return cursor.rowcount
+        finally:
+            cursor.execute(f"DROP TABLE {stage}")
+
+    def call_procedure(self, conn, procedure_name, procedure_params=None, result_handler=None,
+                       batch_size=10000) -> Optional[List[int]]:
+        if procedure_name not in self.procedures:
+            raise ValueError(f"No SQLite stand-in for procedure {procedure_name}")
+        standin = self.procedures[procedure_name]
+        params = list(procedure_params.values()) if procedure_params else []
+        cursor = conn.cursor()
+        try:
+            if callable(standin):
+                # Python stand-ins return a cursor-like object or None
+                result = standin(conn, *params)
+            else:
+                placeholders = standin.count("?")
+                result = cursor.execute(standin, params[:placeholders])
+            if result_handler is None or result is None or result.description is None:
+                return None
+            columns = [d[0] for d in result.description]
+            rows_read = 0
+            while True:
+                rows = result.fetchmany(batch_size)
+                if not rows:
+                    break
+                result_handler(0, columns, rows)
+                rows_read += len(rows)
+            return [rows_read]
+        finally:
+            cursor.close()
+            if result_handler is not None and hasattr(result_handler, "close"):
+                result_handler.close()
+
+
+def get_backend(db_config: dict) -> DatabaseBackend:
+    """Backend for a task's db_config: an explicit "backend" entry, else MySQL."""
+    backend = db_config.get("backend")
+    if backend is not None:
+        return backend
+    return MySQLBackend(db_config)
+
+
+def sqlite_crc32(value: Any) -> Optional[int]:
+    if value is None:
+        return None
+    return zlib.crc32(str(value).encode("utf-8"))
+
+
+def sqlite_concat_ws(separator: str, *values: Any) -> Optional[str]:
+    if separator is None:
+        return None
+    return separator.join(str(value) for value in values if value is not None)
+
+
+def translate_transformation(expression: str) -> str:
+    """Turn a LOAD DATA SET expression into SQLite SQL over the load table."""
+    return re.sub(r"@(\w+)", r'"\1"', expression)
+
+
+def normalize_row(row: List[str], fields: int) -> List[Optional[str]]:
+    """Pad or cut a parsed row to `fields` values and turn \\N into NULL, as LOAD DATA does."""
+    row = [None if value == "\\N" else value for value in row[:fields]]
+    return row + [None] * (fields - len(row))
+
+
+def read_delimited(
+    file_path: str,
+    delimiter: str,
+    quote_char: str,
+    line_terminator: str,
+    skip_lines: int,
+    fields: int
+) -> Iterator[List[Optional[str]]]:
+    """
+    Yield the rows of a delimited file the way LOAD DATA reads them.
+
+    Rows are padded or cut to `fields` values and \\N becomes NULL.
+    """
+    with open(file_path, newline="", encoding="utf-8") as f:
+        if line_terminator in ("\n", "\r\n"):
+            lines = f
+        else:
+            lines = (line for line in f.read().split(line_terminator) if line)
+        reader = csv.reader(lines, delimiter=delimiter, quotechar=quote_char or None)
+        for row in itertools.islice(reader, skip_lines, None):
+            if not row:
+                continue
+            yield normalize_row(row, fields)
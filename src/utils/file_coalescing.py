@@ -0,0 +1,270 @@
+"""
+Micro-batch coalescing of small incoming files into a single load file.
+
+Web-scraped holdings typically arrive as one small CSV per fund. Loading each
+one separately pays the fixed cost of a flow run, a connection, TRUNCATE,
+LOAD DATA and the stored procedure call for a handful of rows. The helpers in
+this module group compatible files bound for the same target table and
+concatenate them into one file, keeping the header lines of the first file
+only, so the batch is loaded with a single LOAD DATA INFILE.
+
+Coalesced files are written to a staging directory next to the incoming one
+(ftpetl/incoming -> ftpetl/staging), and once a batch is loaded its source
+files are moved to an archive directory (ftpetl/archive), so the next run of
+the same source pattern does not load them again.
+"""
+import glob
+import os
+import shutil
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from prefect import task
+
+# Copy buffer used when streaming source files into the coalesced file
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# Default staging and archive directories, siblings of the incoming directory
+STAGING_DIRNAME = "staging"
+ARCHIVE_DIRNAME = "archive"
+
+
+def sibling_dir(file_path: str, name: str) -> Path:
+    """Directory `name` next to the directory holding file_path."""
+    return Path(file_path).resolve().parent.parent / name
+
+
+def archive_files(file_paths: List[str], archive_dir: Optional[str] = None) -> List[str]:
+    """
+    Move loaded source files out of the incoming directory.
+
+    A file that already exists in the archive (the same name uploaded again)
+    gets a timestamp suffix instead of being overwritten.
+
+    Args:
+        file_paths: Source files to move
+        archive_dir: Target directory, defaults to the archive sibling of each file's directory
+
+    Returns:
+        The archived paths
+    """
+    archived = []
+    for path in file_paths:
+        target_dir = Path(archive_dir) if archive_dir else sibling_dir(path, ARCHIVE_DIRNAME)
+        target_dir.mkdir(parents=True, exist_ok=True)
+        target = target_dir / Path(path).name
+        if target.exists():
+            target = target_dir / f"{target.stem}-{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}{target.suffix}"
+        shutil.move(path, target)
+        archived.append(str(target))
+    return archived
+
+
+def expand_source_pattern(source_pattern: str) -> List[str]:
+    """Expand a glob pattern into a sorted list of file paths."""
+    return sorted(p for p in glob.glob(source_pattern) if os.path.isfile(p))
+
+
+def read_header(file_path: str, skip_lines: int, line_terminator: str = '\n') -> bytes:
+    """Return the first `skip_lines` lines of a file as raw bytes."""
+    if skip_lines <= 0:
+        return b""
+    terminator = line_terminator.encode()
+    buffer = b""
+    with open(file_path, "rb") as f:
+        while buffer.count(terminator) < skip_lines:
+            chunk = f.read(64 * 1024)
+            if not chunk:
+                break
+            buffer += chunk
+
+    # Trim to exactly skip_lines lines
+    pos = 0
+    for _ in range(skip_lines):
+        next_pos = buffer.find(terminator, pos)
+        if next_pos == -1:
+            return buffer
+        pos = next_pos + len(terminator)
+    return buffer[:pos]
+
+
+def count_data_rows(file_path: str, skip_lines: int, line_terminator: str = '\n') -> int:
+    """
+    Count data rows in a delimited file by counting line terminators.
+
+    Quoted fields containing the line terminator are counted as separate rows,
+    which matches how LOAD DATA INFILE reports lines for these files.
+    """
+    terminator = line_terminator.encode()
+    lines = 0
+    last_chunk = b""
+    with open(file_path, "rb") as f:
+        while True:
+            chunk = f.read(COPY_BUFFER_SIZE)
+            if not chunk:
+                break
+            # Handle terminators split across chunk boundaries
+            window = last_chunk[-(len(terminator) - 1):] + chunk if len(terminator) > 1 else chunk
+            lines += window.count(terminator)
+            last_chunk = chunk
+    if last_chunk and not last_chunk.endswith(terminator):
+        lines += 1
+    return max(lines - skip_lines, 0)
+
+
+def plan_batches(
+    file_paths: List[str],
+    skip_lines: int = 1,
+    line_terminator: str = '\n',
+    max_batch_bytes: int = 64 * 1024 * 1024,
+    window_seconds: Optional[float] = None
+) -> List[List[str]]:
+    """
+    Group files into coalescing batches.
+
+    Files are ordered by modification time. Files only share a batch when
+    their header lines are identical, the batch stays under `max_batch_bytes`
+    and, if `window_seconds` is given, the file arrived within that window of
+    the first file in the batch.
+
+    Args:
+        file_paths: Candidate files, all bound for the same target table
+        skip_lines: Number of header lines in each file
+        line_terminator: Line terminator used by the files
+        max_batch_bytes: Upper bound on the total size of one batch
+        window_seconds: Optional arrival window for one batch
+
+    Returns:
+        List of batches, each a list of file paths in arrival order
+    """
+    files = sorted(file_paths, key=lambda p: (os.path.getmtime(p), p))
+    open_batches: Dict[bytes, Dict[str, Any]] = {}
+    batches: List[List[str]] = []
+
+    for path in files:
+        header = read_header(path, skip_lines, line_terminator)
+        size = os.path.getsize(path)
+        mtime = os.path.getmtime(path)
+        batch = open_batches.get(header)
+
+        if batch is not None:
+            over_size = batch["bytes"] + size > max_batch_bytes
+            over_window = window_seconds is not None and mtime - batch["start"] > window_seconds
+            if over_size or over_window:
+                batch = None
+
+        if batch is None:
+            batch = {"files": [], "bytes": 0, "start": mtime}
+            open_batches[header] = batch
+            batches.append(batch["files"])
+
+        batch["files"].append(path)
+        batch["bytes"] += size
+
+    return batches
+
+
+def coalesce_batch(
+    file_paths: List[str],
+    output_path: str,
+    skip_lines: int = 1,
+    line_terminator: str = '\n'
+) -> List[Dict[str, Any]]:
+    """
+    Concatenate a batch of files into `output_path`.
+
+    The header lines of the first file are kept and the header lines of every
+    other file are dropped, so the result is loaded with the same
+    `skip_lines` as a single source file.
+
+    Returns:
+        Lineage records, one per source file, with the row count and the
+        first data line of that file within the coalesced output
+    """
+    terminator = line_terminator.encode()
+    lineage = []
+    next_line = skip_lines + 1
+
+    with open(output_path, "wb") as out:
+        for index, path in enumerate(file_paths):
+            header = read_header(path, skip_lines, line_terminator)
+            rows = count_data_rows(path, skip_lines, line_terminator)
+            last_byte = b""
+            with open(path, "rb") as f:
+                if index == 0:
+                    out.write(header)
+                f.seek(len(header))
+                while True:
+                    chunk = f.read(COPY_BUFFER_SIZE)
+                    if not chunk:
+                        break
+                    out.write(chunk)
+                    last_byte = chunk[-len(terminator):]
+            # Make sure the next file starts on a new line
+            if last_byte and last_byte != terminator:
+                out.write(terminator)
+
+            lineage.append({
+                "source_file": path,
+                "rows": rows,
+                "first_line": next_line if rows else None
+            })
+            next_line += rows
+
+    return lineage
+
+
+@task
+def coalesce_files(
+    file_paths: List[str],
+    target_table: str,
+    staging_dir: Optional[str] = None,
+    skip_lines: int = 1,
+    line_terminator: str = '\n',
+    max_batch_bytes: int = 64 * 1024 * 1024,
+    window_seconds: Optional[float] = None
+) -> List[Dict[str, Any]]:
+    """
+    Coalesce small files bound for `target_table` into load-ready batch files.
+
+    Args:
+        file_paths: Source files to coalesce
+        target_table: Target table name (format: database.table)
+        staging_dir: Directory for the coalesced files, must be readable by
+            the database server. Defaults to the staging sibling of the first
+            file's directory.
+        skip_lines: Number of header lines in each file
+        line_terminator: Line terminator used by the files
+        max_batch_bytes: Upper bound on the total size of one batch
+        window_seconds: Optional arrival window for one batch
+
+    Returns:
+        One entry per batch with the coalesced file path, the total row count
+        and the per-source lineage records
+    """
+    batches = plan_batches(
+        file_paths,
+        skip_lines=skip_lines,
+        line_terminator=line_terminator,
+        max_batch_bytes=max_batch_bytes,
+        window_seconds=window_seconds
+    )
+    if not batches:
+        return []
+
+    output_dir = Path(staging_dir) if staging_dir else sibling_dir(batches[0][0], STAGING_DIRNAME)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    table_name = target_table.replace('.', '_')
+
+    results = []
+    for batch_num, batch in enumerate(batches, 1):
+        output_path = str(output_dir / f"coalesced-{table_name}-{stamp}-{batch_num}.csv")
+        lineage = coalesce_batch(batch, output_path, skip_lines, line_terminator)
+        results.append({
+            "file_path": output_path,
+            "rows": sum(item["rows"] for item in lineage),
+            "lineage": lineage
+        })
+    return results
@@ -0,0 +1,623 @@
+"""
+Fast profiling of delimited input files over a memory-mapped view.
+
+The loader trusts the caller's delimiter, quote_char, line_terminator and
+skip_lines. A CRLF file or a stray quote then silently produces mangled rows
+or a failed load. profile_file detects the actual layout from the head of the
+file and scans the whole file once, in large chunks, to count lines and
+records and to record record byte offsets.
+
+Records are split the way LOAD DATA splits them: a line terminator ends a
+record unless it is escaped (ESCAPED BY '\\', the default) or inside a
+quoted field. Quote state is carried across lines and chunks, so a quoted
+field holding a line break is one record, and an escaped \\" does not open
+or close a field. A quote still open at the end of the file is reported with
+the line it was opened on.
+
+The start offset of every `stride`-th record is kept in a compact row index
+(<file>.rowidx). It is reused for chunking, sampling and reporting errors by
+record number without rescanning the file. The index is written to a
+bor-rowidx directory under the system temp directory, never next to the
+input: incoming directories may be read-only and are matched by the
+deployment file patterns. Callers that build one remove it with
+remove_row_index when done.
+
+numpy is used for the offset scan when available (it is installed with
+pandas); otherwise a slower pure-Python scan is used.
+"""
+import bisect
+import codecs
+import csv
+import mmap
+import os
+import re
+import struct
+import tempfile
+import zlib
+from array import array
+from collections import Counter
+from typing import Callable, Dict, Any, Iterator, List, Optional, Tuple
+
+from prefect import task
+
+SAMPLE_BYTES = 256 * 1024
+SCAN_CHUNK_BYTES = 64 * 1024 * 1024
+DEFAULT_STRIDE = 64
+
+# LOAD DATA's default ESCAPED BY character
+ESCAPE_CHAR = "\\"
+
+DELIMITER_CANDIDATES = [',', '\t', ';', '|']
+
+BOMS = [
+    (b"\xef\xbb\xbf", "utf-8-sig"),
+    (b"\xff\xfe", "utf-16-le"),
+    (b"\xfe\xff", "utf-16-be"),
+]
+
+# Row index layout: magic, file size, file mtime, record count, stride, then uint64 record offsets
+INDEX_MAGIC = b"BORIDX02"
+INDEX_HEADER = struct.Struct("<8sQdQQ")
+INDEX_DIRNAME = "bor-rowidx"
+
+
+def detect_encoding(sample: bytes) -> Tuple[str, int]:
+    """Return (encoding, BOM length) for the head of a file."""
+    for bom, encoding in BOMS:
+        if sample.startswith(bom):
+            return encoding, len(bom)
+    try:
+        sample.decode("ascii")
+        return "ascii", 0
+    except UnicodeDecodeError:
+        pass
+    try:
+        # Incremental decode tolerates a multi-byte character cut off at the end of the sample
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8", 0
+    except UnicodeDecodeError:
+        return "latin-1", 0
+
+
+def detect_line_terminator(sample: bytes) -> Dict[str, Any]:
+    """Count CRLF, LF and CR terminators in a sample and pick the dominant one."""
+    crlf = sample.count(b"\r\n")
+    counts = {
+        "\r\n": crlf,
+        "\n": sample.count(b"\n") - crlf,
+        "\r": sample.count(b"\r") - crlf
+    }
+    terminator = max(counts, key=counts.get) if any(counts.values()) else "\n"
+    return {
+        "line_terminator": terminator,
+        "mixed_terminators": sum(1 for c in counts.values() if c) > 1
+    }
+
+
+def split_records(
+    text: str,
+    line_terminator: str = '\n',
+    quote_char: str = '"',
+    escape_char: str = ESCAPE_CHAR
+) -> List[str]:
+    """Split text into records, keeping escaped and quoted line terminators inside them."""
+    pattern = "|".join(re.escape(c) for c in (escape_char, quote_char, line_terminator) if c)
+    records = []
+    start = 0
+    in_quotes = False
+    literal_until = -1
+    for match in re.finditer(pattern, text):
+        if match.start() < literal_until:
+            continue
+        token = match.group()
+        if token == escape_char:
+            literal_until = match.end() + 1
+        elif token == quote_char:
+            in_quotes = not in_quotes
+        elif not in_quotes:
+            records.append(text[start:match.start()])
+            start = match.end()
+    if start < len(text):
+        records.append(text[start:])
+    return records
+
+
+def read_sample_records(
+    records: List[str],
+    delimiter: str,
+    quote_char: str = '"',
+    escape_char: str = ESCAPE_CHAR
+) -> Iterator[List[str]]:
+    """Parse sample records with the LOAD DATA quoting rules, skipping records csv rejects."""
+    for record in records:
+        reader = csv.reader(
+            [record],
+            delimiter=delimiter,
+            quotechar=quote_char or None,
+            escapechar=escape_char or None
+        )
+        try:
+            yield next(reader)
+        except (csv.Error, StopIteration):
+            continue
+
+
+def detect_delimiter(records: List[str], quote_char: str = '"', escape_char: str = ESCAPE_CHAR) -> Dict[str, Any]:
+    """
+    Pick the delimiter giving the most consistent field count across records.
+
+    Returns the delimiter, the modal field count and the fraction of sample
+    records with that count.
+    """
+    best = {"delimiter": ',', "fields": 1, "consistency": 0.0}
+    for candidate in DELIMITER_CANDIDATES:
+        counts = Counter(len(row) for row in read_sample_records(records, candidate, quote_char, escape_char))
+        if not counts:
+            continue
+        fields, hits = counts.most_common(1)[0]
+        consistency = hits / len(records)
+        if fields > 1 and (consistency, fields) > (best["consistency"], best["fields"]):
+            best = {"delimiter": candidate, "fields": fields, "consistency": round(consistency, 3)}
+    return best
+
+
+def detect_header(
+    records: List[str],
+    delimiter: str,
+    quote_char: str = '"',
+    escape_char: str = ESCAPE_CHAR
+) -> bool:
+    """Guess whether the first record is a header: no numeric fields where later rows have them."""
+    rows = list(read_sample_records(records[:50], delimiter, quote_char, escape_char))
+    if len(rows) < 2:
+        return False
+
+    def is_number(value: str) -> bool:
+        try:
+            float(value.replace(",", ""))
+            return True
+        except ValueError:
+            return False
+
+    header, body = rows[0], rows[1:]
+    if any(is_number(value) for value in header if value):
+        return False
+    numeric_columns = [
+        i for i in range(len(header))
+        if any(i < len(row) and row[i] and is_number(row[i]) for row in body)
+    ]
+    if numeric_columns:
+        return True
+    # All-text files: a header usually has no duplicate values and differs in shape
+    return len(set(header)) == len(header) and header not in body
+
+
+def find_bytes(mm, needle: bytes, start: int, end: int, np=None):
+    """Sorted offsets of a single byte in mm[start:end], as a numpy array when np is given."""
+    if np is not None:
+        chunk = np.frombuffer(mm, dtype=np.uint8, count=end - start, offset=start)
+        found = np.flatnonzero(chunk == needle[0]) + start
+        del chunk  # release the view so the mapping can be closed
+        return found
+    offsets = []
+    found = mm.find(needle, start, end)
+    while found != -1:
+        offsets.append(found)
+        found = mm.find(needle, found + 1, end)
+    return offsets
+
+
+def scan_records(
+    mm,
+    line_terminator: str = '\n',
+    quote_char: str = '"',
+    escape_char: str = ESCAPE_CHAR,
+    start: int = 0,
+    stride: int = DEFAULT_STRIDE,
+    on_records: Optional[Callable[[bytes], None]] = None
+) -> Dict[str, Any]:
+    """
+    Count lines and records and collect the start offset of every `stride`-th record.
+
+    A terminator ends a record unless the byte before it is an unescaped
+    escape character or an odd number of unescaped quotes precede it in the
+    record. Doubled quotes inside a quoted field toggle the state twice and
+    so keep it.
+
+    on_records, when given, receives the raw bytes of the scanned records in
+    file order, one call per chunk, always cut at a record boundary. It lets
+    a caller parse the records (see reconciliation.FileControlTotals) in the
+    same pass instead of reading the file again.
+
+    Returns:
+        Dict with the physical line count, the record count, the terminators
+        inside quoted fields, the array of uint64 offsets of records
+        1, 1 + stride, ... and the offset of a quote still open at the end
+        of the file (None when every quoted field is closed)
+    """
+    terminator = line_terminator.encode()[-1:]
+    quote = quote_char.encode() if quote_char else None
+    escape = escape_char.encode() if escape_char else None
+    size = len(mm)
+
+    try:
+        import numpy as np
+    except ImportError:
+        np = None
+
+    offsets = array("Q")
+    lines = 0
+    records = 0
+    quoted_terminators = 0
+    in_quotes = False
+    opening_quote = None
+    # The first byte of the next chunk follows an unescaped escape character
+    escape_pending = False
+    # Start of the records not yet passed to on_records
+    pending = start
+
+    position = start
+    while position < size:
+        end = min(position + SCAN_CHUNK_BYTES, size)
+        terminators = find_bytes(mm, terminator, position, end, np)
+        if quote:
+            quotes = find_bytes(mm, quote, position, end, np)
+        else:
+            quotes = np.empty(0, dtype=terminators.dtype) if np is not None else []
+        lines += len(terminators)
+
+        # Escapes are rare, so they are resolved in Python
+        escaped = [position] if escape_pending else []
+        if escape:
+            for offset in find_bytes(mm, escape, position, end, np):
+                offset = int(offset)
+                if escaped and escaped[-1] == offset:
+                    continue
+                escaped.append(offset + 1)
+        escape_pending = bool(escaped) and escaped[-1] == end
+        if escaped:
+            if np is not None:
+                terminators = terminators[~np.isin(terminators, escaped)]
+                quotes = quotes[~np.isin(quotes, escaped)]
+            else:
+                literal = set(escaped)
+                terminators = [t for t in terminators if t not in literal]
+                quotes = [q for q in quotes if q not in literal]
+
+        # A terminator ends a record when the quotes before it leave no field open
+        if np is not None:
+            parity = (np.searchsorted(quotes, terminators) + in_quotes) % 2
+            ends = terminators[parity == 0] + 1
+            openers = quotes[(np.arange(len(quotes)) + in_quotes) % 2 == 0]
+            if len(openers):
+                opening_quote = int(openers[-1])
+        else:
+            ends = [t + 1 for t in terminators if (bisect.bisect_left(quotes, t) + in_quotes) % 2 == 0]
+            openers = [q for i, q in enumerate(quotes) if (i + in_quotes) % 2 == 0]
+            if openers:
+                opening_quote = openers[-1]
+        in_quotes = bool((len(quotes) + in_quotes) % 2)
+        quoted_terminators += len(terminators) - len(ends)
+
+        # Record starts are the scan start, then one byte past each record end
+        starts = ends[:-1] if len(ends) and ends[-1] == size else ends
+        if records == 0 and position == start:
+            starts = np.concatenate(([start], starts)) if np is not None else [start] + starts
+        first = (-records) % stride
+        if np is not None:
+            offsets.extend(starts[first::stride].astype(np.uint64).tolist())
+        else:
+            offsets.extend(starts[first::stride])
+        records += len(starts)
+        if on_records is not None and len(ends):
+            on_records(mm[pending:int(ends[-1])])
+            pending = int(ends[-1])
+        position = end
+
+    if on_records is not None and pending < size:
+        # Last record without a terminator
+        on_records(mm[pending:size])
+
+    # A last line without a terminator has no terminator to count
+    if size > start and mm[size - 1:size] != terminator:
+        lines += 1
+
+    return {
+        "lines": lines,
+        "records": records,
+        "quoted_terminators": quoted_terminators,
+        "offsets": offsets,
+        "open_quote": opening_quote if in_quotes else None
+    }
+
+
+def line_number_at(mm, offset: int, line_terminator: str = '\n') -> int:
+    """1-based physical line number of a byte offset."""
+    terminator = line_terminator.encode()[-1:]
+    lines = 1
+    for position in range(0, offset, SCAN_CHUNK_BYTES):
+        lines += mm[position:min(position + SCAN_CHUNK_BYTES, offset)].count(terminator)
+    return lines
+
+
+def index_path(file_path: str, index_dir: Optional[str] = None) -> str:
+    """
+    Location of the row index for a file.
+
+    The name carries a hash of the absolute path, so files with the same
+    name in different directories do not share an index.
+    """
+    index_dir = index_dir or os.path.join(tempfile.gettempdir(), INDEX_DIRNAME)
+    tag = zlib.crc32(os.path.abspath(file_path).encode("utf-8"))
+    return os.path.join(index_dir, f"{os.path.basename(file_path)}.{tag:08x}.rowidx")
+
+
+def write_row_index(file_path: str, offsets: array, records: int, stride: int, index_dir: Optional[str] = None) -> str:
+    """Write the row index and return its path."""
+    stat = os.stat(file_path)
+    path = index_path(file_path, index_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(INDEX_HEADER.pack(INDEX_MAGIC, stat.st_size, stat.st_mtime, records, stride))
+        offsets.tofile(f)
+    return path
+
+
+def load_row_index(file_path: str, index_dir: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Load the row index, or None if it is missing or stale."""
+    path = index_path(file_path, index_dir)
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(file_path)
+    with open(path, "rb") as f:
+        magic, size, mtime, records, stride = INDEX_HEADER.unpack(f.read(INDEX_HEADER.size))
+        if magic != INDEX_MAGIC or size != stat.st_size or mtime != stat.st_mtime:
+            return None
+        offsets = array("Q")
+        offsets.frombytes(f.read())
+    return {"records": records, "stride": stride, "offsets": offsets}
+
+
+def remove_row_index(file_path: str, index_dir: Optional[str] = None) -> None:
+    """Delete the row index of a file, if there is one."""
+    try:
+        os.remove(index_path(file_path, index_dir))
+    except FileNotFoundError:
+        pass
+
+
+def record_end(
+    mm,
+    offset: int,
+    line_terminator: str = '\n',
+    quote_char: str = '"',
+    escape_char: str = ESCAPE_CHAR
+) -> Tuple[int, int]:
+    """
+    Find the end of the record starting at `offset`.
+
+    Returns:
+        (offset of its terminator, offset of the next record); both are the
+        file size for a last record without a terminator
+    """
+    terminator = line_terminator.encode()
+    tokens = [c.encode() for c in (escape_char, quote_char) if c] + [terminator]
+    pattern = re.compile(b"|".join(re.escape(token) for token in tokens))
+    in_quotes = False
+    literal_until = -1
+    for match in pattern.finditer(mm, offset):
+        if match.start() < literal_until:
+            continue
+        token = match.group()
+        if escape_char and token == escape_char.encode():
+            literal_until = match.end() + 1
+        elif quote_char and token == quote_char.encode():
+            in_quotes = not in_quotes
+        elif not in_quotes:
+            return match.start(), match.end()
+    return len(mm), len(mm)
+
+
+def record_offset(
+    file_path: str,
+    row_index: Dict[str, Any],
+    record_number: int,
+    line_terminator: str = '\n',
+    quote_char: str = '"',
+    escape_char: str = ESCAPE_CHAR
+) -> int:
+    """Byte offset of a 1-based record number."""
+    if not 1 <= record_number <= row_index["records"]:
+        raise IndexError(f"Record {record_number} out of range 1..{row_index['records']}")
+    slot, skip = divmod(record_number - 1, row_index["stride"])
+    offset = row_index["offsets"][slot]
+    if skip:
+        with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for _ in range(skip):
+                offset = record_end(mm, offset, line_terminator, quote_char, escape_char)[1]
+    return offset
+
+
+def read_records(
+    file_path: str,
+    row_index: Dict[str, Any],
+    record_number: int,
+    count: int = 1,
+    line_terminator: str = '\n',
+    quote_char: str = '"',
+    escape_char: str = ESCAPE_CHAR,
+    encoding: str = "utf-8"
+) -> List[str]:
+    """Read `count` raw records starting at a 1-based record number, e.g. for error reports."""
+    offset = record_offset(file_path, row_index, record_number, line_terminator, quote_char, escape_char)
+    records = []
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for _ in range(count):
+            if offset >= len(mm):
+                break
+            end, next_offset = record_end(mm, offset, line_terminator, quote_char, escape_char)
+            records.append(mm[offset:end].decode(encoding, errors="replace"))
+            offset = next_offset
+    return records
+
+
+def chunk_boundaries(
+    file_path: str,
+    row_index: Dict[str, Any],
+    chunks: int,
+    first_record: int = 1,
+    line_terminator: str = '\n',
+    quote_char: str = '"',
+    escape_char: str = ESCAPE_CHAR
+) -> List[Tuple[int, int]]:
+    """
+    Split a file into up to `chunks` byte ranges starting on record boundaries.
+
+    Records before `first_record` (headers) are excluded. The index holds
+    record offsets, so a quoted line break never splits a record.
+    """
+    if row_index["records"] < first_record:
+        return []
+    file_size = os.path.getsize(file_path)
+    data_start = record_offset(file_path, row_index, first_record, line_terminator, quote_char, escape_char)
+    candidates = [offset for offset in row_index["offsets"] if offset > data_start]
+    splits = sorted({candidates[(len(candidates) * k) // chunks] for k in range(1, chunks)}) if candidates else []
+    starts = [data_start] + splits
+    ends = splits + [file_size]
+    return list(zip(starts, ends))
+
+
+def profile_file(
+    file_path: str,
+    quote_char: str = '"',
+    escape_char: str = ESCAPE_CHAR,
+    build_index: bool = True,
+    stride: int = DEFAULT_STRIDE,
+    index_dir: Optional[str] = None,
+    on_records: Optional[Callable[[bytes, str], None]] = None
+) -> Dict[str, Any]:
+    """
+    Profile a delimited file.
+
+    Detects encoding/BOM, line terminator, delimiter and header from the
+    first SAMPLE_BYTES, then scans the full file once to count lines and
+    records, follow the quoting and, if requested, write the row index.
+
+    Args:
+        file_path: Path to the input file
+        quote_char: Quote character of the fields
+        escape_char: Escape character of the load, LOAD DATA's default '\\'
+        build_index: Write the row index (see index_path)
+        stride: Keep the offset of every stride-th record in the index
+        index_dir: Directory for the index, defaults to bor-rowidx under the temp directory
+        on_records: Optional consumer of the raw records of the full scan (see scan_records),
+            called with each run of records and the detected encoding
+
+    Returns:
+        Profile with the detected layout, line/record counts and quote checks
+    """
+    file_size = os.path.getsize(file_path)
+    if file_size == 0:
+        return {"file_path": file_path, "file_bytes": 0, "lines": 0, "records": 0, "data_rows": 0}
+
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        sample = mm[:SAMPLE_BYTES]
+        encoding, bom_length = detect_encoding(sample)
+        terminator_info = detect_line_terminator(sample)
+        line_terminator = terminator_info["line_terminator"]
+
+        text = sample[bom_length:].decode(encoding.replace("-sig", ""), errors="replace")
+        sample_records = split_records(text, line_terminator, quote_char, escape_char)
+        if len(sample) < file_size:
+            sample_records = sample_records[:-1]
+        sample_records = [record for record in sample_records if record][:1000]
+
+        delimiter_info = detect_delimiter(sample_records, quote_char, escape_char)
+        has_header = detect_header(sample_records, delimiter_info["delimiter"], quote_char, escape_char)
+
+        consume = None
+        if on_records is not None:
+            def consume(data: bytes) -> None:
+                on_records(data, encoding)
+        scan = scan_records(
+            mm, line_terminator, quote_char, escape_char, start=bom_length, stride=stride, on_records=consume
+        )
+        open_quote_line = None
+        if scan["open_quote"] is not None:
+            open_quote_line = line_number_at(mm, scan["open_quote"], line_terminator)
+
+    records = scan["records"]
+    profile = {
+        "file_path": file_path,
+        "file_bytes": file_size,
+        "encoding": encoding,
+        "bom": bom_length > 0,
+        "line_terminator": line_terminator,
+        "mixed_terminators": terminator_info["mixed_terminators"],
+        "delimiter": delimiter_info["delimiter"],
+        "fields": delimiter_info["fields"],
+        "field_consistency": delimiter_info["consistency"],
+        "has_header": has_header,
+        "lines": scan["lines"],
+        "records": records,
+        "data_rows": max(records - (1 if has_header else 0), 0),
+        "avg_row_bytes": round(file_size / records, 1) if records else 0,
+        "quoted_terminators": scan["quoted_terminators"],
+        "open_quote_line": open_quote_line
+    }
+    if build_index:
+        profile["row_index"] = write_row_index(file_path, scan["offsets"], records, stride, index_dir)
+    return profile
+
+
+def check_load_parameters(
+    profile: Dict[str, Any],
+    delimiter: str,
+    quote_char: str,
+    line_terminator: str,
+    skip_lines: int
+) -> Dict[str, List[str]]:
+    """
+    Compare caller-supplied load parameters with a profile.
+
+    Returns:
+        {"errors": [...], "warnings": [...]}. Errors would mangle or fail the
+        load; warnings come from the header heuristic and may be wrong.
+    """
+    problems = []
+    warnings = []
+    if profile.get("records", 0) == 0:
+        return {"errors": problems, "warnings": warnings}
+    if profile["line_terminator"] != line_terminator:
+        problems.append(
+            f"line terminator is {profile['line_terminator']!r}, load uses {line_terminator!r}"
+        )
+    if profile["mixed_terminators"]:
+        problems.append("file mixes line terminators")
+    if profile["delimiter"] != delimiter and profile["field_consistency"] > 0.9:
+        problems.append(f"delimiter looks like {profile['delimiter']!r}, load uses {delimiter!r}")
+    if profile["has_header"] and skip_lines == 0:
+        warnings.append("first line looks like a header but skip_lines is 0")
+    if not profile["has_header"] and skip_lines > 0:
+        warnings.append(f"no header detected but skip_lines={skip_lines} would drop data rows")
+    if profile["encoding"].startswith("utf-16"):
+        problems.append(f"{profile['encoding']} input is not supported by LOAD DATA as configured")
+    if profile["bom"] and skip_lines == 0:
+        problems.append("byte order mark would end up in the first field of the first row")
+    if profile["open_quote_line"]:
+        problems.append(f"{quote_char} quoted field opened on line {profile['open_quote_line']} is never closed")
+    return {"errors": problems, "warnings": warnings}
+
+
+@task
+def profile_input_file(
+    file_path: str,
+    quote_char: str = '"',
+    build_index: bool = True,
+    index_dir: Optional[str] = None,
+    on_records: Optional[Callable[[bytes, str], None]] = None
+) -> Dict[str, Any]:
+    """Profile an input file and write its row index. See profile_file."""
+    return profile_file(
+        file_path, quote_char=quote_char, build_index=build_index, index_dir=index_dir, on_records=on_records
+    )
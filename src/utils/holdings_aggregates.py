@@ -0,0 +1,190 @@
+"""
+Incrementally maintained holdings aggregates.
+
+Downstream reports aggregate holdweb by fund and sector or currency. Instead
+of scanning the holdings on every request, ImportWebHoldWorkflow keeps
+borarch.holdweb_agg up to date after each load: only the (date, fund_name)
+slices of the loaded file are replaced. Reads are primary key lookups. See
+ref/10.ddl-borarch-holdweb-agg.sql.
+
+The aggregates are built from every holdweb row of a slice. Two identical
+rows are two lots (e.g. two equal lots of the same security) and both count,
+as they do in the post-load reconciliation. holdweb must therefore hold each
+slice once: ImportWebHoldWorkflow refuses maintain_aggregates unless holdweb
+is truncated before the load. In a coalesced run holdweb is truncated before
+the first batch only, so it also holds the earlier batches of the run; their
+slices are left alone.
+"""
+from pathlib import Path
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from prefect import task
+
+from .columnar_input import columnar_format, iter_rows
+from .db_backend import get_backend, read_delimited
+
+# Aggregate dimension name -> holdweb column
+AGGREGATE_DIMENSIONS = {
+    "sector": "sector",
+    "currency": "currency"
+}
+
+
+def file_slices(
+    file_path: str,
+    field_mappings: Dict[str, str],
+    delimiter: str = ',',
+    quote_char: str = '"',
+    line_terminator: str = '\n',
+    skip_lines: int = 1
+) -> Optional[List[Tuple[Any, Any]]]:
+    """
+    The distinct (date, fund_name) pairs of a holdings file, or None if it cannot be read here.
+
+    Only the two columns are read from Parquet/Arrow files; a delimited file is
+    parsed in full, one extra pass over a file that is in the page cache after
+    its load.
+    """
+    if not Path(file_path).exists():
+        return None
+    sources = {target: source for source, target in field_mappings.items()}
+    if columnar_format(file_path):
+        rows = (row for batch in iter_rows(file_path, [sources["date"], sources["fund_name"]]) for row in batch)
+    else:
+        positions = [list(field_mappings).index(sources[column]) for column in ("date", "fund_name")]
+        rows = (
+            [row[i] for i in positions]
+            for row in read_delimited(file_path, delimiter, quote_char, line_terminator, skip_lines, len(field_mappings))
+        )
+    return sorted({tuple(row) for row in rows})
+
+
+def slice_filter(slices: Iterable[Tuple[Any, Any]], placeholder: str) -> tuple:
+    """WHERE clause and parameters selecting the given (date, fund_name) slices."""
+    slices = list(slices)
+    pairs = ", ".join([f"({placeholder}, {placeholder})"] * len(slices))
+    return f"(date, fund_name) IN ({pairs})", [value for pair in slices for value in pair]
+
+
+@task(retries=3, retry_delay_seconds=60)
+def refresh_holdings_aggregates(
+    db_config: dict,
+    source_table: str = "borarch.holdweb",
+    aggregate_table: str = "borarch.holdweb_agg",
+    dimensions: Optional[Dict[str, str]] = None,
+    slices: Optional[List[Tuple[Any, Any]]] = None
+) -> bool:
+    """
+    Replace the aggregate slices of the newly loaded holdings.
+
+    Only the given (date, fund_name) slices are deleted and rebuilt, so the
+    work done is proportional to the loaded delta, not to what holdweb or the
+    aggregate history hold. Each slice is aggregated over all of its
+    holdings rows. Weights are market value over the fund's total market
+    value for the date.
+
+    Args:
+        db_config: Database connection configuration
+        source_table: Table holding the newly loaded holdings
+        aggregate_table: Aggregate table to maintain
+        dimensions: Optional mapping of dimension name to source column
+        slices: (date, fund_name) pairs that were loaded, see file_slices;
+            every slice in `source_table` when None
+    """
+    dimensions = dimensions or AGGREGATE_DIMENSIONS
+    backend = get_backend(db_config)
+    try:
+        conn = backend.connect()
+        cursor = conn.cursor()
+
+        if slices is None:
+            cursor.execute(f"SELECT DISTINCT date, fund_name FROM {source_table}")
+            slices = cursor.fetchall()
+        if not slices:
+            return True
+        where, params = slice_filter(slices, backend.placeholder)
+
+        for dimension, column in dimensions.items():
+            cursor.execute(
+                f"DELETE FROM {aggregate_table} WHERE dimension = {backend.placeholder} AND {where}",
+                [dimension] + params
+            )
+            cursor.execute(
+                f"""
+                INSERT INTO {aggregate_table}
+                    (dimension, fund_name, date, dim_value, positions, units, cost, mv, weight)
+                SELECT {backend.placeholder}, fund_name, date, COALESCE({column}, ''), COUNT(*),
+                       SUM(units), SUM(cost), SUM(mv),
+                       SUM(mv) / NULLIF(SUM(SUM(mv)) OVER (PARTITION BY date, fund_name), 0)
+                FROM {source_table}
+                WHERE {where}
+                GROUP BY fund_name, date, COALESCE({column}, '')
+                """,
+                [dimension] + params
+            )
+
+        conn.commit()
+        return True
+    except Exception as e:
+        print(f"Error refreshing holdings aggregates: {str(e)}")
+        return False
+    finally:
+        if 'cursor' in locals():
+            cursor.close()
+        if 'conn' in locals():
+            conn.close()
+
+
+def get_holdings_aggregate(
+    db_config: dict,
+    fund_name: str,
+    dimension: str,
+    as_of_date: Optional[str] = None,
+    aggregate_table: str = "borarch.holdweb_agg"
+) -> List[Dict[str, Any]]:
+    """
+    Read one fund's aggregate for a dimension.
+
+    Served from the aggregate table's primary key, so the cost depends on the
+    number of returned rows only. Without `as_of_date` the latest available
+    date for the fund is used.
+
+    Args:
+        db_config: Database connection configuration
+        fund_name: Fund name as loaded into holdweb
+        dimension: One of AGGREGATE_DIMENSIONS
+        as_of_date: Optional date (YYYY-MM-DD)
+        aggregate_table: Aggregate table to read
+
+    Returns:
+        One dict per dimension value with positions, units, cost, mv and weight
+    """
+    if dimension not in AGGREGATE_DIMENSIONS:
+        raise ValueError(f"Unknown aggregate dimension: {dimension}")
+    backend = get_backend(db_config)
+    marker = backend.placeholder
+    conn = backend.connect()
+    try:
+        cursor = conn.cursor()
+        if as_of_date is None:
+            cursor.execute(
+                f"SELECT MAX(date) FROM {aggregate_table} "
+                f"WHERE dimension = {marker} AND fund_name = {marker}",
+                (dimension, fund_name)
+            )
+            as_of_date = cursor.fetchone()[0]
+            if as_of_date is None:
+                return []
+        cursor.execute(
+            f"""
+            SELECT date, dim_value, positions, units, cost, mv, weight
+            FROM {aggregate_table}
+            WHERE dimension = {marker} AND fund_name = {marker} AND date = {marker}
+            ORDER BY mv DESC
+            """,
+            (dimension, fund_name, as_of_date)
+        )
+        columns = [d[0] for d in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    finally:
+        conn.close()
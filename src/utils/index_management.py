@@ -0,0 +1,313 @@
+"""
+Secondary index helpers for the deferred index bulk-load mode.
+
+In deferred mode the secondary and unique indexes of the target table are
+dropped before LOAD DATA INFILE and rebuilt afterwards with a single
+ALTER TABLE, so InnoDB builds each index with one sorted pass instead of
+maintaining it row by row. Uniqueness and foreign keys are validated with
+aggregate queries before the load is committed.
+
+Each index is rebuilt from its own clause of SHOW CREATE TABLE, so the sort
+order, prefix lengths, comment, visibility and key expressions of the
+original come back unchanged. An index that cannot be reproduced that way,
+or a unique index on an expression (its keys cannot be validated with a
+column GROUP BY), is never dropped: it stays on the table during the load.
+"""
+import re
+from typing import Dict, Any, List, Tuple
+
+from .progress_monitor import get_logger
+
+# A secondary index clause of SHOW CREATE TABLE, e.g.
+#   UNIQUE KEY `uq_fund` (`fund`,`date` DESC) COMMENT 'x' /*!80000 INVISIBLE */,
+INDEX_CLAUSE = re.compile(r"^\s*((?:UNIQUE )?KEY `((?:[^`]|``)+)` \(.*?),?\s*$")
+
+
+class DeferredIndexError(Exception):
+    """Raised when a deferred-index load would violate a unique or foreign key."""
+
+    def __init__(self, target_table: str, violations: List[Dict[str, Any]]):
+        self.target_table = target_table
+        self.violations = violations
+        super().__init__(format_violation_report(target_table, violations))
+
+
+def split_table_name(cursor, target_table: str) -> Tuple[str, str]:
+    """Split database.table, defaulting the schema to the current database."""
+    if '.' in target_table:
+        schema, table = target_table.split('.', 1)
+        return schema, table
+    cursor.execute("SELECT DATABASE()")
+    return cursor.fetchone()[0], target_table
+
+
+def parse_index_definitions(create_table: str) -> Dict[str, str]:
+    """
+    Extract the secondary index clauses from a SHOW CREATE TABLE statement.
+
+    Args:
+        create_table: The CREATE TABLE statement
+
+    Returns:
+        Dict mapping index name to its clause, e.g. "KEY `ix_date` (`date` DESC)"
+    """
+    definitions = {}
+    for line in create_table.splitlines():
+        match = INDEX_CLAUSE.match(line)
+        if match:
+            definitions[match.group(2).replace("``", "`")] = match.group(1)
+    return definitions
+
+
+def get_index_definitions(cursor, target_table: str) -> Dict[str, str]:
+    """Return the secondary index clauses of a table as MySQL itself renders them."""
+    cursor.execute(f"SHOW CREATE TABLE {target_table}")
+    return parse_index_definitions(cursor.fetchone()[1])
+
+
+def get_secondary_indexes(cursor, target_table: str) -> List[Dict[str, Any]]:
+    """
+    Return the non-primary indexes of a table that can be dropped and rebuilt.
+
+    Indexes that back a foreign key of this table, or that serve as the
+    parent key of another table's foreign key, are left out because InnoDB
+    refuses to drop them while the constraint exists. So are indexes whose
+    clause is missing from SHOW CREATE TABLE and unique indexes on an
+    expression; these are reported and stay in place.
+    """
+    schema, table = split_table_name(cursor, target_table)
+    cursor.execute(
+        """
+        SELECT INDEX_NAME, NON_UNIQUE, COLUMN_NAME, INDEX_TYPE
+        FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND INDEX_NAME <> 'PRIMARY'
+        ORDER BY INDEX_NAME, SEQ_IN_INDEX
+        """,
+        (schema, table)
+    )
+    indexes: Dict[str, Dict[str, Any]] = {}
+    for index_name, non_unique, column_name, index_type in cursor.fetchall():
+        index = indexes.setdefault(index_name, {
+            "name": index_name,
+            "unique": not int(non_unique),
+            "columns": [],
+            "index_type": index_type
+        })
+        # COLUMN_NAME is NULL for a key part that is an expression
+        index["columns"].append(column_name)
+
+    definitions = get_index_definitions(cursor, target_table)
+    fk_columns = [fk["columns"] for fk in get_foreign_keys(cursor, target_table)]
+    fk_columns += get_referenced_keys(cursor, target_table)
+    logger = get_logger(__name__)
+    secondary = []
+    for index in indexes.values():
+        if index["index_type"] != "BTREE":
+            continue
+        if any(index["columns"][:len(cols)] == cols for cols in fk_columns):
+            continue
+        if index["name"] not in definitions:
+            logger.warning(f"Keeping index {index['name']} on {target_table}: its definition cannot be reproduced")
+            continue
+        if index["unique"] and None in index["columns"]:
+            logger.warning(
+                f"Keeping index {index['name']} on {target_table}: unique keys on an expression cannot be validated"
+            )
+            continue
+        index["definition"] = definitions[index["name"]]
+        secondary.append(index)
+    return secondary
+
+
+def has_unique_indexes(cursor, target_table: str) -> bool:
+    """Return True if the table has a unique secondary index (one that stays in place during the load)."""
+    schema, table = split_table_name(cursor, target_table)
+    cursor.execute(
+        """
+        SELECT COUNT(*) FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s
+          AND INDEX_NAME <> 'PRIMARY' AND NON_UNIQUE = 0
+        """,
+        (schema, table)
+    )
+    return cursor.fetchone()[0] > 0
+
+
+def get_foreign_keys(cursor, target_table: str) -> List[Dict[str, Any]]:
+    """Return the foreign keys declared on a table."""
+    schema, table = split_table_name(cursor, target_table)
+    cursor.execute(
+        """
+        SELECT CONSTRAINT_NAME, COLUMN_NAME, REFERENCED_TABLE_SCHEMA,
+               REFERENCED_TABLE_NAME, REFERENCED_COLUMN_NAME
+        FROM information_schema.KEY_COLUMN_USAGE
+        WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s
+          AND REFERENCED_TABLE_NAME IS NOT NULL
+        ORDER BY CONSTRAINT_NAME, ORDINAL_POSITION
+        """,
+        (schema, table)
+    )
+    foreign_keys: Dict[str, Dict[str, Any]] = {}
+    for name, column, ref_schema, ref_table, ref_column in cursor.fetchall():
+        fk = foreign_keys.setdefault(name, {
+            "name": name,
+            "columns": [],
+            "referenced_table": f"{ref_schema}.{ref_table}",
+            "referenced_columns": []
+        })
+        fk["columns"].append(column)
+        fk["referenced_columns"].append(ref_column)
+    return list(foreign_keys.values())
+
+
+def get_referenced_keys(cursor, target_table: str) -> List[List[str]]:
+    """Return the column lists of this table that other tables' foreign keys reference."""
+    schema, table = split_table_name(cursor, target_table)
+    cursor.execute(
+        """
+        SELECT TABLE_SCHEMA, TABLE_NAME, CONSTRAINT_NAME, REFERENCED_COLUMN_NAME
+        FROM information_schema.KEY_COLUMN_USAGE
+        WHERE REFERENCED_TABLE_SCHEMA = %s AND REFERENCED_TABLE_NAME = %s
+        ORDER BY TABLE_SCHEMA, TABLE_NAME, CONSTRAINT_NAME, ORDINAL_POSITION
+        """,
+        (schema, table)
+    )
+    referenced: Dict[Tuple[str, str, str], List[str]] = {}
+    for child_schema, child_table, name, column in cursor.fetchall():
+        referenced.setdefault((child_schema, child_table, name), []).append(column)
+    return list(referenced.values())
+
+
+def index_definition(index: Dict[str, Any]) -> str:
+    """Render an index as an ALTER TABLE ... ADD clause, from its SHOW CREATE TABLE clause."""
+    return f"ADD {index['definition']}"
+
+
+def drop_secondary_indexes(cursor, target_table: str, indexes: List[Dict[str, Any]]) -> None:
+    """Drop the given indexes with a single ALTER TABLE."""
+    if not indexes:
+        return
+    drops = ", ".join(f"DROP INDEX `{index['name']}`" for index in indexes)
+    cursor.execute(f"ALTER TABLE {target_table} {drops}")
+
+
+def rebuild_indexes(cursor, target_table: str, indexes: List[Dict[str, Any]]) -> None:
+    """Re-create the given indexes with a single ALTER TABLE (one sorted build pass)."""
+    if not indexes:
+        return
+    adds = ", ".join(index_definition(index) for index in indexes)
+    cursor.execute(f"ALTER TABLE {target_table} {adds}")
+
+
+def restore_indexes(cursor, target_table: str, indexes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Re-create whichever of the given indexes are missing and return them.
+
+    Safe to call whether the drop ran, failed or was only partly applied.
+    """
+    schema, table = split_table_name(cursor, target_table)
+    cursor.execute(
+        """
+        SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s
+        """,
+        (schema, table)
+    )
+    present = {row[0] for row in cursor.fetchall()}
+    missing = [index for index in indexes if index["name"] not in present]
+    rebuild_indexes(cursor, target_table, missing)
+    return missing
+
+
+def find_unique_violations(
+    cursor,
+    target_table: str,
+    indexes: List[Dict[str, Any]],
+    limit: int = 20
+) -> List[Dict[str, Any]]:
+    """
+    Find duplicate keys for every unique index.
+
+    Rows with a NULL in any key column are ignored, matching how MySQL
+    enforces unique indexes.
+    """
+    violations = []
+    for index in indexes:
+        if not index["unique"]:
+            continue
+        columns = ", ".join(f"`{c}`" for c in index["columns"])
+        not_null = " AND ".join(f"`{c}` IS NOT NULL" for c in index["columns"])
+        cursor.execute(
+            f"""
+            SELECT {columns}, COUNT(*) AS duplicates
+            FROM {target_table}
+            WHERE {not_null}
+            GROUP BY {columns}
+            HAVING COUNT(*) > 1
+            LIMIT {int(limit)}
+            """
+        )
+        rows = cursor.fetchall()
+        if rows:
+            violations.append({
+                "constraint": index["name"],
+                "type": "unique",
+                "columns": index["columns"],
+                "samples": [
+                    {"key": dict(zip(index["columns"], row[:-1])), "count": row[-1]}
+                    for row in rows
+                ]
+            })
+    return violations
+
+
+def find_foreign_key_violations(
+    cursor,
+    target_table: str,
+    foreign_keys: List[Dict[str, Any]],
+    limit: int = 20
+) -> List[Dict[str, Any]]:
+    """Find child rows whose foreign key has no matching parent row."""
+    violations = []
+    for fk in foreign_keys:
+        join = " AND ".join(
+            f"p.`{ref}` = c.`{col}`" for col, ref in zip(fk["columns"], fk["referenced_columns"])
+        )
+        not_null = " AND ".join(f"c.`{c}` IS NOT NULL" for c in fk["columns"])
+        columns = ", ".join(f"c.`{c}`" for c in fk["columns"])
+        first_ref = fk["referenced_columns"][0]
+        cursor.execute(
+            f"""
+            SELECT {columns}, COUNT(*) AS orphans
+            FROM {target_table} c
+            LEFT JOIN {fk['referenced_table']} p ON {join}
+            WHERE {not_null} AND p.`{first_ref}` IS NULL
+            GROUP BY {columns}
+            LIMIT {int(limit)}
+            """
+        )
+        rows = cursor.fetchall()
+        if rows:
+            violations.append({
+                "constraint": fk["name"],
+                "type": "foreign_key",
+                "columns": fk["columns"],
+                "samples": [
+                    {"key": dict(zip(fk["columns"], row[:-1])), "count": row[-1]}
+                    for row in rows
+                ]
+            })
+    return violations
+
+
+def format_violation_report(target_table: str, violations: List[Dict[str, Any]]) -> str:
+    """Format constraint violations as a readable multi-line report."""
+    lines = [f"Constraint violations in {target_table}:"]
+    for violation in violations:
+        lines.append(
+            f"  {violation['type']} {violation['constraint']} ({', '.join(violation['columns'])}):"
+        )
+        for sample in violation["samples"]:
+            key = ", ".join(f"{k}={v!r}" for k, v in sample["key"].items())
+            lines.append(f"    {key} -> {sample['count']} rows")
+    return "\n".join(lines)
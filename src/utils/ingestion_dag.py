@@ -0,0 +1,337 @@
+"""
+Run several ingestion workflows as one dependency graph.
+
+Every step is an existing BaseIngestionWorkflow plus the file it loads. All
+staging loads are submitted at once and run concurrently, each with a hook
+task downstream of it: the file is reconciled with the table if the workflow
+asks for it (the load task scans the file for its control totals first) and
+the workflow's after_load hook runs. A step's stored
+procedure is submitted once its hook and the procedures it depends on have
+finished. Hooks and procedures run as tasks, so a long hook (history
+exchange, aggregate refresh) does not hold up the other steps, and
+independent procedures run in parallel.
+
+Each load, hook and procedure is timed. The resulting report lists every
+node with its wait and run time and marks the critical path, i.e. the
+chain of nodes that determined the total run time. For workflows with
+track_latency, the same timings are recorded against each file's arrival
+in bormeta.ingest_latency (see latency.py).
+"""
+import time
+from typing import Dict, Any, List, Optional
+
+from prefect import task
+from prefect.cache_policies import NO_CACHE
+
+from .base_ingestion import BaseIngestionWorkflow, load_data_to_staging, execute_stored_procedure
+from .tracing import span
+from .latency import LatencyTracker
+
+# Seconds between checks of running tasks
+POLL_INTERVAL = 0.2
+
+
+def ingestion_step(
+    name: str,
+    workflow: BaseIngestionWorkflow,
+    file_path: str,
+    depends_on: Optional[List[str]] = None,
+    truncate_before_load: Optional[bool] = None,
+    **load_options
+) -> Dict[str, Any]:
+    """
+    Declare one step of an ingestion graph.
+
+    Args:
+        name: Step name, referenced by depends_on of other steps
+        workflow: Workflow providing the target table, mappings and procedure
+        file_path: Path to the input file in the shared volume
+        depends_on: Steps whose procedures must finish before this step's procedure runs
+        truncate_before_load: Optional override of the workflow's truncate default
+        load_options: delimiter, quote_char, line_terminator and skip_lines for the load
+    """
+    return {
+        "name": name,
+        "workflow": workflow,
+        "file_path": file_path,
+        "depends_on": list(depends_on or []),
+        "truncate_before_load": workflow.resolve_truncate(truncate_before_load),
+        "load_options": load_options
+    }
+
+
+def check_dependencies(steps: List[Dict[str, Any]]) -> List[str]:
+    """Validate the declared dependencies and return the step names in topological order."""
+    names = [step["name"] for step in steps]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate step names: {names}")
+    depends_on = {step["name"]: step["depends_on"] for step in steps}
+    for name, deps in depends_on.items():
+        unknown = [dep for dep in deps if dep not in depends_on]
+        if unknown:
+            raise ValueError(f"Step {name} depends on unknown steps: {unknown}")
+
+    ordered = []
+    remaining = dict(depends_on)
+    while remaining:
+        ready = [name for name, deps in remaining.items() if all(dep in ordered for dep in deps)]
+        if not ready:
+            raise ValueError(f"Dependency cycle between steps: {sorted(remaining)}")
+        for name in ready:
+            ordered.append(name)
+            del remaining[name]
+    return ordered
+
+
+# The DAG tasks take workflow and backend objects, which cannot be hashed into a cache key
+@task(cache_policy=NO_CACHE)
+def timed_load(step: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+    """Scan the file for its control totals if the step reconciles, run load_data_to_staging and record when it ran."""
+    started = time.time()
+    workflow = step["workflow"]
+    file_totals = None
+    if workflow.reconcile:
+        file_totals = workflow.scan_control_totals(
+            step["file_path"], step["load_options"], step["truncate_before_load"]
+        )
+    ok = load_data_to_staging.fn(**kwargs)
+    return {"ok": ok, "started": started, "finished": time.time(), "file_totals": file_totals}
+
+
+@task(cache_policy=NO_CACHE)
+def timed_hook(load: Dict[str, Any], step: Dict[str, Any], db_config: dict) -> Dict[str, Any]:
+    """Reconcile and run the after_load hook of a step once its load has finished."""
+    if not load["ok"]:
+        return {"ok": False, "skipped": True}
+    workflow = step["workflow"]
+    started = time.time()
+    try:
+        if load["file_totals"] is not None:
+            with span("reconcile", file=step["file_path"], step=step["name"]):
+                workflow.check_control_totals(db_config, load["file_totals"])
+        with span("after_load", file=step["file_path"], step=step["name"]):
+            workflow.after_load(db_config, step["file_path"], step["load_options"])
+        ok, error = True, None
+    except Exception as e:
+        ok, error = False, str(e)
+    return {"ok": ok, "error": error, "ready": load["finished"], "started": started, "finished": time.time()}
+
+
+@task(cache_policy=NO_CACHE)
+def timed_procedure(**kwargs) -> Dict[str, Any]:
+    """Run execute_stored_procedure and record when it ran."""
+    started = time.time()
+    ok = execute_stored_procedure.fn(**kwargs)
+    return {"ok": ok, "started": started, "finished": time.time()}
+
+
+def run_ingestion_dag(steps: List[Dict[str, Any]], db_config: dict, logger) -> Dict[str, Any]:
+    """
+    Run the loads, hooks and procedures of all steps.
+
+    Must be called from inside a flow. A failed node does not stop
+    independent nodes; its dependents are skipped.
+
+    Args:
+        steps: Steps declared with ingestion_step
+        db_config: Database connection configuration
+        logger: Run logger
+
+    Returns:
+        Dict with per-node timings, the critical path and the failed/skipped nodes
+    """
+    check_dependencies(steps)
+    for step in steps:
+        step["workflow"].check_backend(db_config)
+    by_name = {step["name"]: step for step in steps}
+    run_started = time.time()
+    trackers = {
+        step["name"]: LatencyTracker(
+            step["workflow"].name, step["workflow"].target_table, [step["file_path"]], step["workflow"].latency_slo
+        )
+        for step in steps if step["workflow"].track_latency
+    }
+    nodes: Dict[str, Dict[str, Any]] = {}
+    futures: Dict[str, Any] = {}
+    running: Dict[str, Any] = {}
+
+    def add_node(node: str, step: str, after: List[str]) -> Dict[str, Any]:
+        nodes[node] = {"node": node, "step": step, "after": after, "ready": time.time()}
+        return nodes[node]
+
+    # All loads start immediately, each hook as soon as its load has finished
+    for step in steps:
+        workflow = step["workflow"]
+        load, hook = f"load:{step['name']}", f"after_load:{step['name']}"
+        add_node(load, step["name"], [])
+        futures[load] = running[load] = timed_load.submit(
+            step=step,
+            file_path=step["file_path"],
+            db_config=db_config,
+            target_table=workflow.target_table,
+            field_mappings=workflow.field_mappings,
+            field_transformations=workflow.field_transformations,
+            truncate_before_load=step["truncate_before_load"],
+            deferred_indexes=workflow.deferred_indexes,
+            progress_interval=workflow.progress_interval,
+            stall_timeout=workflow.stall_timeout,
+            expected_rows=workflow.expected_rows(
+                step["file_path"], None, None,
+                step["load_options"].get("delimiter", ','),
+                step["load_options"].get("line_terminator", '\n'),
+                step["load_options"].get("skip_lines", 1)
+            ),
+            **step["load_options"]
+        )
+        add_node(hook, step["name"], [load])
+        futures[hook] = running[hook] = timed_hook.submit(load=futures[load], step=step, db_config=db_config)
+
+    def finished(node: str) -> bool:
+        return nodes.get(node, {}).get("ok") is True
+
+    def blocked(node: str) -> bool:
+        # Failed or skipped
+        return nodes.get(node, {}).get("ok") is False
+
+    pending_procedures = [step["name"] for step in steps if step["workflow"].procedure_name]
+    while running or pending_procedures:
+        # Collect finished tasks
+        for node, future in list(running.items()):
+            # wait() returns nothing; a task is done once its state is final
+            future.wait(0)
+            state = future.state
+            if not state.is_final():
+                continue
+            del running[node]
+            result = state.result(raise_on_failure=False) if state.is_completed() else None
+            if isinstance(result, dict):
+                nodes[node].update(result)
+            nodes[node].setdefault("started", nodes[node]["ready"])
+            nodes[node].setdefault("finished", time.time())
+            nodes[node]["ok"] = bool(isinstance(result, dict) and result["ok"])
+            if node.startswith("after_load:") and blocked(nodes[node]["after"][0]):
+                # Never ran, its load raised
+                nodes[node]["skipped"] = True
+            if nodes[node].get("skipped"):
+                continue
+            if not nodes[node]["ok"]:
+                error = result.get("error") if isinstance(result, dict) else None
+                logger.error(f"{node} failed: {error}" if error else f"{node} failed")
+
+        # Submit procedures whose inputs are ready, skip those that can never run
+        for name in list(pending_procedures):
+            step = by_name[name]
+            inputs = [f"after_load:{name}"] + [
+                f"procedure:{dep}" if by_name[dep]["workflow"].procedure_name else f"after_load:{dep}"
+                for dep in step["depends_on"]
+            ]
+            if any(blocked(node) for node in inputs):
+                pending_procedures.remove(name)
+                nodes[f"procedure:{name}"] = {
+                    "node": f"procedure:{name}", "step": name, "after": inputs, "skipped": True, "ok": False
+                }
+                logger.warning(f"procedure:{name} skipped, an upstream node failed")
+            elif all(finished(node) for node in inputs):
+                pending_procedures.remove(name)
+                workflow = step["workflow"]
+                add_node(f"procedure:{name}", name, inputs)["ready"] = max(
+                    nodes[node]["finished"] for node in inputs
+                )
+                futures[f"procedure:{name}"] = running[f"procedure:{name}"] = timed_procedure.submit(
+                    db_config=db_config,
+                    procedure_name=workflow.procedure_name,
+                    procedure_params=workflow.procedure_params,
+                    result_handler=workflow.result_handler,
+                    progress_interval=workflow.progress_interval,
+                    stall_timeout=workflow.stall_timeout,
+                    wait_for=[futures[node] for node in inputs]
+                )
+
+        if running:
+            time.sleep(POLL_INTERVAL)
+
+    run_finished = time.time()
+    for name, tracker in trackers.items():
+        record_step_latency(by_name[name], tracker, nodes, db_config)
+    return build_timing_report(nodes, run_started, run_finished)
+
+
+def record_step_latency(
+    step: Dict[str, Any],
+    tracker: LatencyTracker,
+    nodes: Dict[str, Dict[str, Any]],
+    db_config: dict
+) -> None:
+    """Stamp the load, hook and procedure nodes of a step on its tracker and record them."""
+    step_nodes = []
+    for phase, prefix in (("load", "load:"), ("post_load", "after_load:"), ("procedure", "procedure:")):
+        node = nodes.get(f"{prefix}{step['name']}")
+        if node is None:
+            continue
+        step_nodes.append(node)
+        if not node.get("skipped"):
+            tracker.add(phase, node["finished"] - node["started"])
+    ran = [node for node in step_nodes if not node.get("skipped")]
+    step["workflow"].record_run_latency(
+        db_config,
+        tracker,
+        success=all(node["ok"] for node in step_nodes),
+        published=max(node["finished"] for node in ran) if ran else None
+    )
+
+
+def build_timing_report(nodes: Dict[str, Dict[str, Any]], run_started: float, run_finished: float) -> Dict[str, Any]:
+    """Compute relative timings and the critical path of a finished run."""
+    timings = []
+    for node in nodes.values():
+        if node.get("skipped"):
+            timings.append({"node": node["node"], "status": "skipped"})
+            continue
+        timings.append({
+            "node": node["node"],
+            "status": "ok" if node["ok"] else "failed",
+            "start": round(node["started"] - run_started, 3),
+            "wait": round(node["started"] - node["ready"], 3),
+            "duration": round(node["finished"] - node["started"], 3),
+            "end": round(node["finished"] - run_started, 3)
+        })
+    timings.sort(key=lambda t: (t.get("start", float("inf")), t["node"]))
+
+    # Walk back from the last node to finish through its latest-finishing input
+    ran = {name: node for name, node in nodes.items() if not node.get("skipped")}
+    critical_path = []
+    current = max(ran, key=lambda name: ran[name]["finished"]) if ran else None
+    while current:
+        critical_path.insert(0, current)
+        inputs = [name for name in ran[current]["after"] if name in ran]
+        current = max(inputs, key=lambda name: ran[name]["finished"]) if inputs else None
+
+    return {
+        "total": round(run_finished - run_started, 3),
+        "timings": timings,
+        "critical_path": critical_path,
+        "failed": [t["node"] for t in timings if t["status"] == "failed"],
+        "skipped": [t["node"] for t in timings if t["status"] == "skipped"]
+    }
+
+
+def format_timing_report(report: Dict[str, Any]) -> str:
+    """Render a timing report as a markdown table."""
+    lines = [
+        f"Total: {report['total']:.3f}s",
+        "",
+        f"Critical path: {' -> '.join(report['critical_path']) or '-'}",
+        "",
+        "| node | status | start (s) | wait (s) | duration (s) | end (s) | critical |",
+        "|---|---|---|---|---|---|---|"
+    ]
+    for t in report["timings"]:
+        critical = "*" if t["node"] in report["critical_path"] else ""
+        if t["status"] == "skipped":
+            lines.append(f"| {t['node']} | skipped | | | | | |")
+        else:
+            lines.append(
+                f"| {t['node']} | {t['status']} | {t['start']:.3f} | {t['wait']:.3f} | "
+                f"{t['duration']:.3f} | {t['end']:.3f} | {critical} |"
+            )
+    return "\n".join(lines)
@@ -0,0 +1,344 @@
+"""
+Arrival-to-publish latency of ingestion runs.
+
+What matters downstream is how long it takes from an upload landing in
+ftpetl/incoming until borarch.FundClassFee or holdweb reflects it. A
+LatencyTracker stamps the phases of one run against the arrival time of
+its input file(s):
+
+    arrival --queue--> picked up --load--> staged --post_load--> --procedure--> published
+
+and record_latency() appends one compact row per file to
+bormeta.ingest_latency (ref/11.ddl-bormeta-ingest-latency.sql). The arrival
+time is the later of the file's mtime and ctime: an upload sets the mtime
+as it is written and a move into incoming/ sets the ctime, while an FTP
+client that restores the original mtime does not move the ctime back.
+
+Rerunning an unchanged file keeps its arrival time, so its total would
+count the days since the first load. record_latency() therefore skips a file
+whose (workflow, file_name, arrived_at) already has a successful row; a
+retry after a failed run is still recorded.
+
+The report command computes p50/p95/p99 of the arrival-to-publish time per
+workflow over the successful runs and lists the runs over their SLO:
+
+    PYTHONPATH=. python -m src.utils.latency report --days 30
+    PYTHONPATH=. python -m src.utils.latency report --slo 1800 --slo "Import Web Hold=900"
+
+The database comes from DB_HOST, DB_PORT, DB_USER, DB_PASSWORD and DB_NAME
+like the workflows, or --db-host sqlite:////path/to/bor.db.
+"""
+import argparse
+import math
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Any, Iterator, List, Optional
+
+from prefect import task
+
+from .db_backend import get_backend, SQLiteBackend
+
+LATENCY_TABLE = "bormeta.ingest_latency"
+
+# Arrival-to-publish SLO of a workflow that does not set one
+DEFAULT_LATENCY_SLO = 30 * 60
+
+PHASES = ["load", "post_load", "procedure"]
+
+LATENCY_COLUMNS = [
+    "workflow", "target_table", "file_name", "arrived_at", "published_at",
+    "queue_ms", "load_ms", "post_load_ms", "procedure_ms", "total_ms", "slo_ms", "success"
+]
+
+PERCENTILES = [50, 95, 99]
+
+
+def file_arrival_time(file_path: str) -> Optional[float]:
+    """When the file landed, as a timestamp; None if it cannot be read from this process."""
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return max(stat.st_mtime, stat.st_ctime)
+
+
+def format_timestamp(timestamp: float) -> str:
+    """DATETIME(3) literal, accepted by MySQL and stored as text by SQLite."""
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+
+
+def milliseconds(seconds: float) -> int:
+    return max(int(round(seconds * 1000)), 0)
+
+
+class LatencyTracker:
+    """
+    Phase timings of one run, stamped against the arrival of its input files.
+
+        tracker = LatencyTracker("Import Web Hold", "borarch.holdweb", [file_path])
+        with tracker.phase("load"):
+            ...
+        record_latency(db_config, tracker.records(success=True))
+
+    The queue phase runs from each file's arrival until the tracker is
+    created. Files whose arrival is unknown (not readable from this process)
+    count from the tracker's creation.
+    """
+
+    def __init__(
+        self,
+        workflow: str,
+        target_table: str,
+        file_paths: List[str],
+        slo_seconds: Optional[float] = DEFAULT_LATENCY_SLO,
+        arrivals: Optional[Dict[str, Optional[float]]] = None
+    ):
+        self.workflow = workflow
+        self.target_table = target_table
+        self.slo_seconds = slo_seconds
+        self.started = time.time()
+        arrivals = arrivals or {}
+        self.arrivals = {
+            path: arrivals[path] if path in arrivals else file_arrival_time(path) for path in file_paths
+        }
+        self.phases: Dict[str, float] = {phase: 0.0 for phase in PHASES}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Add the time spent in the block to a phase, also when it raises."""
+        started = time.time()
+        try:
+            yield
+        finally:
+            self.add(name, time.time() - started)
+
+    def add(self, name: str, seconds: float) -> None:
+        if name not in self.phases:
+            raise ValueError(f"Unknown latency phase {name}, expected one of {PHASES}")
+        self.phases[name] += seconds
+
+    def records(self, success: bool, published: Optional[float] = None) -> List[Dict[str, Any]]:
+        """One history row per input file; published defaults to now."""
+        published = published or time.time()
+        rows = []
+        for path, arrived in self.arrivals.items():
+            arrived = min(arrived or self.started, self.started)
+            rows.append({
+                "workflow": self.workflow,
+                "target_table": self.target_table,
+                "file_name": os.path.basename(path),
+                "arrived_at": format_timestamp(arrived),
+                "published_at": format_timestamp(published),
+                "queue_ms": milliseconds(self.started - arrived),
+                "load_ms": milliseconds(self.phases["load"]),
+                "post_load_ms": milliseconds(self.phases["post_load"]),
+                "procedure_ms": milliseconds(self.phases["procedure"]),
+                "total_ms": milliseconds(published - arrived),
+                "slo_ms": milliseconds(self.slo_seconds) if self.slo_seconds else None,
+                "success": int(success)
+            })
+        return rows
+
+
+@task
+def record_latency(
+    db_config: dict,
+    records: List[Dict[str, Any]],
+    history_table: str = LATENCY_TABLE
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Append latency rows to the history table.
+
+    Rows of files already published with the same arrival time (a rerun of
+    an unchanged file) are not written again.
+
+    Args:
+        db_config: Database connection configuration
+        records: Rows built by LatencyTracker.records
+        history_table: Latency history table
+
+    Returns:
+        The rows written, or None on failure
+    """
+    if not records:
+        return []
+    backend = get_backend(db_config)
+    marker = backend.placeholder
+    try:
+        conn = backend.connect()
+        cursor = conn.cursor()
+        new_records = []
+        for record in records:
+            cursor.execute(
+                f"SELECT COUNT(*) FROM {history_table} WHERE workflow = {marker} AND file_name = {marker} "
+                f"AND arrived_at = {marker} AND success = 1",
+                (record["workflow"], record["file_name"], record["arrived_at"])
+            )
+            if cursor.fetchone()[0] == 0:
+                new_records.append(record)
+        if new_records:
+            placeholders = ", ".join([marker] * len(LATENCY_COLUMNS))
+            cursor.executemany(
+                f"INSERT INTO {history_table} ({', '.join(LATENCY_COLUMNS)}) VALUES ({placeholders})",
+                [tuple(record[column] for column in LATENCY_COLUMNS) for record in new_records]
+            )
+            conn.commit()
+        return new_records
+    except Exception as e:
+        print(f"Error recording latency: {str(e)}")
+        return None
+    finally:
+        if 'cursor' in locals():
+            cursor.close()
+        if 'conn' in locals():
+            conn.close()
+
+
+def fetch_latency(cursor, placeholder: str, since: datetime, history_table: str = LATENCY_TABLE) -> List[Dict[str, Any]]:
+    """History rows published since the given time, oldest first."""
+    columns = ["file_name", "workflow", "published_at", "queue_ms", "load_ms", "post_load_ms",
+               "procedure_ms", "total_ms", "slo_ms", "success"]
+    cursor.execute(
+        f"SELECT {', '.join(columns)} FROM {history_table} WHERE published_at >= {placeholder} "
+        f"ORDER BY published_at",
+        (since.strftime("%Y-%m-%d %H:%M:%S"),)
+    )
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def percentile(values: List[float], p: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(p / 100 * len(ordered)) - 1, 0)]
+
+
+def latency_report(
+    rows: List[Dict[str, Any]],
+    slo_seconds: Optional[Dict[str, float]] = None
+) -> Dict[str, Any]:
+    """
+    Percentiles per workflow and the runs over their SLO.
+
+    Args:
+        rows: History rows from fetch_latency
+        slo_seconds: SLO overrides by workflow name; "*" applies to every workflow.
+            Without an override, the SLO recorded with each run is used.
+    """
+    slo_seconds = slo_seconds or {}
+    workflows: Dict[str, Dict[str, Any]] = {}
+    breaches = []
+    for row in rows:
+        summary = workflows.setdefault(row["workflow"], {"runs": 0, "failed": 0, "breaches": 0, "totals": {}})
+        summary["runs"] += 1
+        if not int(row["success"]):
+            summary["failed"] += 1
+            continue
+        for column in ("queue_ms", "load_ms", "post_load_ms", "procedure_ms", "total_ms"):
+            summary["totals"].setdefault(column, []).append(int(row[column]))
+        slo = slo_seconds.get(row["workflow"], slo_seconds.get("*"))
+        slo_ms = milliseconds(slo) if slo is not None else row["slo_ms"]
+        summary["slo_ms"] = slo_ms
+        if slo_ms and int(row["total_ms"]) > int(slo_ms):
+            summary["breaches"] += 1
+            breaches.append({**row, "slo_ms": slo_ms})
+
+    report = {"workflows": {}, "breaches": breaches}
+    for workflow, summary in sorted(workflows.items()):
+        entry = {key: summary[key] for key in ("runs", "failed", "breaches")}
+        entry["slo_ms"] = summary.get("slo_ms")
+        for column, values in summary["totals"].items():
+            entry[column] = {f"p{p}": percentile(values, p) for p in PERCENTILES}
+        report["workflows"][workflow] = entry
+    return report
+
+
+def format_latency_report(report: Dict[str, Any]) -> str:
+    """Render a latency report as markdown tables, in seconds."""
+    def seconds(ms: Optional[float]) -> str:
+        return "-" if ms is None else f"{ms / 1000:.1f}"
+
+    lines = [
+        "| workflow | runs | failed | p50 (s) | p95 (s) | p99 (s) | queue p95 (s) | load p95 (s) | "
+        "procedure p95 (s) | SLO (s) | breaches |",
+        "|---|---|---|---|---|---|---|---|---|---|---|"
+    ]
+    for workflow, entry in report["workflows"].items():
+        total = entry.get("total_ms", {})
+        lines.append(
+            f"| {workflow} | {entry['runs']} | {entry['failed']} | {seconds(total.get('p50'))} | "
+            f"{seconds(total.get('p95'))} | {seconds(total.get('p99'))} | "
+            f"{seconds(entry.get('queue_ms', {}).get('p95'))} | {seconds(entry.get('load_ms', {}).get('p95'))} | "
+            f"{seconds(entry.get('procedure_ms', {}).get('p95'))} | {seconds(entry['slo_ms'])} | "
+            f"{entry['breaches']} |"
+        )
+    if report["breaches"]:
+        lines += [
+            "",
+            f"{len(report['breaches'])} runs over their SLO:",
+            "",
+            "| published | workflow | file | total (s) | SLO (s) | queue (s) | load (s) | post load (s) | procedure (s) |",
+            "|---|---|---|---|---|---|---|---|---|"
+        ]
+        for row in report["breaches"]:
+            lines.append(
+                f"| {row['published_at']} | {row['workflow']} | {row['file_name']} | {seconds(row['total_ms'])} | "
+                f"{seconds(row['slo_ms'])} | {seconds(row['queue_ms'])} | {seconds(row['load_ms'])} | "
+                f"{seconds(row['post_load_ms'])} | {seconds(row['procedure_ms'])} |"
+            )
+    return "\n".join(lines)
+
+
+def parse_slo(values: List[str]) -> Dict[str, float]:
+    """'1800' applies to every workflow, 'Import Web Hold=900' to one."""
+    slo_seconds = {}
+    for value in values or []:
+        workflow, _, seconds = value.rpartition("=")
+        slo_seconds[workflow or "*"] = float(seconds)
+    return slo_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-host", default=os.getenv("DB_HOST", "localhost"))
+    parser.add_argument("--db-port", default=os.getenv("DB_PORT", "4420"))
+    commands = parser.add_subparsers(dest="command", required=True)
+    report_parser = commands.add_parser("report", help="Latency percentiles and SLO breaches per workflow")
+    report_parser.add_argument("--days", type=float, default=30, help="Runs published in the last N days")
+    report_parser.add_argument("--slo", action="append", help="SLO in seconds, optionally as WORKFLOW=SECONDS")
+    report_parser.add_argument("--fail-on-breach", action="store_true", help="Exit with 1 if any run breached")
+    args = parser.parse_args()
+
+    if args.db_host.startswith("sqlite:"):
+        db_config = {"backend": SQLiteBackend.from_url(args.db_host)}
+    else:
+        db_config = {
+            "host": args.db_host,
+            "port": int(args.db_port),
+            "user": os.getenv("DB_USER"),
+            "password": os.getenv("DB_PASSWORD"),
+            "database": os.getenv("DB_NAME", "bormeta")
+        }
+    backend = get_backend(db_config)
+    since = datetime.now() - timedelta(days=args.days)
+    try:
+        conn = backend.connect()
+        cursor = conn.cursor()
+        rows = fetch_latency(cursor, backend.placeholder, since)
+    finally:
+        if 'cursor' in locals():
+            cursor.close()
+        if 'conn' in locals():
+            conn.close()
+
+    report = latency_report(rows, parse_slo(args.slo))
+    print(f"Arrival-to-publish latency since {since:%Y-%m-%d %H:%M} ({len(rows)} runs)\n")
+    print(format_latency_report(report))
+    if args.fail_on_breach and report["breaches"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
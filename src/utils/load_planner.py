@@ -0,0 +1,297 @@
+"""
+Advisory load planner.
+
+Before a load, the planner samples the input file (row count, row width,
+fields and transformations per row) and reads the target table's size and
+indexes from information_schema. It then estimates the cost of the two load
+strategies this tree can run and recommends the cheaper one:
+
+    single            TRUNCATE (optional) + one LOAD DATA INFILE into the indexed table
+    deferred_indexes  drop secondary indexes, LOAD DATA, rebuild them in one sorted pass
+
+The estimate is a simple linear model. Its constants are placeholders that
+have not been measured against bor-db yet, so the plan is advisory:
+BaseIngestionWorkflow logs it but does not act on it (e.g. drop the secondary
+indexes of a live, shared table) while COST_MODEL_CALIBRATED is False.
+Calibrate them with tests/bench-load-modes.py, record the run next to the
+constants and set the flag. Every plan carries a per-strategy cost breakdown
+so the recommendation can be explained in the run log.
+
+Chunked parallel, shadow swap and merge loads do not exist in the loader,
+so they are not costed either.
+
+Only single-file loads of delimited text are planned. Coalesced batches
+(execute_coalesced) and Parquet/Arrow input (columnar_input.py) are not
+costed; both are chosen by the caller, not by the planner. Table statistics
+come from MySQL's information_schema, so there is no plan under the SQLite
+backend.
+"""
+import math
+import os
+from typing import Dict, Any, Optional
+
+from prefect import task
+
+from .index_management import get_secondary_indexes, split_table_name
+
+# Cost model constants (seconds). Not calibrated: rough per-row figures, to be
+# replaced with timings from tests/bench-load-modes.py against bor-db
+PARSE_COST_PER_FIELD = 0.4e-6
+TRANSFORM_COST_PER_FIELD = 0.3e-6
+INSERT_COST_PER_ROW = 4e-6
+INSERT_COST_PER_KB = 2e-6
+INDEX_MAINTENANCE_COST_PER_ROW = 3e-6
+SORTED_BUILD_COST_PER_ROW = 0.8e-6
+VALIDATION_COST_PER_ROW = 0.3e-6
+DDL_FIXED_COST = 0.25
+TRUNCATE_FIXED_COST = 0.05
+
+# Set once the constants above come from a recorded benchmark run; until then
+# plans are only logged and the load strategy stays as configured
+COST_MODEL_CALIBRATED = False
+
+# Bytes read from the head of the file to estimate row width
+SAMPLE_BYTES = 1024 * 1024
+
+
+def sample_file(
+    file_path: str,
+    delimiter: str = ',',
+    line_terminator: str = '\n',
+    skip_lines: int = 1,
+    sample_bytes: int = SAMPLE_BYTES
+) -> Optional[Dict[str, Any]]:
+    """
+    Estimate row count and row width from the head of a file.
+
+    Returns None when the file is not readable from this process (for
+    example a path only visible to the database server).
+    """
+    if not os.path.isfile(file_path):
+        return None
+    file_bytes = os.path.getsize(file_path)
+    terminator = line_terminator.encode()
+    with open(file_path, "rb") as f:
+        sample = f.read(sample_bytes)
+
+    lines = sample.split(terminator)
+    if len(sample) < file_bytes:
+        lines = lines[:-1]  # last line is probably cut off
+    data_lines = [line for line in lines[skip_lines:] if line]
+    header_bytes = sum(len(line) + len(terminator) for line in lines[:skip_lines])
+
+    if not data_lines:
+        return {"file_bytes": file_bytes, "estimated_rows": 0, "avg_row_bytes": 0, "fields_per_row": 0}
+
+    sample_data_bytes = sum(len(line) + len(terminator) for line in data_lines)
+    avg_row_bytes = sample_data_bytes / len(data_lines)
+    if len(sample) >= file_bytes:
+        estimated_rows = len(data_lines)
+    else:
+        estimated_rows = int((file_bytes - header_bytes) / avg_row_bytes)
+    fields_per_row = max(line.count(delimiter.encode()) + 1 for line in data_lines[:100])
+
+    return {
+        "file_bytes": file_bytes,
+        "estimated_rows": estimated_rows,
+        "avg_row_bytes": round(avg_row_bytes, 1),
+        "fields_per_row": fields_per_row
+    }
+
+
+def get_table_stats(cursor, target_table: str) -> Dict[str, Any]:
+    """Read table size and secondary indexes from information_schema."""
+    schema, table = split_table_name(cursor, target_table)
+    cursor.execute(
+        """
+        SELECT TABLE_ROWS, DATA_LENGTH, INDEX_LENGTH
+        FROM information_schema.TABLES
+        WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s
+        """,
+        (schema, table)
+    )
+    row = cursor.fetchone()
+    if row is None:
+        raise ValueError(f"Table not found: {target_table}")
+    indexes = get_secondary_indexes(cursor, target_table)
+    return {
+        "table_rows": int(row[0] or 0),
+        "data_bytes": int(row[1] or 0),
+        "index_bytes": int(row[2] or 0),
+        "secondary_indexes": len(indexes),
+        "unique_indexes": sum(1 for index in indexes if index["unique"])
+    }
+
+
+def estimate_costs(
+    file_stats: Dict[str, Any],
+    table_stats: Dict[str, Any],
+    transformed_fields: int = 0,
+    truncate_before_load: bool = False
+) -> Dict[str, Dict[str, float]]:
+    """
+    Estimate the cost of each strategy, broken down by phase.
+
+    Returns:
+        Mapping of strategy name to {phase: seconds, "total": seconds}
+    """
+    rows = file_stats["estimated_rows"]
+    row_kb = file_stats["avg_row_bytes"] / 1024
+    indexes = table_stats["secondary_indexes"]
+    existing_rows = 0 if truncate_before_load else table_stats["table_rows"]
+
+    common = {
+        "truncate": TRUNCATE_FIXED_COST if truncate_before_load else 0.0,
+        "parse": rows * (file_stats["fields_per_row"] * PARSE_COST_PER_FIELD
+                         + transformed_fields * TRANSFORM_COST_PER_FIELD),
+        "insert": rows * (INSERT_COST_PER_ROW + row_kb * INSERT_COST_PER_KB)
+    }
+
+    # Row-by-row index maintenance gets slower as the indexes grow
+    depth = 1 + math.log10(max(existing_rows + rows, 10)) / 6
+    single = dict(common)
+    single["index_maintenance"] = rows * indexes * INDEX_MAINTENANCE_COST_PER_ROW * depth
+
+    deferred = dict(common)
+    total_rows = existing_rows + rows
+    deferred["drop_indexes"] = DDL_FIXED_COST if indexes else 0.0
+    deferred["index_build"] = (DDL_FIXED_COST if indexes else 0.0) + \
+        total_rows * indexes * SORTED_BUILD_COST_PER_ROW
+    deferred["validation"] = total_rows * table_stats["unique_indexes"] * VALIDATION_COST_PER_ROW
+
+    costs = {"single": single, "deferred_indexes": deferred}
+    for breakdown in costs.values():
+        breakdown["total"] = sum(breakdown.values())
+    return costs
+
+
+def choose_strategy(costs: Dict[str, Dict[str, float]], table_stats: Dict[str, Any]) -> Dict[str, str]:
+    """Pick the cheapest strategy and explain why."""
+    if table_stats["secondary_indexes"] == 0:
+        return {"strategy": "single", "reason": "target table has no secondary indexes"}
+    strategy = min(costs, key=lambda name: costs[name]["total"])
+    other = "deferred_indexes" if strategy == "single" else "single"
+    return {
+        "strategy": strategy,
+        "reason": (
+            f"estimated {costs[strategy]['total']:.2f}s vs {costs[other]['total']:.2f}s "
+            f"for {other}"
+        )
+    }
+
+
+def format_plan(plan: Dict[str, Any]) -> str:
+    """Render a plan as a readable multi-line report."""
+    lines = [f"Load plan for {plan['file_path']} -> {plan['target_table']}"]
+    file_stats = plan["file_stats"]
+    lines.append(
+        f"  file: {file_stats['file_bytes']} bytes, ~{file_stats['estimated_rows']} rows, "
+        f"{file_stats['avg_row_bytes']} bytes/row, {file_stats['fields_per_row']} fields/row"
+    )
+    table_stats = plan["table_stats"]
+    if table_stats is None:
+        lines.append(f"  table: statistics not read, truncate={plan['truncate_before_load']}")
+        lines.append(f"  no strategy chosen - {plan['reason']}")
+        return "\n".join(lines)
+    lines.append(
+        f"  table: ~{table_stats['table_rows']} rows, {table_stats['secondary_indexes']} secondary indexes "
+        f"({table_stats['unique_indexes']} unique), truncate={plan['truncate_before_load']}"
+    )
+    for strategy, breakdown in plan["costs"].items():
+        phases = ", ".join(f"{k}={v:.3f}s" for k, v in breakdown.items() if k != "total" and v)
+        marker = "*" if strategy == plan["strategy"] else " "
+        lines.append(f"  {marker} {strategy}: {breakdown['total']:.3f}s ({phases})")
+    lines.append(f"  recommended: {plan['strategy']} - {plan['reason']}")
+    return "\n".join(lines)
+
+
+@task
+def plan_load(
+    file_path: str,
+    db_config: dict,
+    target_table: str,
+    field_transformations: Optional[Dict[str, str]] = None,
+    delimiter: str = ',',
+    line_terminator: str = '\n',
+    skip_lines: int = 1,
+    truncate_before_load: bool = False,
+    profile: Optional[Dict[str, Any]] = None,
+    read_table: bool = True
+) -> Optional[Dict[str, Any]]:
+    """
+    Build a load plan for one file. Only reads metadata from the database.
+    
+    When a file profile (see file_profiler.py) is given, its exact row count
+    is used instead of the estimate from sampling the head of the file.
+    With read_table=False no database connection is opened: the plan only
+    describes the file and no strategy is chosen.
+
+    Args:
+        file_path: Path to the input file
+        db_config: Database connection configuration
+        target_table: Target table name (format: database.table)
+        field_transformations: Optional dictionary of field transformations
+        delimiter: Field delimiter character
+        line_terminator: Line terminator character
+        skip_lines: Number of header lines to skip
+        truncate_before_load: Boolean indicating whether the table is truncated first
+        profile: Optional profile of the input file
+        read_table: Read the target table's statistics and choose a strategy
+
+    Returns:
+        The plan, or None when the file cannot be sampled from this process
+        or the database is not MySQL (always None under the SQLite backend)
+    """
+    if "backend" in db_config:
+        # The cost model reads MySQL table statistics
+        return None
+    if profile and profile["records"]:
+        file_stats = {
+            "file_bytes": profile["file_bytes"],
+            "estimated_rows": max(profile["records"] - skip_lines, 0),
+            "avg_row_bytes": profile["avg_row_bytes"],
+            "fields_per_row": profile["fields"]
+        }
+    else:
+        file_stats = sample_file(file_path, delimiter, line_terminator, skip_lines)
+    if file_stats is None:
+        return None
+    if not read_table:
+        return {
+            "file_path": file_path,
+            "target_table": target_table,
+            "truncate_before_load": truncate_before_load,
+            "file_stats": file_stats,
+            "table_stats": None,
+            "costs": {},
+            "strategy": None,
+            "reason": "table statistics not read"
+        }
+
+    import mysql.connector
+    try:
+        conn = mysql.connector.connect(**db_config)
+        cursor = conn.cursor()
+        table_stats = get_table_stats(cursor, target_table)
+    finally:
+        if 'cursor' in locals():
+            cursor.close()
+        if 'conn' in locals():
+            conn.close()
+
+    costs = estimate_costs(
+        file_stats,
+        table_stats,
+        transformed_fields=len(field_transformations or {}),
+        truncate_before_load=truncate_before_load
+    )
+    plan = {
+        "file_path": file_path,
+        "target_table": target_table,
+        "truncate_before_load": truncate_before_load,
+        "file_stats": file_stats,
+        "table_stats": table_stats,
+        "costs": costs
+    }
+    plan.update(choose_strategy(costs, table_stats))
+    return plan
@@ -0,0 +1,108 @@
+"""
+Publish a dated snapshot file into a LIST-partitioned history table.
+
+The rows the workflow just staged are copied into a standalone exchange table
+with the same columns as the history table (INSERT ... SELECT, so the file is
+read once, by the staging load), then swapped in with ALTER TABLE ... EXCHANGE
+PARTITION. The cost of a publish depends only on the size of the file, not on
+how much history the table holds. See ref/9.ddl-borarch-holdweb-hist.sql.
+
+The staging table must hold the loaded file only, i.e. be truncated before
+the load. The database user needs ALTER, DROP and INSERT on both tables.
+"""
+from typing import Dict, Any, List, Optional
+
+from prefect import task
+
+from .index_management import split_table_name
+
+
+def partition_name(partition_date) -> str:
+    """Partition naming convention: pYYYYMMDD."""
+    return f"p{partition_date.strftime('%Y%m%d')}"
+
+
+def ensure_date_partition(cursor, history_table: str, partition_date) -> str:
+    """Add the LIST partition for a date if it does not exist yet."""
+    name = partition_name(partition_date)
+    schema, table = split_table_name(cursor, history_table)
+    cursor.execute(
+        """
+        SELECT COUNT(*) FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND PARTITION_NAME = %s
+        """,
+        (schema, table, name)
+    )
+    if cursor.fetchone()[0] == 0:
+        cursor.execute(
+            f"ALTER TABLE {history_table} ADD PARTITION "
+            f"(PARTITION {name} VALUES IN (TO_DAYS('{partition_date.isoformat()}')))"
+        )
+    return name
+
+
+@task(retries=3, retry_delay_seconds=60)
+def publish_partition(
+    db_config: dict,
+    source_table: str,
+    history_table: str,
+    exchange_table: str,
+    columns: List[str],
+    date_column: str = "date"
+) -> Optional[Dict[str, Any]]:
+    """
+    Copy the staged rows of a single-date load and swap them into their history partition.
+
+    Any rows previously published for the same date are replaced. The staged
+    rows must contain exactly one value of `date_column`.
+
+    Args:
+        db_config: Database connection configuration
+        source_table: Staging table the file was loaded into (format: database.table)
+        history_table: Partitioned history table (format: database.table)
+        exchange_table: Unpartitioned table with the same structure
+        columns: Columns to copy, the targets of the workflow's field mappings
+        date_column: Column the history table is partitioned on
+
+    Returns:
+        Published date, partition name and row count, or None on failure
+    """
+    import mysql.connector
+    try:
+        conn = mysql.connector.connect(**db_config)
+        cursor = conn.cursor()
+
+        column_list = ", ".join(columns)
+        cursor.execute(f"TRUNCATE TABLE {exchange_table}")
+        cursor.execute(
+            f"INSERT INTO {exchange_table} ({column_list}) SELECT {column_list} FROM {source_table}"
+        )
+        conn.commit()
+
+        cursor.execute(
+            f"SELECT MIN({date_column}), MAX({date_column}), COUNT(*) FROM {exchange_table}"
+        )
+        min_date, max_date, rows = cursor.fetchone()
+        if rows == 0:
+            raise ValueError(f"No rows staged in {source_table}")
+        if min_date != max_date:
+            raise ValueError(
+                f"{source_table} spans {min_date} to {max_date}; one date per load is required"
+            )
+
+        name = ensure_date_partition(cursor, history_table, min_date)
+        cursor.execute(
+            f"ALTER TABLE {history_table} EXCHANGE PARTITION {name} WITH TABLE {exchange_table}"
+        )
+        # The exchange table now holds the replaced snapshot, if any
+        cursor.execute(f"TRUNCATE TABLE {exchange_table}")
+
+        return {"date": min_date.isoformat(), "partition": name, "rows": rows}
+    except Exception as e:
+        print(f"Error publishing partition: {str(e)}")
+        return None
+    finally:
+        if 'cursor' in locals():
+            cursor.close()
+        if 'conn' in locals():
+            conn.close()
@@ -0,0 +1,155 @@
+"""
+Multi-phrase matching over whitespace-normalized text.
+
+PhraseMatcher compiles a fixed set of phrases (fund names, section markers,
+total labels) into one Aho-Corasick automaton, so a page of text is scanned
+once for all of them instead of once per phrase and line. Whitespace is
+normalized on the fly: any run of spaces, tabs or newlines in the text
+matches a single space in a phrase, so a heading with doubled spaces or
+wrapped over two lines still matches. Matches are reported with offsets and
+line indices into the original text:
+
+    matcher = PhraseMatcher([
+        Phrase("Pender Value Fund", "fund", whole_line=True),
+        Phrase("Schedule of Investment Portfolio", "schedule"),
+    ])
+    for match in matcher.scan(page_text):
+        ...  # PhraseMatch(phrase, kind, start, end, line, end_line)
+
+Phrases only match on word boundaries. A whole_line phrase must also be
+alone on its line(s), which keeps a fund name mentioned in running text
+from being taken for a heading.
+"""
+import bisect
+from collections import deque
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+
+class Phrase(NamedTuple):
+    text: str
+    kind: str
+    whole_line: bool = False
+
+
+class PhraseMatch(NamedTuple):
+    phrase: str
+    kind: str
+    # Offsets into the scanned text, end exclusive
+    start: int
+    end: int
+    # Line indices (text.split('\n')) of the first and last character
+    line: int
+    end_line: int
+
+
+class PhraseMatcher:
+    """Aho-Corasick automaton over a fixed set of phrases; build once, scan many texts."""
+
+    def __init__(self, phrases: Iterable[Phrase], ignore_case: bool = False):
+        self.ignore_case = ignore_case
+        self.phrases: List[Phrase] = []
+        self._lengths: List[int] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+        for phrase in phrases:
+            self._add(phrase)
+        self._link()
+
+    def _fold(self, char: str) -> str:
+        if self.ignore_case:
+            lowered = char.lower()
+            # Keep the text and its normalized form the same length
+            if len(lowered) == 1:
+                return lowered
+        return char
+
+    def _add(self, phrase: Phrase) -> None:
+        normalized = " ".join(phrase.text.split())
+        if not normalized:
+            raise ValueError(f"Empty phrase for {phrase.kind}")
+        node = 0
+        for char in normalized:
+            char = self._fold(char)
+            if char not in self._goto[node]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._goto[node][char] = len(self._goto) - 1
+            node = self._goto[node][char]
+        self._out[node].append(len(self.phrases))
+        self.phrases.append(phrase)
+        self._lengths.append(len(normalized))
+
+    def _link(self) -> None:
+        """Breadth-first fail links; each node also reports the phrases of its fail chain."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+                queue.append(child)
+
+    def _step(self, node: int, char: str) -> int:
+        while node and char not in self._goto[node]:
+            node = self._fail[node]
+        return self._goto[node].get(char, 0)
+
+    def scan(self, text: str) -> List[PhraseMatch]:
+        """All phrase occurrences in text, in order of position."""
+        # Offset in text of each character of the normalized text
+        positions: List[int] = []
+        candidates = []
+        node = 0
+        pending_space = False
+        for i, char in enumerate(text):
+            if char.isspace():
+                pending_space = bool(positions)
+                continue
+            if pending_space:
+                node = self._step(node, " ")
+                positions.append(i - 1)
+                pending_space = False
+            node = self._step(node, self._fold(char))
+            positions.append(i)
+            for index in self._out[node]:
+                candidates.append((positions[len(positions) - self._lengths[index]], i + 1, index))
+        if not candidates:
+            return []
+
+        newlines = [i for i, char in enumerate(text) if char == "\n"]
+        matches = []
+        for start, end, index in candidates:
+            phrase = self.phrases[index]
+            if not self._bounded(text, start, end):
+                continue
+            line = bisect.bisect_left(newlines, start)
+            end_line = bisect.bisect_left(newlines, end - 1)
+            if phrase.whole_line:
+                line_start = newlines[line - 1] + 1 if line else 0
+                line_end = newlines[end_line] if end_line < len(newlines) else len(text)
+                if text[line_start:start].strip() or text[end:line_end].strip():
+                    continue
+            matches.append(PhraseMatch(phrase.text, phrase.kind, start, end, line, end_line))
+        matches.sort(key=lambda m: (m.start, -m.end))
+        return matches
+
+    @staticmethod
+    def _bounded(text: str, start: int, end: int) -> bool:
+        """No word character continues the match on either side."""
+        if start > 0 and text[start].isalnum() and text[start - 1].isalnum():
+            return False
+        if end < len(text) and text[end - 1].isalnum() and text[end].isalnum():
+            return False
+        return True
+
+    def find(self, text: str, kind: str) -> Optional[PhraseMatch]:
+        """First match of the given kind, or None."""
+        for match in self.scan(text):
+            if match.kind == kind:
+                return match
+        return None
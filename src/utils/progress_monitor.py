@@ -0,0 +1,242 @@
+"""
+Progress heartbeat for long-running statements.
+
+LOAD DATA and stored procedure calls block their connection until they
+finish. ProgressMonitor watches such a statement from a second connection:
+at a fixed interval it reads the processlist entry of the loading
+connection and the number of rows its transaction has modified
+(information_schema.INNODB_TRX). When the statement is fed from the client
+(LOAD DATA LOCAL), a byte counter can be supplied instead. Each heartbeat
+logs rows/sec and, when the expected total is known, an ETA.
+
+With a stall timeout, a statement whose progress counter has not moved for
+that many seconds is cancelled with KILL QUERY. The statement then fails in
+the calling thread and `monitor.killed` tells why.
+
+The monitor is opt-in (progress_interval or stall_timeout on the workflow);
+it costs a second connection per statement. Reading INNODB_TRX needs the
+PROCESS privilege. Without it the monitor warns once per database account and
+counts rows with the server-wide Innodb_rows_inserted counter instead.
+"""
+import contextvars
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+# Seconds between heartbeats when only a stall timeout is given
+DEFAULT_INTERVAL = 30.0
+
+# (host, port, user) of accounts found to lack the PROCESS privilege
+_NO_PROCESS_PRIVILEGE = set()
+
+
+def get_logger(name: str = __name__):
+    """Prefect run logger when called from a run, the `name` logger (this module's by default) otherwise."""
+    try:
+        from prefect import get_run_logger
+        return get_run_logger()
+    except Exception:
+        return logging.getLogger(name)
+
+
+def format_eta(seconds: Optional[float]) -> str:
+    """Format seconds as H:MM:SS, or '?' when unknown."""
+    if seconds is None:
+        return "?"
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+class ProgressMonitor:
+    """
+    Background heartbeat for a statement running on another connection.
+
+    Use as a context manager around the blocking execute:
+
+        with ProgressMonitor(db_config, conn.connection_id, "LOAD borarch.holdweb",
+                             expected_rows=1200000, stall_timeout=600) as monitor:
+            cursor.execute(load_query)
+    """
+
+    def __init__(
+        self,
+        db_config: dict,
+        connection_id: int,
+        label: str,
+        expected_rows: Optional[int] = None,
+        interval: float = DEFAULT_INTERVAL,
+        stall_timeout: Optional[float] = None,
+        bytes_source: Optional[Callable[[], int]] = None,
+        expected_bytes: Optional[int] = None
+    ):
+        self.db_config = db_config
+        self.connection_id = connection_id
+        self.label = label
+        self.expected_rows = expected_rows
+        self.interval = interval
+        self.stall_timeout = stall_timeout
+        self.bytes_source = bytes_source
+        self.expected_bytes = expected_bytes
+        self.logger = get_logger()
+        self.killed = False
+        self.last: Dict[str, Any] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._connected = threading.Event()
+        self._artifact_id = None
+        self._rows_inserted_base = 0
+
+    def __enter__(self) -> "ProgressMonitor":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        # Run in a copy of the caller's context so the Prefect run logger keeps working
+        context = contextvars.copy_context()
+        self._thread = threading.Thread(
+            target=context.run, args=(self._run,), name=f"progress-{self.connection_id}", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        # A monitor still connecting sees the stop flag once connected; no need to wait for it
+        if self._thread and self._connected.is_set():
+            self._thread.join()
+
+    def _run(self) -> None:
+        # Imported here: the monitor only runs against MySQL, see supports_progress_monitor
+        import mysql.connector
+        try:
+            conn = mysql.connector.connect(**self.db_config)
+        except Exception as e:
+            self.logger.warning(f"Progress monitor for {self.label} disabled: {str(e)}")
+            return
+        self._connected.set()
+        started = time.monotonic()
+        last_change = started
+        last_progress = None
+        try:
+            cursor = conn.cursor()
+            self._rows_inserted_base = self.rows_inserted(cursor)
+            while not self._stop.wait(self.interval):
+                sample = self.poll(cursor)
+                if sample is None:
+                    continue
+                now = time.monotonic()
+                # A procedure moving on to its next statement counts as progress
+                progress = (sample["rows"], sample.get("bytes"), sample["statement"])
+                if progress != last_progress:
+                    last_progress = progress
+                    last_change = now
+                self.last = self.heartbeat(sample, now - started)
+
+                if self.stall_timeout and now - last_change >= self.stall_timeout:
+                    self.logger.error(
+                        f"{self.label}: no progress for {now - last_change:.0f}s "
+                        f"(state: {sample['state']}), killing query on connection {self.connection_id}"
+                    )
+                    cursor.execute(f"KILL QUERY {int(self.connection_id)}")
+                    self.killed = True
+                    break
+        except Exception as e:
+            self.logger.warning(f"Progress monitor for {self.label} stopped: {str(e)}")
+        finally:
+            if 'cursor' in locals():
+                cursor.close()
+            conn.close()
+
+    def poll(self, cursor) -> Optional[Dict[str, Any]]:
+        """Read the server-side progress indicators, None once the connection is gone."""
+        cursor.execute(
+            "SELECT STATE, TIME, INFO FROM information_schema.PROCESSLIST WHERE ID = %s",
+            (self.connection_id,)
+        )
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        sample = {"state": row[0] or "", "seconds": int(row[1] or 0), "statement": row[2] or ""}
+        trx = self.trx_rows_modified(cursor)
+        if trx:
+            sample["rows"] = int(trx[0])
+        else:
+            # Not in an InnoDB transaction (yet): fall back to the server-wide counter
+            sample["rows"] = max(self.rows_inserted(cursor) - self._rows_inserted_base, 0)
+        if self.bytes_source:
+            sample["bytes"] = self.bytes_source()
+        return sample
+
+    def account(self) -> tuple:
+        return (self.db_config.get("host"), self.db_config.get("port"), self.db_config.get("user"))
+
+    def trx_rows_modified(self, cursor) -> Optional[tuple]:
+        """INNODB_TRX row of the watched connection; None without one or without PROCESS."""
+        if self.account() in _NO_PROCESS_PRIVILEGE:
+            return None
+        import mysql.connector
+        from mysql.connector import errorcode
+        try:
+            cursor.execute(
+                "SELECT trx_rows_modified FROM information_schema.INNODB_TRX WHERE trx_mysql_thread_id = %s",
+                (self.connection_id,)
+            )
+        except mysql.connector.Error as e:
+            if e.errno != errorcode.ER_SPECIFIC_ACCESS_DENIED_ERROR:
+                raise
+            _NO_PROCESS_PRIVILEGE.add(self.account())
+            self.logger.warning(
+                f"{self.db_config.get('user')} lacks the PROCESS privilege, progress is estimated "
+                f"from the server-wide Innodb_rows_inserted counter"
+            )
+            return None
+        return cursor.fetchone()
+
+    def rows_inserted(self, cursor) -> int:
+        """Server-wide Innodb_rows_inserted; includes other sessions' inserts."""
+        cursor.execute("SHOW GLOBAL STATUS LIKE 'Innodb_rows_inserted'")
+        row = cursor.fetchone()
+        return int(row[1]) if row else 0
+
+    def heartbeat(self, sample: Dict[str, Any], elapsed: float) -> Dict[str, Any]:
+        """Log one progress line and return the computed rates."""
+        rows = sample["rows"]
+        rows_per_sec = rows / elapsed if elapsed > 0 else 0.0
+        fraction = None
+        if self.expected_bytes and "bytes" in sample:
+            fraction = sample["bytes"] / self.expected_bytes
+        elif self.expected_rows:
+            fraction = rows / self.expected_rows
+        eta = None
+        if fraction and 0 < fraction < 1:
+            eta = elapsed * (1 - fraction) / fraction
+
+        message = f"{self.label}: {rows} rows in {elapsed:.0f}s ({rows_per_sec:,.0f} rows/s)"
+        if "bytes" in sample:
+            message += f", {sample['bytes']} bytes read"
+        if fraction is not None:
+            message += f", {min(fraction, 1.0):.1%} done, ETA {format_eta(eta)}"
+        message += f" [{sample['state']}]"
+        self.logger.info(message)
+        if fraction is not None:
+            self.update_artifact(min(fraction, 1.0) * 100)
+
+        return {**sample, "elapsed": elapsed, "rows_per_sec": rows_per_sec, "fraction": fraction, "eta": eta}
+
+    def update_artifact(self, percent: float) -> None:
+        """Show progress on the run page where the Prefect version supports it."""
+        try:
+            from prefect.artifacts import create_progress_artifact, update_progress_artifact
+        except ImportError:
+            return
+        try:
+            if self._artifact_id is None:
+                self._artifact_id = create_progress_artifact(percent, description=self.label)
+            else:
+                update_progress_artifact(self._artifact_id, percent)
+        except Exception:
+            # Outside a run, or the API is unavailable
+            self._artifact_id = None
@@ -0,0 +1,277 @@
+"""
+Post-load reconciliation of a staging table against file control totals.
+
+The file and the table are reduced to the same control totals: the row count
+and, per group (e.g. per fund), the row count, the sums of the numeric
+fields and a key hash. The file side is built before the load, in the input
+profiler's scan (see file_profiler.scan_records): FileControlTotals parses
+the raw records the scan hands it, so the worker reads the file once whether
+or not profile_input also checks the load parameters. The table side is one
+aggregated query after the load, so only one row per group comes back to the
+client:
+
+    SELECT HEX(fund_name), COUNT(*), SUM(units), SUM(cost), SUM(mv),
+           SUM(CRC32(CONCAT_WS('|', date, fund_name, sec_name)))
+    FROM borarch.holdweb GROUP BY HEX(fund_name)
+
+Groups are formed on the bytes of the value, not under the column's
+collation: utf8mb4_unicode_ci would put 'PFCM Bal' and 'PFCM bal' (or
+'PFCM bal ') in one group while the file keeps them apart, and report
+differences that are not there.
+
+The key hash is the sum of the CRC32 of the '|'-joined key values, which
+zlib.crc32 computes the same way, so keys that were changed, dropped or
+duplicated show up even when counts and sums agree. Numeric file values are
+rounded to the column scale as MySQL does on insert, so sums compare exactly.
+
+The totals are declared per workflow:
+
+    control_totals={
+        "group_by": "fund_name",
+        "sums": {"units": 6, "cost": 6, "mv": 6},  # column -> DECIMAL scale
+        "key": ["date", "fund_name", "sec_name"]
+    }
+"""
+import csv
+import io
+import re
+import zlib
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Dict, Any, List, Optional
+
+from .db_backend import normalize_row
+
+# Separator of the key values in the key hash, as in CONCAT_WS('|', ...)
+KEY_SEPARATOR = "|"
+
+
+class ReconciliationError(Exception):
+    """Raised when a loaded table does not match the control totals of its file."""
+
+    def __init__(self, target_table: str, differences: List[str]):
+        self.target_table = target_table
+        self.differences = differences
+        super().__init__(format_reconciliation_report(target_table, differences))
+
+
+def format_reconciliation_report(target_table: str, differences: List[str]) -> str:
+    lines = [f"{target_table} does not match its file ({len(differences)} differences):"]
+    lines.extend(f"  {difference}" for difference in differences)
+    return "\n".join(lines)
+
+
+def key_hash(values: List[Optional[str]]) -> int:
+    """CRC32(CONCAT_WS('|', ...)) of one row; NULLs are skipped as CONCAT_WS does."""
+    joined = KEY_SEPARATOR.join(value for value in values if value is not None)
+    return zlib.crc32(joined.encode("utf-8"))
+
+
+def empty_totals() -> Dict[str, Any]:
+    return {"rows": 0, "sums": {}, "key_hash": 0}
+
+
+def field_sources(
+    field_mappings: Dict[str, str],
+    field_transformations: Optional[Dict[str, str]],
+    columns: List[str]
+) -> Dict[str, Any]:
+    """
+    Map target columns to their position in the file and their NULL handling.
+
+    Only plain fields and NULLIF(@Field, '') transformations can be
+    reproduced on the file side.
+    """
+    field_transformations = field_transformations or {}
+    positions = {target: i for i, target in enumerate(field_mappings.values())}
+    sources = list(field_mappings)
+    result = {}
+    for column in columns:
+        if column not in positions:
+            raise ValueError(f"Control total column {column} is not in the field mappings")
+        source = sources[positions[column]]
+        empty_is_null = False
+        if source in field_transformations:
+            pattern = rf"NULLIF\(\s*@{re.escape(source)}\s*,\s*''\s*\)"
+            if not re.fullmatch(pattern, field_transformations[source].strip()):
+                raise ValueError(
+                    f"Cannot compute control totals over {column}: "
+                    f"transformation {field_transformations[source]} is not reproducible"
+                )
+            empty_is_null = True
+        result[column] = (positions[column], empty_is_null)
+    return result
+
+
+class FileControlTotals:
+    """
+    Control totals of a file, accumulated from its raw records.
+
+        totals = FileControlTotals(file_path, field_mappings, control_totals, **load_options)
+        profile_file(file_path, on_records=totals.feed)
+        totals.result()
+
+    Records are parsed as the SQLite backend loads them (see
+    db_backend.read_delimited); the first skip_lines records are skipped.
+    They are decoded with the encoding the profiler detected, as LOAD DATA
+    reads them with the matching CHARACTER SET. A run of records that does
+    not decode (the detection only sees the head of the file) makes the
+    file unreadable: `unreadable` says why and the file is not reconciled.
+
+    Args:
+        file_path: Path to the input file, for error messages
+        field_mappings: Field mappings of the load, in file column order
+        control_totals: group_by column, sums (column -> scale) and key columns
+        field_transformations: Field transformations of the load
+        delimiter: Field delimiter character
+        quote_char: Quote character
+        line_terminator: Line terminator character
+        skip_lines: Number of header lines to skip
+    """
+
+    def __init__(
+        self,
+        file_path: str,
+        field_mappings: Dict[str, str],
+        control_totals: Dict[str, Any],
+        field_transformations: Optional[Dict[str, str]] = None,
+        delimiter: str = ',',
+        quote_char: str = '"',
+        line_terminator: str = '\n',
+        skip_lines: int = 1
+    ):
+        self.file_path = file_path
+        self.fields = len(field_mappings)
+        self.delimiter = delimiter
+        self.quote_char = quote_char
+        self.line_terminator = line_terminator
+        self.skip_lines = skip_lines
+        self.group_by = control_totals.get("group_by")
+        scales = control_totals.get("sums", {})
+        self.key_columns = control_totals.get("key", [])
+        columns = ([self.group_by] if self.group_by else []) + list(scales) + list(self.key_columns)
+        self.sources = field_sources(field_mappings, field_transformations, columns)
+        self.quanta = {column: Decimal(1).scaleb(-scale) for column, scale in scales.items()}
+        self.groups: Dict[Optional[str], Dict[str, Any]] = {}
+        self.rows = 0
+        self.records = 0
+        self.unreadable: Optional[str] = None
+
+    def feed(self, data: bytes, encoding: str = "utf-8") -> None:
+        """Add a run of complete records, e.g. one chunk of the profiler scan."""
+        if self.unreadable:
+            return
+        # ASCII is only what the head of the file looked like
+        codec = "utf-8" if encoding == "ascii" else encoding
+        try:
+            text = bytes(data).decode(codec)
+        except UnicodeDecodeError as e:
+            self.unreadable = f"record {self.records + 1} onwards is not {encoding}: {e.reason}"
+            return
+        if self.line_terminator in ("\n", "\r\n"):
+            lines = io.StringIO(text, newline="")
+        else:
+            lines = (line for line in text.split(self.line_terminator) if line)
+        for row in csv.reader(lines, delimiter=self.delimiter, quotechar=self.quote_char or None):
+            self.records += 1
+            if self.records <= self.skip_lines or not row:
+                continue
+            self.add(normalize_row(row, self.fields))
+
+    def value(self, row: List[Optional[str]], column: str) -> Optional[str]:
+        position, empty_is_null = self.sources[column]
+        v = row[position]
+        return None if empty_is_null and v == "" else v
+
+    def add(self, row: List[Optional[str]]) -> None:
+        """Add one parsed row."""
+        self.rows += 1
+        group = self.groups.setdefault(self.value(row, self.group_by) if self.group_by else None, empty_totals())
+        group["rows"] += 1
+        for column, quantum in self.quanta.items():
+            v = self.value(row, column)
+            if v is None or v == "":
+                continue
+            try:
+                amount = Decimal(v).quantize(quantum, rounding=ROUND_HALF_UP)
+            except InvalidOperation:
+                raise ValueError(f"Record {self.records} of {self.file_path}: {column} value {v!r} is not numeric")
+            group["sums"][column] = group["sums"].get(column, Decimal(0)) + amount
+        if self.key_columns:
+            group["key_hash"] += key_hash([self.value(row, column) for column in self.key_columns])
+
+    def result(self) -> Dict[str, Any]:
+        """Dict with the row count and the totals per group."""
+        return {"rows": self.rows, "groups": self.groups}
+
+
+def table_control_totals(cursor, target_table: str, control_totals: Dict[str, Any]) -> Dict[str, Any]:
+    """Compute the control totals of a table with one aggregated query."""
+    group_by = control_totals.get("group_by")
+    scales = control_totals.get("sums", {})
+    key_columns = control_totals.get("key", [])
+    # Group on the value's bytes, not under the column's case-insensitive collation
+    selects = [f"HEX({group_by})" if group_by else "NULL", "COUNT(*)"]
+    selects += [f"SUM({column})" for column in scales]
+    if key_columns:
+        selects.append(f"SUM(CRC32(CONCAT_WS('{KEY_SEPARATOR}', {', '.join(key_columns)})))")
+    query = f"SELECT {', '.join(selects)} FROM {target_table}"
+    if group_by:
+        query += f" GROUP BY HEX({group_by})"
+    cursor.execute(query)
+
+    groups: Dict[Optional[str], Dict[str, Any]] = {}
+    rows = 0
+    for row in cursor.fetchall():
+        count = int(row[1])
+        if count == 0:
+            # Ungrouped query on an empty table
+            continue
+        rows += count
+        sums = {}
+        for i, (column, scale) in enumerate(scales.items()):
+            amount = row[2 + i]
+            if amount is not None:
+                sums[column] = Decimal(str(amount)).quantize(Decimal(1).scaleb(-scale), rounding=ROUND_HALF_UP)
+        groups[None if row[0] is None else bytes.fromhex(row[0]).decode("utf-8")] = {
+            "rows": count,
+            "sums": sums,
+            "key_hash": int(row[-1] or 0) if key_columns else 0
+        }
+    return {"rows": rows, "groups": groups}
+
+
+def compare_control_totals(
+    file_totals: Dict[str, Any],
+    table_totals: Dict[str, Any],
+    group_by: Optional[str] = None
+) -> List[str]:
+    """List every difference between the file and table control totals."""
+    differences = []
+    if file_totals["rows"] != table_totals["rows"]:
+        differences.append(
+            f"rows: file {file_totals['rows']}, table {table_totals['rows']} "
+            f"({table_totals['rows'] - file_totals['rows']:+d})"
+        )
+    file_groups = file_totals["groups"]
+    table_groups = table_totals["groups"]
+    for group in sorted(set(file_groups) | set(table_groups), key=lambda g: (g is None, g or "")):
+        label = f"{group_by} {group!r}" if group_by else "table"
+        if group not in table_groups:
+            differences.append(f"{label}: {file_groups[group]['rows']} rows in the file, none in the table")
+            continue
+        if group not in file_groups:
+            differences.append(f"{label}: {table_groups[group]['rows']} rows in the table, none in the file")
+            continue
+        expected, actual = file_groups[group], table_groups[group]
+        if expected["rows"] != actual["rows"]:
+            differences.append(f"{label} rows: file {expected['rows']}, table {actual['rows']}")
+        for column in sorted(set(expected["sums"]) | set(actual["sums"])):
+            file_sum = expected["sums"].get(column, Decimal(0))
+            table_sum = actual["sums"].get(column, Decimal(0))
+            if file_sum != table_sum:
+                differences.append(
+                    f"{label} sum({column}): file {file_sum}, table {table_sum} ({table_sum - file_sum:+})"
+                )
+        if expected["key_hash"] != actual["key_hash"]:
+            differences.append(f"{label} key hash: file {expected['key_hash']}, table {actual['key_hash']}")
+    return differences
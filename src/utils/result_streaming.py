@@ -0,0 +1,170 @@
+"""
+Streaming consumption of stored procedure result sets.
+
+`cursor.callproc` buffers every result set of a procedure on the client.
+The helpers here run the procedure with CALL on an unbuffered cursor and
+hand the rows of each result set to a handler in fixed-size batches, so
+client memory stays bounded by one batch however large the final SELECT of
+the procedure is.
+
+A handler is any callable `handler(result_index, columns, rows)`; if it also
+has a `close()` method it is called once all result sets are consumed.
+ArrowFileSink writes each result set to a Parquet or Arrow IPC file.
+
+pyarrow is only needed for ArrowFileSink.
+"""
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+ResultHandler = Callable[[int, List[str], List[Sequence[Any]]], None]
+
+
+def iter_result_sets(cursor, statement: str, params: Sequence[Any] = ()) -> Iterator[Any]:
+    """
+    Execute a statement and yield the cursor once per result set that has rows.
+
+    Supports both the multi=True iterator of mysql-connector 8.x and the
+    nextset() API of newer releases.
+    """
+    if hasattr(cursor, "nextset"):
+        cursor.execute(statement, params)
+        while True:
+            if cursor.with_rows:
+                yield cursor
+            if not cursor.nextset():
+                break
+    else:
+        for result in cursor.execute(statement, params, multi=True):
+            if result.with_rows:
+                yield result
+
+
+def stream_procedure_results(
+    conn,
+    procedure_name: str,
+    procedure_params: Optional[Dict[str, Any]],
+    handler: ResultHandler,
+    batch_size: int = 10000
+) -> List[int]:
+    """
+    Call a procedure and stream its result sets to `handler` in batches.
+
+    Args:
+        conn: Open mysql.connector connection
+        procedure_name: Name of the stored procedure (format: database.procedure)
+        procedure_params: Optional dictionary of procedure parameters
+        handler: Callable receiving (result_index, columns, rows) per batch
+        batch_size: Number of rows fetched per batch
+
+    Returns:
+        Row count per result set
+    """
+    param_values = list(procedure_params.values()) if procedure_params else []
+    placeholders = ", ".join(["%s"] * len(param_values))
+    statement = f"CALL {procedure_name}({placeholders})"
+
+    row_counts = []
+    cursor = conn.cursor(buffered=False)
+    try:
+        for result_index, result in enumerate(iter_result_sets(cursor, statement, param_values)):
+            columns = [d[0] for d in result.description]
+            rows_read = 0
+            while True:
+                rows = result.fetchmany(batch_size)
+                if not rows:
+                    break
+                handler(result_index, columns, rows)
+                rows_read += len(rows)
+            row_counts.append(rows_read)
+    finally:
+        cursor.close()
+        if hasattr(handler, "close"):
+            handler.close()
+    return row_counts
+
+
+class ArrowFileSink:
+    """
+    Result handler writing each result set to its own Parquet or Arrow IPC file.
+
+    Every batch becomes one row group (Parquet) or record batch (Arrow). The
+    schema is fixed by the first batch of each result set; columns that are
+    all NULL in that batch are typed as strings and decimals are widened to
+    38 digits so later batches always fit.
+    """
+
+    def __init__(self, output_dir: str, prefix: str, file_format: str = "parquet"):
+        if file_format not in ("parquet", "arrow"):
+            raise ValueError(f"Unsupported result format: {file_format}")
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise ImportError("pyarrow is required to write result sets to Parquet/Arrow") from e
+        self.output_dir = Path(output_dir)
+        self.prefix = prefix
+        self.file_format = file_format
+        self.files: List[str] = []
+        self.rows_written: Dict[int, int] = {}
+        self._writers: Dict[int, Any] = {}
+        self._schemas: Dict[int, Any] = {}
+
+    def _infer_schema(self, columns: List[str], arrays: List[Any]):
+        import pyarrow as pa
+
+        fields = []
+        for name, array in zip(columns, arrays):
+            data_type = array.type
+            if pa.types.is_null(data_type):
+                data_type = pa.string()
+            elif pa.types.is_decimal(data_type):
+                data_type = pa.decimal128(38, data_type.scale)
+            fields.append(pa.field(name, data_type))
+        return pa.schema(fields)
+
+    def _open_writer(self, result_index: int, schema):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        extension = "parquet" if self.file_format == "parquet" else "arrow"
+        path = self.output_dir / f"{self.prefix}-{result_index}.{extension}"
+        if self.file_format == "parquet":
+            writer = pq.ParquetWriter(str(path), schema)
+        else:
+            writer = pa.ipc.new_file(str(path), schema)
+        self.files.append(str(path))
+        return writer
+
+    def __call__(self, result_index: int, columns: List[str], rows: List[Sequence[Any]]) -> None:
+        import pyarrow as pa
+
+        values = list(zip(*rows))
+        schema = self._schemas.get(result_index)
+        if schema is None:
+            arrays = [pa.array(column) for column in values]
+            schema = self._infer_schema(columns, arrays)
+            self._schemas[result_index] = schema
+            self._writers[result_index] = self._open_writer(result_index, schema)
+        arrays = [
+            pa.array(_normalize(column, field.type), type=field.type)
+            for column, field in zip(values, schema)
+        ]
+        self._writers[result_index].write_table(pa.Table.from_arrays(arrays, schema=schema))
+        self.rows_written[result_index] = self.rows_written.get(result_index, 0) + len(rows)
+
+    def close(self) -> None:
+        for writer in self._writers.values():
+            writer.close()
+        self._writers = {}
+
+
+def _normalize(column: Sequence[Any], data_type) -> Sequence[Any]:
+    """Convert values that pyarrow will not coerce on its own."""
+    import pyarrow as pa
+
+    if pa.types.is_string(data_type):
+        return [None if v is None else str(v) for v in column]
+    if pa.types.is_decimal(data_type):
+        return [v if v is None or isinstance(v, Decimal) else Decimal(str(v)) for v in column]
+    return column
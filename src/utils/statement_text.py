@@ -0,0 +1,275 @@
+"""
+Streaming parser for schedule-of-investments text copied out of fund statements.
+
+Holdings also arrive as text pasted from the statement PDFs (see
+tests/data/holdweb-copypaste-20241231.txt): a page header with the fund
+name, "Schedule of Investment Portfolio" and the date, multi-line column
+headers, section headings ending in ':', holdings whose issue name wraps
+over several lines with the values on the last one, subtotal and total
+lines, derivatives and cash lines. StatementTextParser turns that into
+holdweb rows in a single pass:
+
+    PAGE_START --"Schedule of Investment Portfolio"--> DATE --date--> COLUMNS
+    COLUMNS --"Fair value" "($)" or a heading--> HOLDINGS
+    HOLDINGS --"Schedule of Investment Portfolio"--> DATE (next page or fund)
+
+In HOLDINGS, lines are buffered until one ends with the values
+(currency, units, cost, fair value); the buffer is the issue name. The
+sector is the innermost section heading, e.g. "Canada (32.2%)". Memory is
+bounded by the name buffer, so any number of funds per file can be parsed.
+Lines that cannot be placed are reported, not guessed.
+"""
+import csv
+import re
+from datetime import datetime
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+
+from prefect import task
+
+from .tracing import span, file_size
+
+HOLDWEB_COLUMNS = ["date", "fund_name", "sec_name", "sector", "currency", "units", "cost", "mv"]
+
+# Longest issue name, in lines, before the buffer is considered garbage
+MAX_NAME_LINES = 6
+# Unparsed lines kept for the report
+MAX_REPORTED_LINES = 50
+
+# Values are matched token by token from the end of the line, which is much
+# cheaper than backtracking over the issue name with one regex per line
+NUMBER = re.compile(r"\(?-?[\d,]+(?:\.\d+)?\)?")
+RATE = re.compile(r"\d+\.\d+")
+CASH_PREFIXES = ("Cash", "Other assets less liabilities")
+SKIPPED_PREFIXES = ("Total ", "Net assets", "The accompanying notes")
+SCHEDULE_HEADER = "Schedule of Investment Portfolio"
+CASH_SECTOR = "Cash"
+
+PAGE_START, DATE, COLUMNS, HOLDINGS = "page_start", "date", "columns", "holdings"
+
+
+def parse_number(value: str) -> str:
+    """'1,493,549' -> '1493549', '(1,004,212)' -> '-1004212'."""
+    negative = value.startswith("(") and value.endswith(")")
+    value = value.strip("()").replace(",", "")
+    return f"-{value}" if negative else value
+
+
+def is_number(token: str) -> bool:
+    return NUMBER.fullmatch(token) is not None
+
+
+def is_currency(token: str) -> bool:
+    return len(token) == 3 and token.isalpha() and token.isupper()
+
+
+def split_holding(line: str) -> Optional[Tuple[str, str, str, str, str]]:
+    """'<name> [CUR] units cost mv' -> (name, currency, units, cost, mv)."""
+    parts = line.rsplit(" ", 4)
+    if len(parts) < 3 or not all(is_number(part) for part in parts[-3:]):
+        return None
+    name = parts[:-3]
+    currency = name.pop() if name and is_currency(name[-1]) else ""
+    return (" ".join(name), currency, *parts[-3:])
+
+
+def split_forward(line: str) -> Optional[Tuple[str, ...]]:
+    """'<name> rate PAY pay RECEIVE receive gain' -> (name, rate, PAY, pay, RECEIVE, receive, gain)."""
+    parts = line.rsplit(" ", 6)
+    if len(parts) < 6:
+        return None
+    rate, pay_currency, pay, receive_currency, receive, gain = parts[-6:]
+    if not (RATE.fullmatch(rate) and is_currency(pay_currency) and is_currency(receive_currency)
+            and is_number(pay) and is_number(receive) and is_number(gain)):
+        return None
+    return (" ".join(parts[:-6]), rate, pay_currency, pay, receive_currency, receive, gain)
+
+
+def parse_statement_date(line: str) -> Optional[str]:
+    try:
+        return datetime.strptime(line.strip(), "%B %d, %Y").strftime("%Y-%m-%d")
+    except ValueError:
+        return None
+
+
+class StatementTextParser:
+    """
+    Line-at-a-time state machine; feed() returns the holdweb row a line completes.
+
+        parser = StatementTextParser()
+        for line in f:
+            row = parser.feed(line)
+    """
+
+    def __init__(self, currency: str = "CAD"):
+        # Currency of cash lines, which carry none
+        self.currency = currency
+        self.state = PAGE_START
+        self.fund_name: Optional[str] = None
+        self.date: Optional[str] = None
+        self.sector: Optional[str] = None
+        self.buffer: List[Tuple[int, str]] = []
+        self.line_number = 0
+        self.rows = 0
+        self.funds = set()
+        self.unparsed: List[Tuple[int, str]] = []
+        self.unparsed_count = 0
+        self._previous_header = ""
+
+    def feed(self, line: str) -> Optional[Dict[str, str]]:
+        self.line_number += 1
+        line = " ".join(line.split())
+        if not line:
+            return None
+
+        if line.startswith(SCHEDULE_HEADER):
+            # The line before it was the fund name; anything else buffered is lost
+            if not self.buffer:
+                self.report(self.line_number, f"{line} without a fund name")
+            else:
+                self.discard(self.buffer[:-1])
+                self.fund_name = self.buffer[-1][1]
+                self.funds.add(self.fund_name)
+                if not line.endswith(("(cont'd)", "(cont’d)")):
+                    self.sector = None
+            self.buffer = []
+            self.state = DATE
+            return None
+
+        if self.state == DATE:
+            self.date = parse_statement_date(line)
+            if self.date is None:
+                self.report(self.line_number, f"expected a date: {line}")
+            self.state = COLUMNS
+            self._previous_header = ""
+            return None
+
+        if self.state == COLUMNS and not line.endswith(":"):
+            if line == "($)" and self._previous_header == "Fair value":
+                self.state = HOLDINGS
+            self._previous_header = line
+            return None
+
+        if self.state == PAGE_START:
+            # Fund name of the first page
+            self.buffer = self.buffer[-MAX_NAME_LINES:] + [(self.line_number, line)]
+            return None
+
+        return self.feed_holding(line)
+
+    def feed_holding(self, line: str) -> Optional[Dict[str, str]]:
+        self.state = HOLDINGS
+        if line.endswith(":"):
+            # Lines right before a heading are column headers of the new section
+            self.buffer = []
+            self.sector = line[:-1]
+            return None
+        if line.startswith(SKIPPED_PREFIXES) or all(is_number(token) for token in line.split(" ")):
+            # Totals and subtotals
+            self.discard(self.buffer)
+            return None
+
+        if line[-1].isdigit() or line[-1] == ")":
+            if line.startswith(CASH_PREFIXES) and not self.buffer:
+                name, _, value = line.rpartition(" ")
+                if is_number(value):
+                    value = parse_number(value)
+                    return self.row(name, CASH_SECTOR, self.currency, value, value, value)
+
+            forward = split_forward(line)
+            if forward:
+                tail, rate, pay_currency, pay, receive_currency, receive, gain = forward
+                name = f"{self.buffered_name(tail)} {rate} {pay_currency}:{receive_currency}"
+                return self.row(
+                    name, self.sector, pay_currency, parse_number(pay), parse_number(receive), parse_number(gain)
+                )
+
+            holding = split_holding(line)
+            if holding:
+                tail, currency, units, cost, mv = holding
+                return self.row(
+                    self.buffered_name(tail), self.sector, currency,
+                    parse_number(units), parse_number(cost), parse_number(mv)
+                )
+
+        # Part of an issue name (or the next page's fund name)
+        if len(self.buffer) == MAX_NAME_LINES:
+            self.discard(self.buffer[:1])
+            self.buffer = self.buffer[1:]
+        self.buffer.append((self.line_number, line))
+        return None
+
+    def buffered_name(self, tail: str) -> str:
+        parts = [text for _, text in self.buffer] + ([tail] if tail else [])
+        self.buffer = []
+        return " ".join(parts)
+
+    def row(self, name: str, sector: Optional[str], currency: str, units: str, cost: str, mv: str) -> Optional[Dict[str, str]]:
+        if not name or self.fund_name is None or self.date is None:
+            self.report(self.line_number, f"holding outside a fund schedule: {name}")
+            return None
+        self.rows += 1
+        return {
+            "date": self.date,
+            "fund_name": self.fund_name,
+            "sec_name": name,
+            "sector": sector or "",
+            "currency": currency,
+            "units": units,
+            "cost": cost,
+            "mv": mv
+        }
+
+    def discard(self, lines: List[Tuple[int, str]]) -> None:
+        for line_number, text in lines:
+            self.report(line_number, text)
+        if lines is self.buffer:
+            self.buffer = []
+
+    def report(self, line_number: int, text: str) -> None:
+        self.unparsed_count += 1
+        if len(self.unparsed) < MAX_REPORTED_LINES:
+            self.unparsed.append((line_number, text))
+
+    def close(self) -> None:
+        """Report what is left in the name buffer at the end of the input."""
+        self.discard(self.buffer)
+
+
+def parse_statement_text(lines: Iterable[str], parser: Optional[StatementTextParser] = None) -> Iterator[Dict[str, str]]:
+    """Yield the holdweb rows of statement text lines."""
+    parser = parser or StatementTextParser()
+    for line in lines:
+        row = parser.feed(line)
+        if row is not None:
+            yield row
+    parser.close()
+
+
+@task
+def convert_statement_text(input_path: str, output_path: str, currency: str = "CAD") -> Dict[str, Any]:
+    """
+    Convert a statement text dump to a holdweb CSV file.
+
+    Args:
+        input_path: Path to the copied statement text
+        output_path: Path of the CSV file to write
+        currency: Currency of cash lines
+
+    Returns:
+        Dict with the rows written, the funds found and the unparsed lines
+    """
+    parser = StatementTextParser(currency=currency)
+    with span("convert_statement_text", file=input_path, bytes=file_size(input_path)) as s:
+        with open(input_path, encoding="utf-8-sig", newline="") as source, \
+                open(output_path, "w", encoding="utf-8", newline="") as target:
+            writer = csv.DictWriter(target, fieldnames=HOLDWEB_COLUMNS, lineterminator="\n")
+            writer.writeheader()
+            writer.writerows(parse_statement_text(source, parser))
+        s.set(rows=parser.rows, funds=len(parser.funds), unparsed=parser.unparsed_count)
+    return {
+        "output_path": output_path,
+        "rows": parser.rows,
+        "funds": sorted(parser.funds),
+        "unparsed": parser.unparsed,
+        "unparsed_count": parser.unparsed_count
+    }
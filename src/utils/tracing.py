@@ -0,0 +1,231 @@
+"""
+Span tracing and sampling CPU profiles for workflow runs.
+
+Tracing is off unless a run starts it with start_trace(). While it is on,
+`span()` records nested, timed spans with attributes (file, table, rows,
+bytes, ...) from any thread. stop_trace() writes them as a Chrome trace
+event file (<name>-<stamp>.trace.json), which opens in Perfetto
+(ui.perfetto.dev) or chrome://tracing.
+
+With cpu_profile, a sampling profiler also records the Python stacks of all
+threads at a fixed interval and writes them in folded-stack format
+(<name>-<stamp>.folded), the input of flamegraph.pl and speedscope. Samples
+are wall-clock: a thread blocked on the database shows up with the
+connector's socket read on top, so parsing time and DB waits can be
+compared in one graph.
+
+When tracing is off, span() only checks a global.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+# Seconds between CPU profile samples
+DEFAULT_SAMPLE_INTERVAL = 0.005
+
+
+class Span:
+    """An open span; attributes can be added until it ends."""
+
+    def __init__(self, tracer: "Tracer", name: str, attrs: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.thread = threading.current_thread()
+        self.start = tracer.now_us()
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    def end(self) -> None:
+        self.tracer.add_span(self, self.start, self.tracer.now_us())
+
+
+class _NoopSpan:
+    def set(self, **attrs) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    """Collects spans of one run as Chrome trace events."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.pid = os.getpid()
+        self.events: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._threads: Dict[int, str] = {}
+        self._origin = time.perf_counter_ns()
+
+    def now_us(self) -> float:
+        return (time.perf_counter_ns() - self._origin) / 1000
+
+    def add_span(self, span: Span, start_us: float, end_us: float) -> None:
+        thread = span.thread
+        event = {
+            "name": span.name,
+            "ph": "X",
+            "ts": start_us,
+            "dur": end_us - start_us,
+            "pid": self.pid,
+            "tid": thread.ident,
+            "args": {k: _jsonable(v) for k, v in span.attrs.items()}
+        }
+        with self._lock:
+            self._threads.setdefault(thread.ident, thread.name)
+            self.events.append(event)
+
+    def write(self, path: str) -> str:
+        with self._lock:
+            metadata = [
+                {"name": "process_name", "ph": "M", "pid": self.pid, "tid": 0, "args": {"name": self.name}}
+            ] + [
+                {"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": name}}
+                for tid, name in self._threads.items()
+            ]
+            events = sorted(self.events, key=lambda e: e["ts"])
+        with open(path, "w") as f:
+            json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, f)
+        return path
+
+
+class SamplingProfiler:
+    """Samples the Python stacks of all threads from a background thread."""
+
+    def __init__(self, interval: float = DEFAULT_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for tid, frame in sys._current_frames().items():
+                if tid == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(tid, str(tid)))
+                self.samples[";".join(reversed(stack))] += 1
+
+    def write(self, path: str) -> str:
+        with open(path, "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+
+_tracer: Optional[Tracer] = None
+_profiler: Optional[SamplingProfiler] = None
+_output_prefix: Optional[str] = None
+
+
+def start_trace(
+    name: str,
+    trace_dir: str,
+    cpu_profile: bool = False,
+    sample_interval: float = DEFAULT_SAMPLE_INTERVAL
+) -> None:
+    """
+    Start collecting spans (and CPU samples) for this process.
+
+    Args:
+        name: Run name, used for the output file names
+        trace_dir: Directory the trace and profile are written to
+        cpu_profile: Boolean indicating whether to sample CPU stacks as well
+        sample_interval: Seconds between CPU profile samples
+    """
+    global _tracer, _profiler, _output_prefix
+    if _tracer is not None:
+        return
+    os.makedirs(trace_dir, exist_ok=True)
+    slug = "".join(c if c.isalnum() else "-" for c in name.lower()).strip("-")
+    _output_prefix = os.path.join(trace_dir, f"{slug}-{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    _tracer = Tracer(name)
+    if cpu_profile:
+        _profiler = SamplingProfiler(sample_interval)
+        _profiler.start()
+
+
+def stop_trace() -> Dict[str, str]:
+    """Stop tracing and write the output files; returns their paths by kind."""
+    global _tracer, _profiler
+    paths = {}
+    if _profiler is not None:
+        _profiler.stop()
+        paths["cpu_profile"] = _profiler.write(f"{_output_prefix}.folded")
+        _profiler = None
+    if _tracer is not None:
+        paths["trace"] = _tracer.write(f"{_output_prefix}.trace.json")
+        _tracer = None
+    return paths
+
+
+def tracing_enabled() -> bool:
+    return _tracer is not None
+
+
+@contextmanager
+def span(name: str, **attrs) -> Iterator[Any]:
+    """
+    Time the enclosed block as a span. Spans opened inside it on the same
+    thread nest under it.
+
+        with span("load_data", file=file_path, table=target_table) as s:
+            cursor.execute(load_query)
+            s.set(rows=cursor.rowcount)
+    """
+    current = open_span(name, **attrs)
+    try:
+        yield current
+    except BaseException as e:
+        current.set(error=f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        current.end()
+
+
+def open_span(name: str, **attrs) -> Any:
+    """Start a span that is ended explicitly with .end(), for spans not bound to a block."""
+    tracer = _tracer
+    if tracer is None:
+        return _NOOP_SPAN
+    return Span(tracer, name, attrs)
+
+
+def file_size(path: str) -> Optional[int]:
+    """Size of a locally readable file, for span attributes."""
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
+
+
+def _jsonable(value: Any) -> Any:
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
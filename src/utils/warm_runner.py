@@ -0,0 +1,398 @@
+"""
+Warm execution of registered workflows.
+
+A deployment run on default-agent-pool starts a fresh interpreter that
+imports prefect, mysql.connector, pandas and pdfplumber before the flow does
+any work; for the small fee loads that startup dominates. The warm runner
+keeps that work done ahead of time:
+
+    - a forkserver process imports PRELOAD_MODULES once
+    - `pool_size` workers are forked from it and wait, imports done, for one job each
+    - a job is either a deployment flow run (its id, environment and working
+      directory) or a registered workflow name (see src/workflows/__init__.py)
+      and its parameters; a worker runs exactly one job and exits, and a
+      replacement is forked in the background, so runs stay isolated from each other
+
+Deployment runs reach the runner through the process worker's command: the
+deployments in prefect.yaml set it to `python -m src.utils.warm_runner
+flow-run`, which hands the flow run to a warm worker, where prefect.engine
+runs it exactly as the default command would, and exits with its exit code.
+If no runner is reachable (or WARM_RUNNER_AUTHKEY is unset) the command
+falls back to a cold `python -m prefect.engine`. Cancelling the run kills the
+flow-run command, and the runner then terminates the warm worker. The
+etl-agent image starts the runner on loopback next to the Prefect worker
+(docker/etl-agent-entrypoint.sh).
+
+Requests arrive over a multiprocessing Listener (default 127.0.0.1:8888).
+Jobs are pickled, so whoever can connect can run code in the runner: the
+runner and its clients must share a secret in WARM_RUNNER_AUTHKEY, and
+`serve` and the clients refuse to start without one. Every run reports its
+startup-to-first-SQL latency: the time from the request being submitted to
+the first statement sent to the database.
+
+usage (from the repo root, WARM_RUNNER_AUTHKEY exported in both shells):
+    PYTHONPATH=. python -m src.utils.warm_runner serve --pool-size 2
+    PYTHONPATH=. python -m src.utils.warm_runner run import_web_classfees --params params.json
+    PYTHONPATH=. python -m src.utils.warm_runner bench import_web_classfees --params params.json --repeat 5
+    PREFECT__FLOW_RUN_ID=... python -m src.utils.warm_runner flow-run
+
+`bench` runs the same job cold (a fresh interpreter per run, like a
+deployment run) and warm, and compares the latencies.
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import runpy
+import signal
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing.connection import Listener, Client, wait
+from typing import Dict, Any, List, Optional
+
+DEFAULT_ADDRESS = ("127.0.0.1", 8888)
+
+# Imported once by the forkserver; missing optional modules are skipped
+PRELOAD_MODULES = [
+    "prefect",
+    "mysql.connector",
+    "pandas",
+    "pdfplumber",
+    "pyarrow",
+    "src.workflows",
+    "src.workflows.pdf_extraction",
+]
+
+logger = logging.getLogger(__name__)
+
+
+def get_authkey() -> bytes:
+    """Shared secret of the runner and its clients; there is no default."""
+    key = os.getenv("WARM_RUNNER_AUTHKEY")
+    if not key:
+        raise RuntimeError("WARM_RUNNER_AUTHKEY is not set")
+    return key.encode()
+
+
+def job_name(job: Dict[str, Any]) -> str:
+    if "flow_run_id" in job:
+        return f"flow run {job['flow_run_id']}"
+    return job["workflow"]
+
+
+class FirstStatement:
+    """Records when the first SQL statement of a run is sent."""
+
+    def __init__(self):
+        self.at: Optional[float] = None
+
+    def mark(self, *args) -> None:
+        if self.at is None:
+            self.at = time.time()
+
+
+def instrument_first_sql(first: FirstStatement) -> None:
+    """
+    Patch the database entry points of this process to mark the first statement.
+
+    Only called in worker processes, which run one job and exit.
+    """
+    def wrap(cls, method: str) -> None:
+        original = getattr(cls, method)
+
+        def marked(self, *args, **kwargs):
+            first.mark()
+            return original(self, *args, **kwargs)
+        setattr(cls, method, marked)
+
+    try:
+        from mysql.connector.cursor import MySQLCursor
+        wrap(MySQLCursor, "execute")
+        wrap(MySQLCursor, "callproc")
+        from mysql.connector.cursor_cext import CMySQLCursor
+        wrap(CMySQLCursor, "execute")
+        wrap(CMySQLCursor, "callproc")
+    except ImportError:
+        pass
+
+    # sqlite3 cursors cannot be patched; trace the embedded backend's connections instead
+    from .db_backend import SQLiteBackend
+    connect = SQLiteBackend.connect
+
+    def traced_connect(self, *args, **kwargs):
+        conn = connect(self, *args, **kwargs)
+        conn.set_trace_callback(first.mark)
+        return conn
+    SQLiteBackend.connect = traced_connect
+
+
+def run_flow_run(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run a deployment flow run in this process with prefect.engine.
+
+    The environment and working directory are the ones the Prefect worker gave
+    the flow-run command, so the engine sees what a cold start would.
+    """
+    os.environ.update(job["env"])
+    os.chdir(job["cwd"])
+    try:
+        # Settings were read when the forkserver imported prefect
+        from prefect.context import refresh_global_settings_context
+        refresh_global_settings_context()
+    except ImportError:
+        pass
+    sys.argv = ["prefect.engine", job["flow_run_id"]]
+    try:
+        runpy.run_module("prefect.engine", run_name="__main__", alter_sys=True)
+        exit_code = 0
+    except SystemExit as e:
+        exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    return {"ok": exit_code == 0, "exit_code": exit_code}
+
+
+def run_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one flow run or registered workflow in this process and time it."""
+    first = FirstStatement()
+    instrument_first_sql(first)
+    started = time.time()
+    result = {"workflow": job_name(job), "pid": os.getpid()}
+    try:
+        if "flow_run_id" in job:
+            result.update(run_flow_run(job))
+        else:
+            from src.workflows import get_workflow
+            value = get_workflow(job["workflow"])(**job.get("parameters", {}))
+            result["ok"] = value is not False
+            result["result"] = value if isinstance(value, (bool, int, float, str, type(None))) else repr(value)
+    except Exception as e:
+        result["ok"] = False
+        result["error"] = f"{type(e).__name__}: {e}"
+    finished = time.time()
+    submitted = job.get("submitted", started)
+    result.update({
+        "startup_seconds": round(started - submitted, 4),
+        "first_sql_seconds": round(first.at - submitted, 4) if first.at else None,
+        "total_seconds": round(finished - submitted, 4)
+    })
+    return result
+
+
+def worker_main(conn) -> None:
+    """Forked from the forkserver with the imports done; waits for one job."""
+    try:
+        job = conn.recv()
+    except EOFError:
+        return
+    if job is None:
+        return
+    conn.send(run_job(job))
+    conn.close()
+
+
+class WarmPool:
+    """Pre-forked single-use workers."""
+
+    def __init__(self, size: int = 2, preload: Optional[List[str]] = None):
+        self.context = multiprocessing.get_context("forkserver")
+        self.context.set_forkserver_preload(PRELOAD_MODULES if preload is None else preload)
+        self.ready: "queue.Queue" = queue.Queue()
+        self._closed = False
+        for _ in range(size):
+            self._spawn()
+
+    def _spawn(self) -> None:
+        if self._closed:
+            return
+        parent, child = self.context.Pipe()
+        process = self.context.Process(target=worker_main, args=(child,), name="warm-worker")
+        process.start()
+        child.close()
+        self.ready.put((process, parent))
+
+    def run(self, job: Dict[str, Any], client=None) -> Dict[str, Any]:
+        """
+        Run a job on a ready worker.
+
+        If the client connection closes first (the flow-run command was
+        killed, e.g. the run was cancelled) the worker is terminated.
+        """
+        process, conn = self.ready.get()
+        threading.Thread(target=self._spawn, daemon=True).start()
+        try:
+            conn.send(job)
+            if client is not None and client in wait([conn, client]) and not conn.poll():
+                process.terminate()
+            result = conn.recv()
+        except (EOFError, OSError):
+            process.join()
+            result = {"workflow": job_name(job), "ok": False, "exit_code": 1,
+                      "error": f"worker exited with code {process.exitcode}"}
+        finally:
+            conn.close()
+        process.join()
+        return result
+
+    def close(self) -> None:
+        self._closed = True
+        while not self.ready.empty():
+            process, conn = self.ready.get()
+            conn.send(None)
+            conn.close()
+            process.join()
+
+
+def format_result(result: Dict[str, Any]) -> str:
+    first_sql = result.get("first_sql_seconds")
+    message = (
+        f"{result['workflow']}: {'ok' if result.get('ok') else 'failed'}, "
+        f"startup {result.get('startup_seconds', 0) * 1000:.0f}ms, "
+        f"startup-to-first-SQL {'-' if first_sql is None else f'{first_sql * 1000:.0f}ms'}, "
+        f"total {result.get('total_seconds', 0):.2f}s"
+    )
+    if result.get("error"):
+        message += f" ({result['error']})"
+    return message
+
+
+def serve(pool_size: int, address=DEFAULT_ADDRESS) -> None:
+    """Accept run requests until interrupted; each connection carries one job."""
+    authkey = get_authkey()
+    pool = WarmPool(pool_size)
+    listener = Listener(address, authkey=authkey)
+    logger.info(f"Warm runner listening on {address[0]}:{address[1]} with {pool_size} workers")
+
+    def handle(conn) -> None:
+        try:
+            job = conn.recv()
+            result = pool.run(job, client=conn)
+            logger.info(format_result(result))
+            conn.send(result)
+        except Exception as e:
+            logger.error(f"Warm run failed: {str(e)}")
+        finally:
+            conn.close()
+
+    try:
+        while True:
+            conn = listener.accept()
+            threading.Thread(target=handle, args=(conn,), daemon=True).start()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        listener.close()
+        pool.close()
+
+
+def submit(workflow: str, parameters: Dict[str, Any], address=DEFAULT_ADDRESS) -> Dict[str, Any]:
+    """Run a registered workflow on a warm runner and return its result and timings."""
+    conn = Client(address, authkey=get_authkey())
+    try:
+        conn.send({"workflow": workflow, "parameters": parameters, "submitted": time.time()})
+        return conn.recv()
+    finally:
+        conn.close()
+
+
+def run_flow_run_command(address=DEFAULT_ADDRESS) -> int:
+    """
+    Process worker command: run the flow run in PREFECT__FLOW_RUN_ID on the warm runner.
+
+    Falls back to a cold prefect.engine in this process when the runner cannot be reached.
+    """
+    flow_run_id = os.environ["PREFECT__FLOW_RUN_ID"]
+    job = {"flow_run_id": flow_run_id, "env": dict(os.environ), "cwd": os.getcwd(), "submitted": time.time()}
+    try:
+        conn = Client(address, authkey=get_authkey())
+    except (RuntimeError, OSError) as e:
+        logger.warning(f"Warm runner not available ({str(e)}), starting flow run {flow_run_id} cold")
+        os.execv(sys.executable, [sys.executable, "-m", "prefect.engine", flow_run_id])
+    # Killed by the Prefect worker (cancellation): closing the connection stops the warm worker
+    signal.signal(signal.SIGTERM, lambda *args: sys.exit(143))
+    try:
+        conn.send(job)
+        result = conn.recv()
+    finally:
+        conn.close()
+    logger.info(format_result(result))
+    return result.get("exit_code", 0 if result.get("ok") else 1)
+
+
+def run_cold(workflow: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
+    """Run a workflow in a fresh interpreter, as a deployment run would."""
+    job = {"workflow": workflow, "parameters": parameters, "submitted": time.time()}
+    completed = subprocess.run(
+        [sys.executable, "-m", "src.utils.warm_runner", "once"],
+        input=json.dumps(job), capture_output=True, text=True
+    )
+    # The result is the last line; the flow logs go before it
+    lines = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or not lines:
+        return {"workflow": workflow, "ok": False, "error": completed.stderr.strip()[-500:]}
+    return json.loads(lines[-1])
+
+
+def bench(workflow: str, parameters: Dict[str, Any], repeat: int, address=DEFAULT_ADDRESS) -> None:
+    runs = {"cold": [], "warm": []}
+    for _ in range(repeat):
+        runs["cold"].append(run_cold(workflow, parameters))
+        runs["warm"].append(submit(workflow, parameters, address))
+    print(f"{'mode':>6} {'startup (ms)':>13} {'first SQL (ms)':>15} {'total (s)':>10}")
+    for mode, results in runs.items():
+        failed = [r for r in results if not r.get("ok")]
+        for r in failed:
+            print(f"{mode}: {format_result(r)}")
+        first_sql = [r["first_sql_seconds"] for r in results if r.get("first_sql_seconds") is not None]
+        print(
+            f"{mode:>6} {statistics.median(r.get('startup_seconds', 0) for r in results) * 1000:>13.0f} "
+            f"{(statistics.median(first_sql) * 1000 if first_sql else float('nan')):>15.0f} "
+            f"{statistics.median(r.get('total_seconds', 0) for r in results):>10.2f}"
+        )
+
+
+def load_parameters(path: Optional[str]) -> Dict[str, Any]:
+    if not path:
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=DEFAULT_ADDRESS[0])
+    parser.add_argument("--port", type=int, default=DEFAULT_ADDRESS[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_parser = commands.add_parser("serve", help="Start the warm runner")
+    serve_parser.add_argument("--pool-size", type=int, default=2)
+    for name in ("run", "bench"):
+        command = commands.add_parser(name, help=f"{name.capitalize()} a registered workflow")
+        command.add_argument("workflow")
+        command.add_argument("--params", help="JSON file with the flow parameters")
+        if name == "bench":
+            command.add_argument("--repeat", type=int, default=5)
+    commands.add_parser("flow-run", help="Run the flow run in PREFECT__FLOW_RUN_ID (process worker command)")
+    commands.add_parser("once", help="Run one job read from stdin (used by bench for cold runs)")
+    args = parser.parse_args()
+    address = (args.host, args.port)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if args.command == "serve":
+        serve(args.pool_size, address)
+    elif args.command == "run":
+        result = submit(args.workflow, load_parameters(args.params), address)
+        print(format_result(result))
+        sys.exit(0 if result.get("ok") else 1)
+    elif args.command == "bench":
+        bench(args.workflow, load_parameters(args.params), args.repeat, address)
+    elif args.command == "flow-run":
+        sys.exit(run_flow_run_command(address))
+    else:
+        print(json.dumps(run_job(json.load(sys.stdin))))
+
+
+if __name__ == "__main__":
+    main()
@@ -18,5 +18,10 @@ def get_workflow(name: str) -> Type[Flow]:
     return WORKFLOW_REGISTRY[name]
 
 # Import and register workflows
-from .import_web_classfees import import_web_classfees_workflow
-register_workflow("import_web_classfees", import_web_classfees_workflow) 
\ No newline at end of file
+from .import_web_classfees import import_web_classfees_flow
+from .import_web_hold import import_web_hold_flow, import_web_hold_batch_flow
+from .daily_ingestion import daily_ingestion_flow
+register_workflow("import_web_classfees", import_web_classfees_flow)
+register_workflow("import_web_hold", import_web_hold_flow)
+register_workflow("import_web_hold_batch", import_web_hold_batch_flow)
+register_workflow("daily_ingestion", daily_ingestion_flow) 
\ No newline at end of file
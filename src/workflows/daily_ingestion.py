@@ -0,0 +1,98 @@
+from typing import Optional, Dict, List
+
+from prefect import flow, get_run_logger
+from prefect.artifacts import create_markdown_artifact
+
+from src.utils.ingestion_dag import ingestion_step, run_ingestion_dag, format_timing_report
+from src.utils.tracing import start_trace, stop_trace, span, tracing_enabled
+from src.workflows.import_web_classfees import ImportWebClassFeesWorkflow
+from src.workflows.import_web_hold import ImportWebHoldWorkflow
+
+@flow(name="Daily Ingestion")
+def daily_ingestion_flow(
+    classfees_file: str,
+    hold_file: str,
+    db_host: str,
+    db_port: str,  # Accept as string for env var compatibility
+    db_user: str,
+    db_password: str,
+    db_name: str,
+    delimiter: str = ',',
+    quote_char: str = '"',
+    line_terminator: str = '\n',
+    skip_lines: int = 1,
+    truncate_before_load: bool = True,
+    publish_history: bool = False,
+    maintain_aggregates: bool = False,
+    procedure_dependencies: Optional[Dict[str, List[str]]] = None,
+    stall_timeout: Optional[float] = None,
+    trace_dir: Optional[str] = None,
+    cpu_profile: bool = False,
+    reconcile: bool = False,
+    track_latency: bool = False,
+) -> bool:
+    """
+    Load the classfees and holdings files of one day in a single flow run.
+
+    Both staging loads run concurrently. Each procedure starts once its own
+    load and the procedures of the steps it depends on have finished, e.g.
+    procedure_dependencies={"hold": ["classfees"]} runs usp_holdweb_process
+    after usp_FundClassFee_Load. Steps without dependencies run in parallel.
+    A timing breakdown with the critical path is published as an artifact.
+    """
+    logger = get_run_logger()
+    procedure_dependencies = procedure_dependencies or {}
+    load_options = {
+        "delimiter": delimiter,
+        "quote_char": quote_char,
+        "line_terminator": line_terminator,
+        "skip_lines": skip_lines
+    }
+
+    classfees = ImportWebClassFeesWorkflow()
+    hold = ImportWebHoldWorkflow(
+        publish_history=publish_history,
+        maintain_aggregates=maintain_aggregates
+    )
+    truncate_before_load = classfees.resolve_truncate(truncate_before_load)
+    for workflow in (classfees, hold):
+        workflow.stall_timeout = float(stall_timeout) if stall_timeout else None
+        workflow.reconcile = workflow.resolve_flag(reconcile, False)
+        workflow.track_latency = workflow.resolve_flag(track_latency, False)
+    steps = [
+        ingestion_step(
+            "classfees", classfees, classfees_file,
+            depends_on=procedure_dependencies.get("classfees"),
+            truncate_before_load=truncate_before_load,
+            **load_options
+        ),
+        ingestion_step(
+            "hold", hold, hold_file,
+            depends_on=procedure_dependencies.get("hold"),
+            truncate_before_load=truncate_before_load,
+            **load_options
+        ),
+    ]
+
+    db_config = classfees.build_db_config(db_host, db_port, db_user, db_password, db_name)
+    owns_trace = bool(trace_dir) and not tracing_enabled()
+    if owns_trace:
+        start_trace("Daily Ingestion", trace_dir, cpu_profile=cpu_profile)
+    try:
+        with span("daily_ingestion", classfees_file=classfees_file, hold_file=hold_file):
+            report = run_ingestion_dag(steps, db_config, logger)
+    finally:
+        if owns_trace:
+            for kind, path in stop_trace().items():
+                logger.info(f"Wrote {kind.replace('_', ' ')} to {path}")
+    timing = format_timing_report(report)
+    logger.info(f"Daily ingestion timing:\n{timing}")
+    create_markdown_artifact(
+        key="daily-ingestion-timing",
+        markdown=timing,
+        description="Per-node timings and critical path of the daily ingestion"
+    )
+
+    if report["failed"] or report["skipped"]:
+        raise Exception(f"Daily ingestion failed: {report['failed']}, skipped: {report['skipped']}")
+    return True
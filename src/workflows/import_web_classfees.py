@@ -2,7 +2,6 @@ import os
 from pathlib import Path
 from typing import Optional, Dict, Any
 
-import mysql.connector
 from prefect import flow, task
 from prefect.tasks import task_input_hash
 from datetime import timedelta
@@ -22,6 +21,7 @@ def check_file_exists(file_path: str, db_config: dict = None) -> bool:
 def load_data_to_staging(file_path: str, db_config: dict) -> bool:
     """Load data from file into staging table using LOAD DATA INFILE."""
     try:
+        import mysql.connector
         conn = mysql.connector.connect(**db_config)
         cursor = conn.cursor()
         
@@ -60,6 +60,7 @@ def load_data_to_staging(file_path: str, db_config: dict) -> bool:
 def execute_stored_procedure(db_config: dict) -> bool:
     """Execute the stored procedure for data processing."""
     try:
+        import mysql.connector
         conn = mysql.connector.connect(**db_config)
         cursor = conn.cursor()
         
@@ -103,7 +104,12 @@ class ImportWebClassFeesWorkflow(BaseIngestionWorkflow):
                 "MinInvestmentSubsequent": "NULLIF(@MinInvestmentSubsequent, '')"
             },
             procedure_name="bormeta.usp_FundClassFee_Load",
-            truncate_before_load=True
+            truncate_before_load=True,
+            control_totals={
+                "group_by": "FundCode",
+                "sums": {"Mer": 2, "Trailer": 2},
+                "key": ["FundCode", "Class"]
+            }
         )
 
 @flow
@@ -119,6 +125,18 @@ def import_web_classfees_flow(
     line_terminator: str = '\n',
     skip_lines: int = 1,
     truncate_before_load: bool = True,  # <-- Add this line, default matches YAML
+    deferred_indexes: bool = False,
+    result_output_dir: Optional[str] = None,
+    result_format: str = "parquet",
+    auto_plan: bool = False,
+    dry_run: bool = False,
+    profile_input: bool = False,
+    progress_interval: Optional[float] = None,
+    stall_timeout: Optional[float] = None,
+    trace_dir: Optional[str] = None,
+    cpu_profile: bool = False,
+    reconcile: bool = False,
+    track_latency: bool = False,
 ) -> bool:
     """
     Top-level Prefect flow for Import Web ClassFees.
@@ -136,6 +154,18 @@ def import_web_classfees_flow(
         line_terminator=line_terminator,
         skip_lines=skip_lines,
         truncate_before_load=truncate_before_load,  # <-- Pass it through
+        deferred_indexes=deferred_indexes,
+        result_output_dir=result_output_dir,
+        result_format=result_format,
+        auto_plan=auto_plan,
+        dry_run=dry_run,
+        profile_input=profile_input,
+        progress_interval=progress_interval,
+        stall_timeout=stall_timeout,
+        trace_dir=trace_dir,
+        cpu_profile=cpu_profile,
+        reconcile=reconcile,
+        track_latency=track_latency,
     )
 
 # Create workflow instance
@@ -1,10 +1,16 @@
-import shutil
 from pathlib import Path
 from prefect import flow
+from typing import Optional, Dict, Any
 from src.utils.base_ingestion import BaseIngestionWorkflow
+from src.utils.db_backend import get_backend
+from src.utils.file_coalescing import expand_source_pattern, sibling_dir, STAGING_DIRNAME
+from src.utils.partition_exchange import publish_partition
+from src.utils.holdings_aggregates import refresh_holdings_aggregates, file_slices
+from src.utils.statement_text import convert_statement_text
+from src.utils.latency import file_arrival_time
 
 class ImportWebHoldWorkflow(BaseIngestionWorkflow):
-    def __init__(self):
+    def __init__(self, publish_history: bool = False, maintain_aggregates: bool = False):
         super().__init__(
             name="Import Web Hold",
             target_table="borarch.holdweb",
@@ -20,7 +26,91 @@ class ImportWebHoldWorkflow(BaseIngestionWorkflow):
             },
             procedure_name="bormeta.usp_holdweb_process",
             procedure_params={"flag": False},
-            truncate_before_load=True
+            truncate_before_load=True,
+            control_totals={
+                "group_by": "fund_name",
+                "sums": {"units": 6, "cost": 6, "mv": 6},
+                "key": ["date", "fund_name", "sec_name"]
+            }
+        )
+        # Dated history, see ref/9.ddl-borarch-holdweb-hist.sql
+        self.publish_history = publish_history
+        self.history_table = "borarch.holdweb_hist"
+        self.exchange_table = "borarch.holdweb_xchg"
+        # Aggregates by fund x sector/currency, see ref/10.ddl-borarch-holdweb-agg.sql
+        self.maintain_aggregates = maintain_aggregates
+        self.aggregate_table = "borarch.holdweb_agg"
+
+    def after_load(self, db_config: Dict[str, Any], file_path: str, load_options: Dict[str, Any]) -> None:
+        """Publish the loaded file to the history table and refresh the aggregates."""
+        if self.maintain_aggregates:
+            # Only the file's slices: in a coalesced run holdweb also holds the earlier batches
+            if not refresh_holdings_aggregates(
+                db_config=db_config,
+                source_table=self.target_table,
+                aggregate_table=self.aggregate_table,
+                slices=file_slices(file_path, self.field_mappings, **load_options)
+            ):
+                raise Exception(f"Failed to refresh {self.aggregate_table}")
+        if self.publish_history:
+            self.publish_to_history(db_config, file_path)
+
+    def check_backend(self, db_config: Dict[str, Any]) -> None:
+        """History partitions are exchanged with MySQL DDL."""
+        backend = get_backend(db_config)
+        if self.publish_history and not backend.supports_partition_exchange:
+            raise ValueError(f"publish_history is not supported by the {backend.name} backend")
+
+    def resolve_truncate(self, truncate_before_load: Optional[bool]) -> bool:
+        """Resolve the truncate flag; publishing history and aggregates require a truncated holdweb."""
+        truncate_before_load = super().resolve_truncate(truncate_before_load)
+        if self.publish_history and not truncate_before_load:
+            # The history partition is filled from holdweb, which must hold this file only
+            raise ValueError("publish_history requires truncate_before_load")
+        if self.maintain_aggregates and not truncate_before_load:
+            # The aggregates count every holdweb row of a slice; appending would count a reload twice
+            raise ValueError("maintain_aggregates requires truncate_before_load")
+        return truncate_before_load
+
+    def convert_statement_text(self, file_path: str, output_dir: Optional[str] = None) -> str:
+        """
+        Convert copied statement text to a holdweb CSV file and return its path.
+
+        The CSV goes to the staging sibling of the source's directory unless
+        output_dir is given: next to the source, in incoming, it would match
+        the batch flow's holdweb-*.csv pattern and be loaded a second time.
+        """
+        source = Path(file_path)
+        target_dir = Path(output_dir) if output_dir else sibling_dir(file_path, STAGING_DIRNAME)
+        target_dir.mkdir(parents=True, exist_ok=True)
+        output_path = str(target_dir / f"{source.stem}.csv")
+        if Path(output_path).resolve() == source.resolve():
+            raise ValueError(f"Statement text {file_path} would be overwritten by its conversion")
+        result = convert_statement_text(file_path, output_path)
+        self.logger.info(
+            f"Converted {file_path} to {output_path}: {result['rows']} holdings "
+            f"of {len(result['funds'])} funds"
+        )
+        for line_number, text in result["unparsed"]:
+            self.logger.warning(f"{file_path}:{line_number} not parsed: {text}")
+        if result["unparsed_count"] > len(result["unparsed"]):
+            self.logger.warning(f"{result['unparsed_count'] - len(result['unparsed'])} more lines not parsed")
+        return output_path
+    
+    def publish_to_history(self, db_config: Dict[str, Any], file_path: str) -> None:
+        """Publish the rows staged from the file into its date partition of the history table."""
+        published = publish_partition(
+            db_config=db_config,
+            source_table=self.target_table,
+            history_table=self.history_table,
+            exchange_table=self.exchange_table,
+            columns=list(self.field_mappings.values())
+        )
+        if not published:
+            raise Exception(f"Failed to publish {file_path} to {self.history_table}")
+        self.logger.info(
+            f"Published {published['rows']} rows for {published['date']} "
+            f"to {self.history_table} partition {published['partition']}"
         )
 
 @flow
@@ -36,8 +126,32 @@ def import_web_hold_flow(
     line_terminator: str = '\n',
     skip_lines: int = 1,
     truncate_before_load: bool = False,  # <-- Add this line, default matches YAML
+    publish_history: bool = False,
+    maintain_aggregates: bool = False,
+    result_output_dir: Optional[str] = None,
+    result_format: str = "parquet",
+    auto_plan: bool = False,
+    dry_run: bool = False,
+    profile_input: bool = False,
+    progress_interval: Optional[float] = None,
+    stall_timeout: Optional[float] = None,
+    trace_dir: Optional[str] = None,
+    cpu_profile: bool = False,
+    reconcile: bool = False,
+    track_latency: bool = False,
+    statement_text: bool = False,
+    converted_dir: Optional[str] = None,
 ) -> bool:
-    wf = ImportWebHoldWorkflow()
+    wf = ImportWebHoldWorkflow(
+        publish_history=publish_history,
+        maintain_aggregates=maintain_aggregates
+    )
+    arrival_time = None
+    if wf.resolve_flag(statement_text, False):
+        # Holdings copied out of a statement, converted to the holdweb layout first;
+        # latency counts from the arrival of the text, not of the converted file
+        arrival_time = file_arrival_time(source_file)
+        source_file = wf.convert_statement_text(source_file, converted_dir)
     return wf.execute(
         file_path=source_file,
         db_host=db_host,
@@ -50,4 +164,76 @@ def import_web_hold_flow(
         line_terminator=line_terminator,
         skip_lines=skip_lines,
         truncate_before_load=truncate_before_load,  # <-- Pass it through
-    ) 
\ No newline at end of file
+        result_output_dir=result_output_dir,
+        result_format=result_format,
+        auto_plan=auto_plan,
+        dry_run=dry_run,
+        profile_input=profile_input,
+        progress_interval=progress_interval,
+        stall_timeout=stall_timeout,
+        trace_dir=trace_dir,
+        cpu_profile=cpu_profile,
+        reconcile=reconcile,
+        track_latency=track_latency,
+        arrival_time=arrival_time,
+    )
+
+@flow
+def import_web_hold_batch_flow(
+    source_pattern: str,
+    db_host: str,
+    db_port: str,  # Accept as string for env var compatibility
+    db_user: str,
+    db_password: str,
+    db_name: str,
+    delimiter: str = ',',
+    quote_char: str = '"',
+    line_terminator: str = '\n',
+    skip_lines: int = 1,
+    truncate_before_load: bool = False,
+    staging_dir: Optional[str] = None,
+    archive_dir: Optional[str] = None,
+    max_batch_bytes: int = 64 * 1024 * 1024,
+    window_seconds: Optional[float] = None,
+    maintain_aggregates: bool = False,
+    progress_interval: Optional[float] = None,
+    stall_timeout: Optional[float] = None,
+    trace_dir: Optional[str] = None,
+    cpu_profile: bool = False,
+    track_latency: bool = False,
+) -> bool:
+    """
+    Load all per-fund holdings files matching source_pattern as coalesced batches.
+
+    Loaded files are moved to archive_dir (default: ftpetl/archive next to the
+    incoming directory), so each file is loaded once.
+    """
+    source_files = expand_source_pattern(source_pattern)
+    if not source_files:
+        raise FileNotFoundError(f"No files match: {source_pattern}")
+    # History is not published from here: an exchange replaces the whole date
+    # partition, so a second batch for the same date would drop the first.
+    wf = ImportWebHoldWorkflow(maintain_aggregates=maintain_aggregates)
+    batches = wf.execute_coalesced(
+        file_paths=source_files,
+        db_host=db_host,
+        db_port=db_port,
+        db_user=db_user,
+        db_password=db_password,
+        db_name=db_name,
+        delimiter=delimiter,
+        quote_char=quote_char,
+        line_terminator=line_terminator,
+        skip_lines=skip_lines,
+        truncate_before_load=truncate_before_load,
+        staging_dir=staging_dir,
+        archive_dir=archive_dir,
+        max_batch_bytes=max_batch_bytes,
+        window_seconds=window_seconds,
+        progress_interval=progress_interval,
+        stall_timeout=stall_timeout,
+        trace_dir=trace_dir,
+        cpu_profile=cpu_profile,
+        track_latency=track_latency,
+    )
+    return len(batches) > 0
@@ -1,13 +1,36 @@
 import os
+import json
+import logging
+from collections import Counter
 from typing import Dict, List, Optional
 import pandas as pd
 import pdfplumber
+
+from src.utils.tracing import span, file_size, start_trace, stop_trace, tracing_enabled
+from src.utils.phrase_matcher import PhraseMatcher, Phrase
 # from prefect import flow, task
 # from prefect.logging import get_run_logger
 
 
 # to run stand alone, decorators and logging have been commented out
 
+logger = logging.getLogger(__name__)
+
+def run_logger(level: str) -> logging.Logger:
+    """
+    Logger for one extraction run at its own level.
+
+    Not registered with logging, so it is dropped after the run; its records
+    go to the handlers of the module logger and its ancestors, and the level
+    of the module logger is left alone for other runs.
+    """
+    run_log = logging.Logger(__name__, level.upper())
+    run_log.parent = logger
+    return run_log
+
+# Pages between cumulative progress lines at INFO
+PROGRESS_EVERY_PAGES = 25
+
 # Fund code lookup dictionary
 FUND_CODES = {
     "Pender Partners Fund": "1100",
@@ -24,9 +47,44 @@ FUND_CODES = {
     "Pender Alternative Special Situations Fund": "1500"
 }
 
+SCHEDULE_MARKER = "Schedule of Investment Portfolio"
+END_MARKER = "Total net assets attributable to holders of redeemable"
+TOTAL_MARKERS = ["total", "totals", "subtotal", "subtotals"]
+
+def build_marker_matcher() -> PhraseMatcher:
+    """Fund headings, section markers and total labels, found in one pass over a page or row."""
+    phrases = [Phrase(name, "fund", whole_line=True) for name in FUND_CODES]
+    phrases += [Phrase(SCHEDULE_MARKER, "schedule"), Phrase(END_MARKER, "end")]
+    phrases += [Phrase(marker, "total") for marker in TOTAL_MARKERS]
+    return PhraseMatcher(phrases, ignore_case=True)
+
+MARKERS = build_marker_matcher()
+
+def dump_tables(dump_dir: str, page_num: int, tables: List, log: logging.Logger = logger) -> None:
+    """Write the raw extract_tables() output of a page, for debugging the row mapping."""
+    os.makedirs(dump_dir, exist_ok=True)
+    path = os.path.join(dump_dir, f"page-{page_num:04d}-tables.json")
+    with open(path, "w") as f:
+        json.dump(tables, f, indent=1)
+    log.debug("Dumped %d raw tables of page %d to %s", len(tables), page_num, path)
+
+def format_counts(counts: Counter) -> str:
+    return ", ".join(f"{key} {value}" for key, value in sorted(counts.items()))
+
 # @task
-def extract_text_from_pdf(pdf_path: str) -> List[Dict]:
-    """Extract text and tables from PDF file."""
+def extract_text_from_pdf(pdf_path: str, dump_dir: Optional[str] = None, log: logging.Logger = logger) -> List[Dict]:
+    """
+    Extract text and tables from PDF file.
+    
+    Fund headings and section markers are found with one scan of each page's
+    text (see MARKERS), tolerating extra whitespace and headings wrapped over
+    lines.
+    
+    Per-line and per-row events are counted per page instead of printed: each
+    page's counts are logged at DEBUG, cumulative counts at INFO every
+    PROGRESS_EVERY_PAGES pages and at the end. With dump_dir, the raw tables
+    of every schedule page are written there as JSON.
+    """
     # logger = get_run_logger()
     # logger.info(f"Processing PDF file: {pdf_path}")
     
@@ -34,88 +92,95 @@ def extract_text_from_pdf(pdf_path: str) -> List[Dict]:
     current_fund = None
     current_date = None
     in_holdings_section = False
+    totals = Counter()
+    debug = log.isEnabledFor(logging.DEBUG)
     
-    print(f"Opening PDF file: {pdf_path}")
+    log.info("Opening PDF file: %s", pdf_path)
     
-    with pdfplumber.open(pdf_path) as pdf:
-        print(f"PDF has {len(pdf.pages)} pages")
+    with span("extract_text_from_pdf", file=pdf_path, bytes=file_size(pdf_path)) as pdf_span, \
+            pdfplumber.open(pdf_path) as pdf:
+        page_count = len(pdf.pages)
+        log.info("PDF has %d pages", page_count)
+        pdf_span.set(pages=page_count)
         
         for page_num, page in enumerate(pdf.pages, 1):
-            print(f"\nProcessing page {page_num}")
-            text = page.extract_text()
-            if not text:
-                print(f"No text found on page {page_num}")
-                continue
+            counts = Counter(pages=1)
+            with span("page", page=page_num) as page_span:
+                with span("extract_text", page=page_num):
+                    text = page.extract_text()
+                if not text:
+                    counts["empty_pages"] += 1
+                    totals.update(counts)
+                    continue
                 
-            lines = text.split('\n')
-            print(f"Found {len(lines)} lines of text")
+                lines = text.split('\n')
+                counts["lines"] += len(lines)
+                page_span.set(lines=len(lines))
             
-            for i, line in enumerate(lines):
-                # Look for fund name
-                if line in FUND_CODES:
-                    current_fund = line
-                    in_holdings_section = False
-                    print(f"Found fund: {current_fund}")
-                    continue
+                with span("scan_markers", page=page_num):
+                    markers = MARKERS.scan(text)
+                for match in markers:
+                    # Fund heading
+                    if match.kind == "fund":
+                        if match.phrase != current_fund:
+                            log.info("Found fund %s on page %d", match.phrase, page_num)
+                        current_fund = match.phrase
+                        in_holdings_section = False
                     
-                # Look for "Schedule of Investment Portfolio"
-                if "Schedule of Investment Portfolio" in line:
-                    in_holdings_section = True
-                    print(f"Found holdings section on page {page_num}")
-                    # Get date from next line
-                    if i + 1 < len(lines):
-                        current_date = lines[i + 1].strip()
-                        print(f"Found date: {current_date}")
-                    # Print raw tables for this page and exit for debug
-                    tables = page.extract_tables()
-                    print(f"\nDEBUG: Raw tables from extract_tables() on page {page_num}:")
-                    for t in tables:
-                        print(t)
-                    print("\nExiting after debug print.")
-                    exit(0)
-                    # continue
+                    # "Schedule of Investment Portfolio"
+                    elif match.kind == "schedule":
+                        in_holdings_section = True
+                        counts["schedule_pages"] = 1
+                        # Get date from next line
+                        if match.end_line + 1 < len(lines):
+                            current_date = lines[match.end_line + 1].strip()
                 
-                # Extract table data
+                # Extract table data, once per page
                 if in_holdings_section and current_fund and current_date:
-                    tables = page.extract_tables()
-                    print(f"Found {len(tables)} tables on page {page_num}")
-                    
+                    with span("extract_tables", page=page_num) as tables_span:
+                        tables = page.extract_tables()
+                        tables_span.set(tables=len(tables))
+                    counts["tables"] += len(tables)
+                    if dump_dir:
+                        dump_tables(dump_dir, page_num, tables, log)
+                
                     for table_num, table in enumerate(tables, 1):
                         if not table or len(table) < 2:
-                            print(f"Skipping empty table or table without headers (table {table_num})")
+                            counts["tables_skipped"] += 1
                             continue
-                            
-                        print(f"Processing table {table_num} with {len(table)} rows")
-                        
+                    
                         # Process table rows
                         for row_num, row in enumerate(table[1:], 1):  # Skip header row
                             if not row or len(row) < 4:
-                                print(f"Skipping invalid row {row_num}: {row}")
+                                counts["rows_invalid"] += 1
+                                if debug:
+                                    log.debug("Page %d table %d: skipping invalid row %d: %s",
+                                                 page_num, table_num, row_num, row)
                                 continue
-                                
+                            
                             # Skip total rows
-                            if "Total net assets attributable to holders of redeemable" in str(row):
+                            if MARKERS.find(" ".join(str(cell) for cell in row if cell), "end"):
                                 in_holdings_section = False
-                                print("Found end of holdings section")
+                                log.debug("Found end of holdings section on page %d", page_num)
                                 continue
-                                
+                            
                             # Skip rows that are totals or subtotals
-                            if any(x in str(row[0]).lower() for x in ['total', 'subtotal']):
-                                print(f"Skipping total/subtotal row: {row[0]}")
+                            if MARKERS.find(str(row[0] or ""), "total"):
+                                counts["rows_total"] += 1
                                 continue
-                                
+                            
                             # Extract data
                             description = row[0] if row[0] else ""
                             currency = row[1] if row[1] else ""
                             units = row[2] if row[2] else ""
                             cost = row[3] if row[3] else ""
                             mv = row[4] if len(row) > 4 else ""
-                            
+                        
                             # Skip if this is a total row
                             if description.strip() == "Total":
-                                print(f"Skipping total row: {description}")
+                                counts["rows_total"] += 1
                                 continue
-                            
+                        
                             # Extract issuer and issue from description
                             issuer = ""
                             issue = ""
@@ -124,7 +189,7 @@ def extract_text_from_pdf(pdf_path: str) -> List[Dict]:
                                 if parts:
                                     issuer = parts[0]
                                     issue = parts[-1] if len(parts) > 1 else ""
-                            
+                        
                             holding = {
                                 "date": current_date,
                                 "fund_name": current_fund,
@@ -137,42 +202,74 @@ def extract_text_from_pdf(pdf_path: str) -> List[Dict]:
                                 "mv": mv
                             }
                             holdings_data.append(holding)
-                            print(f"Added holding: {holding}")
+                            counts["holdings"] += 1
+                page_span.set(**counts)
+            
+            totals.update(counts)
+            if debug:
+                log.debug("Page %d: %s", page_num, format_counts(counts))
+            if page_num % PROGRESS_EVERY_PAGES == 0 and page_num < page_count:
+                log.info("Processed %d/%d pages: %d holdings so far", page_num, page_count, totals["holdings"])
+        pdf_span.set(holdings=len(holdings_data))
     
-    print(f"\nTotal holdings extracted: {len(holdings_data)}")
+    log.info("Total holdings extracted: %d (%s)", len(holdings_data), format_counts(totals))
     return holdings_data
 
 # @task
-def save_to_csv(data: List[Dict], output_path: str):
+def save_to_csv(data: List[Dict], output_path: str, log: logging.Logger = logger):
     """Save extracted data to CSV file."""
     # logger = get_run_logger()
     # logger.info(f"Saving data to CSV: {output_path}")
     
-    print(f"\nSaving {len(data)} records to {output_path}")
-    df = pd.DataFrame(data)
-    df.to_csv(output_path, index=False)
+    log.info("Saving %d records to %s", len(data), output_path)
+    with span("save_to_csv", file=output_path, rows=len(data)) as csv_span:
+        df = pd.DataFrame(data)
+        df.to_csv(output_path, index=False)
+        csv_span.set(bytes=file_size(output_path))
     # logger.info(f"Successfully saved {len(data)} records to {output_path}")
-    print("Save complete")
+    log.info("Save complete")
 
 # @flow(name="PDF Holdings Extraction", persist_result=False)
 def extract_holdings_workflow(
     input_pdf: str = "tests/data/01-Pender-Mutual-Funds-FS-ENG-2024.12.31-conformed.pdf",
-    output_csv: str = "tests/data/holdweb-20241231.csv"
+    output_csv: str = "tests/data/holdweb-20241231.csv",
+    trace_dir: Optional[str] = None,
+    cpu_profile: bool = False,
+    log_level: str = "INFO",
+    dump_dir: Optional[str] = None
 ):
-    """Extract holdings data from PDF and save to CSV."""
-    # logger = get_run_logger()
-    # logger.info("Starting PDF holdings extraction workflow")
+    """
+    Extract holdings data from PDF and save to CSV.
     
-    print(f"Starting extraction from {input_pdf}")
+    With trace_dir, a span trace of the run (and with cpu_profile a sampling
+    CPU profile) is written there, see src/utils/tracing.py.
     
-    # Extract data from PDF
-    holdings_data = extract_text_from_pdf(input_pdf)
+    log_level DEBUG adds per-page counts and skipped rows to the log of this
+    run only; dump_dir receives the raw tables of every schedule page.
+    """
+    # logger = get_run_logger()
+    # logger.info("Starting PDF holdings extraction workflow")
     
-    # Save to CSV
-    save_to_csv(holdings_data, output_csv)
+    log = run_logger(log_level)
+    log.info("Starting extraction from %s", input_pdf)
+    # Leave a trace started by a caller to the caller
+    owns_trace = bool(trace_dir) and not tracing_enabled()
+    if owns_trace:
+        start_trace("PDF Holdings Extraction", trace_dir, cpu_profile=cpu_profile)
+    try:
+        # Extract data from PDF
+        holdings_data = extract_text_from_pdf(input_pdf, dump_dir=dump_dir, log=log)
+        
+        # Save to CSV
+        save_to_csv(holdings_data, output_csv, log=log)
+    finally:
+        if owns_trace:
+            for kind, path in stop_trace().items():
+                log.info("Wrote %s to %s", kind.replace('_', ' '), path)
     
     # logger.info("PDF holdings extraction workflow completed")
     return len(holdings_data)
 
 if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(message)s")
     extract_holdings_workflow() 
\ No newline at end of file
@@ -0,0 +1,168 @@
+"""
+Benchmark loading the same data from CSV and from Parquet.
+
+Generates a fund-class-fees style file per size, writes it both as CSV and
+as Parquet (one row group per --row-group-size rows) and times
+load_data_to_staging for each into a scratch copy of borarch.FundClassFee.
+The CSV goes through LOAD DATA INFILE on the server, the Parquet file is
+streamed through LOAD DATA LOCAL INFILE from this process (see
+src/utils/columnar_input.py). Peak RSS of this process is reported so the
+bounded memory of the Parquet path can be checked.
+
+usage (from the repo root, with the shared volume mounted locally):
+    PYTHONPATH=. python tests/bench-columnar-load.py \
+        --data-dir /var/lib/mysql-files/ftpetl/incoming \
+        --sizes 10000 100000 1000000
+
+--server-dir is the data directory as seen by the MySQL server (defaults to
+--data-dir); the server needs local_infile=ON for the Parquet loads.
+
+With --backend sqlite both files are loaded into the embedded SQLite backend:
+    PYTHONPATH=. python tests/bench-columnar-load.py --backend sqlite --data-dir /tmp/bench
+"""
+import argparse
+import os
+import random
+import resource
+import time
+
+import mysql.connector
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+
+from src.utils.base_ingestion import load_data_to_staging
+from src.utils.db_backend import SQLiteBackend, SQLITE_DDL
+
+BENCH_TABLE = "borarch.bench_FundClassFee"
+
+# Parquet columns are matched by name, so the file columns carry the source field names
+FIELD_MAPPINGS = {
+    "FundCode": "FundCode",
+    "FundName": "FundName",
+    "Class": "Class",
+    "Description": "Description",
+    "Mer": "Mer",
+    "Trailer": "Trailer",
+    "PerformanceFee": "PerformanceFee",
+    "MinInvestmentInitial": "MinInvestmentInitial",
+    "MinInvestmentSubsequent": "MinInvestmentSubsequent",
+    "Currency": "Currency"
+}
+
+FIELD_TRANSFORMATIONS = {
+    "Trailer": "NULLIF(@Trailer, '')",
+    "PerformanceFee": "NULLIF(@PerformanceFee, '')",
+    "MinInvestmentInitial": "NULLIF(@MinInvestmentInitial, '')",
+    "MinInvestmentSubsequent": "NULLIF(@MinInvestmentSubsequent, '')"
+}
+
+
+def generate_files(data_dir: str, rows: int, row_group_size: int) -> tuple:
+    """Write the same rows as CSV and Parquet; returns both paths."""
+    classes = ["A", "F", "F2", "I", "O"]
+    csv_path = os.path.join(data_dir, f"bench-{rows}.csv")
+    parquet_path = os.path.join(data_dir, f"bench-{rows}.parquet")
+    with open(csv_path, "w") as f:
+        f.write(",".join(FIELD_MAPPINGS) + "\n")
+        for i in range(rows):
+            fund = i // len(classes)
+            f.write(
+                f"B{fund:08x},Bench Fund {fund},{classes[i % len(classes)]},Front End,"
+                f"{random.uniform(0.5, 2.5):.2f},1.00,,25000,10000,CAD\n"
+            )
+    table = pv.read_csv(csv_path)
+    pq.write_table(table, parquet_path, row_group_size=row_group_size)
+    return csv_path, parquet_path
+
+
+def reset_table(backend: SQLiteBackend, cursor) -> None:
+    """Recreate the scratch table (MySQL when backend is None)."""
+    if backend is None:
+        cursor.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+        cursor.execute(f"CREATE TABLE {BENCH_TABLE} LIKE borarch.FundClassFee")
+        return
+    conn = backend.connect()
+    conn.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+    conn.execute(SQLITE_DDL[0].replace("borarch.FundClassFee", BENCH_TABLE))
+    conn.commit()
+    conn.close()
+
+
+def run_load(db_config: dict, file_path: str) -> float:
+    """Load one file and return the elapsed seconds."""
+    start = time.perf_counter()
+    ok = load_data_to_staging.fn(
+        file_path=file_path,
+        db_config=db_config,
+        target_table=BENCH_TABLE,
+        field_mappings=FIELD_MAPPINGS,
+        field_transformations=FIELD_TRANSFORMATIONS
+    )
+    if not ok:
+        raise RuntimeError(f"Load of {file_path} failed")
+    return time.perf_counter() - start
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", required=True)
+    parser.add_argument("--server-dir")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--row-group-size", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--backend", choices=["mysql", "sqlite"], default="mysql")
+    args = parser.parse_args()
+    os.makedirs(args.data_dir, exist_ok=True)
+    server_dir = args.server_dir or args.data_dir
+
+    if args.backend == "sqlite":
+        backend = SQLiteBackend()
+        db_config = {"backend": backend}
+        conn = cursor = None
+    else:
+        backend = None
+        db_config = {
+            "host": os.getenv("DB_HOST", "localhost"),
+            "port": int(os.getenv("DB_PORT", "4420")),
+            "user": os.getenv("DB_USER"),
+            "password": os.getenv("DB_PASSWORD"),
+            "database": os.getenv("DB_NAME", "borarch")
+        }
+        conn = mysql.connector.connect(**db_config)
+        cursor = conn.cursor()
+
+    print(f"{'rows':>12} {'csv (s)':>10} {'parquet (s)':>12} {'speedup':>8} {'csv MB':>8} {'pq MB':>8} {'peak RSS MB':>12}")
+    for size in args.sizes:
+        csv_path, parquet_path = generate_files(args.data_dir, size, args.row_group_size)
+        timings = {}
+        for label, path in (("csv", f"{server_dir}/{os.path.basename(csv_path)}"), ("parquet", parquet_path)):
+            runs = []
+            for _ in range(args.repeat):
+                reset_table(backend, cursor)
+                if conn:
+                    conn.commit()
+                runs.append(run_load(db_config, path))
+            timings[label] = min(runs)
+        print(
+            f"{size:>12} {timings['csv']:>10.3f} {timings['parquet']:>12.3f} "
+            f"{timings['csv'] / timings['parquet']:>8.2f} "
+            f"{os.path.getsize(csv_path) / 1e6:>8.1f} {os.path.getsize(parquet_path) / 1e6:>8.1f} "
+            f"{peak_rss_mb():>12.0f}"
+        )
+        os.remove(csv_path)
+        os.remove(parquet_path)
+
+    if backend is None:
+        cursor.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+        cursor.close()
+        conn.close()
+    else:
+        backend.close()
+
+
+if __name__ == "__main__":
+    main()
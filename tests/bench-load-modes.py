@@ -0,0 +1,187 @@
+"""
+Benchmark ingestion load modes against a live bor-db.
+
+Compares the default LOAD DATA INFILE path with the deferred index mode on a
+scratch copy of borarch.FundClassFee for increasing row counts and reports
+the crossover row count where the deferred mode starts to win.
+
+usage (from the repo root, with the shared volume mounted locally):
+    PYTHONPATH=. python tests/bench-load-modes.py \
+        --data-dir /var/lib/mysql-files/ftpetl/incoming \
+        --sizes 1000 10000 100000 1000000 --existing-rows 0
+
+--data-dir is where the generated files are written; --server-dir is the
+same directory as seen by the MySQL server (defaults to --data-dir).
+
+With --backend sqlite the files are loaded in-process into the embedded
+SQLite backend (see src/utils/db_backend.py), without a bor-db. Deferred
+indexes are MySQL-only, so only the default mode is timed and rows/s is
+reported instead:
+    PYTHONPATH=. python tests/bench-load-modes.py --backend sqlite \
+        --data-dir /tmp/bench --sizes 1000 10000 100000
+"""
+import argparse
+import os
+import random
+import time
+
+import mysql.connector
+
+from src.utils.base_ingestion import load_data_to_staging, build_load_query
+from src.utils.db_backend import SQLiteBackend, SQLITE_DDL
+
+BENCH_TABLE = "borarch.bench_FundClassFee"
+
+FIELD_MAPPINGS = {
+    "FundCode": "FundCode",
+    "FundName": "FundName",
+    "Class": "Class",
+    "Description": "Description",
+    "Mer": "Mer",
+    "Trailer": "Trailer",
+    "PerformanceFee": "PerformanceFee",
+    "MinInvestmentInitial": "MinInvestmentInitial",
+    "MinInvestmentSubsequent": "MinInvestmentSubsequent",
+    "Currency": "Currency"
+}
+
+FIELD_TRANSFORMATIONS = {
+    "Trailer": "NULLIF(@Trailer, '')",
+    "PerformanceFee": "NULLIF(@PerformanceFee, '')",
+    "MinInvestmentInitial": "NULLIF(@MinInvestmentInitial, '')",
+    "MinInvestmentSubsequent": "NULLIF(@MinInvestmentSubsequent, '')"
+}
+
+
+def generate_file(path: str, rows: int, offset: int = 0) -> None:
+    """Write a fund-class-fees style file with unique (FundCode, Class) keys."""
+    classes = ["A", "F", "F2", "I", "O"]
+    with open(path, "w") as f:
+        f.write("fund_code,fund_name,class,description,mer,trailer,performance_fee,"
+                "min_investment_initial,min_investment_subsequent,currency\n")
+        for i in range(offset, offset + rows):
+            fund = i // len(classes)
+            f.write(
+                f"B{fund:08x},Bench Fund {fund},{classes[i % len(classes)]},Front End,"
+                f"{random.uniform(0.5, 2.5):.2f},1.00,,25000,10000,CAD\n"
+            )
+
+
+def reset_table(cursor, existing_rows: int, data_dir: str, server_dir: str) -> None:
+    """Recreate the scratch table and optionally pre-populate it the way the workflow loads."""
+    cursor.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+    cursor.execute(f"CREATE TABLE {BENCH_TABLE} LIKE borarch.FundClassFee")
+    if existing_rows:
+        name = "bench-existing.csv"
+        generate_file(os.path.join(data_dir, name), existing_rows, offset=10_000_000)
+        cursor.execute(build_load_query(
+            file_path=f"{server_dir}/{name}",
+            target_table=BENCH_TABLE,
+            field_mappings=FIELD_MAPPINGS,
+            field_transformations=FIELD_TRANSFORMATIONS
+        ))
+        os.remove(os.path.join(data_dir, name))
+
+
+def reset_sqlite_table(backend: SQLiteBackend) -> None:
+    """Recreate the scratch table in the embedded backend."""
+    conn = backend.connect()
+    conn.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+    conn.execute(SQLITE_DDL[0].replace("borarch.FundClassFee", BENCH_TABLE))
+    conn.commit()
+    conn.close()
+
+
+def bench_sqlite(args) -> None:
+    """Time default-mode loads into the embedded SQLite backend."""
+    backend = SQLiteBackend()
+    db_config = {"backend": backend}
+    print(f"{'rows':>12} {'load (s)':>12} {'rows/s':>12}")
+    for size in args.sizes:
+        path = os.path.join(args.data_dir, f"bench-{size}.csv")
+        generate_file(path, size)
+        runs = []
+        for _ in range(args.repeat):
+            reset_sqlite_table(backend)
+            runs.append(run_mode(db_config, path, False))
+        os.remove(path)
+        best = min(runs)
+        print(f"{size:>12} {best:>12.3f} {size / best:>12,.0f}")
+    backend.close()
+
+
+def run_mode(db_config: dict, file_path: str, deferred: bool) -> float:
+    """Load one file in the given mode and return the elapsed seconds."""
+    start = time.perf_counter()
+    ok = load_data_to_staging.fn(
+        file_path=file_path,
+        db_config=db_config,
+        target_table=BENCH_TABLE,
+        field_mappings=FIELD_MAPPINGS,
+        field_transformations=FIELD_TRANSFORMATIONS,
+        deferred_indexes=deferred
+    )
+    if not ok:
+        raise RuntimeError(f"Load failed (deferred={deferred})")
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", required=True)
+    parser.add_argument("--server-dir")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--existing-rows", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--backend", choices=["mysql", "sqlite"], default="mysql")
+    args = parser.parse_args()
+    if args.backend == "sqlite":
+        os.makedirs(args.data_dir, exist_ok=True)
+        bench_sqlite(args)
+        return
+    server_dir = args.server_dir or args.data_dir
+
+    db_config = {
+        "host": os.getenv("DB_HOST", "localhost"),
+        "port": int(os.getenv("DB_PORT", "4420")),
+        "user": os.getenv("DB_USER"),
+        "password": os.getenv("DB_PASSWORD"),
+        "database": os.getenv("DB_NAME", "borarch")
+    }
+    conn = mysql.connector.connect(**db_config)
+    cursor = conn.cursor()
+
+    results = []
+    for size in args.sizes:
+        name = f"bench-{size}.csv"
+        generate_file(os.path.join(args.data_dir, name), size)
+        timings = {}
+        for deferred in (False, True):
+            runs = []
+            for _ in range(args.repeat):
+                reset_table(cursor, args.existing_rows, args.data_dir, server_dir)
+                conn.commit()
+                runs.append(run_mode(db_config, f"{server_dir}/{name}", deferred))
+            timings[deferred] = min(runs)
+        results.append((size, timings[False], timings[True]))
+        os.remove(os.path.join(args.data_dir, name))
+
+    cursor.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+    cursor.close()
+    conn.close()
+
+    print(f"{'rows':>12} {'indexed (s)':>12} {'deferred (s)':>13} {'speedup':>8}")
+    crossover = None
+    for size, indexed, deferred in results:
+        print(f"{size:>12} {indexed:>12.3f} {deferred:>13.3f} {indexed / deferred:>8.2f}")
+        if crossover is None and deferred < indexed:
+            crossover = size
+    if crossover is None:
+        print("Deferred index mode did not win at any tested size")
+    else:
+        print(f"Crossover: deferred index mode wins from ~{crossover} rows "
+              f"(existing rows: {args.existing_rows})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import pytest
+
+from src.utils.file_profiler import (
+    check_load_parameters,
+    index_path,
+    load_row_index,
+    profile_file,
+    read_records,
+    remove_row_index
+)
+
+
+def write(tmp_path, data, name="input.csv"):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def errors(profile):
+    return check_load_parameters(profile, ",", '"', "\n", 1)["errors"]
+
+
+def test_quoted_line_break_is_one_record(tmp_path):
+    profile = profile_file(write(tmp_path, b'a,b,c\n1,"x\ny",3\n4,5,6\n'), build_index=False)
+    assert profile["lines"] == 4
+    assert profile["records"] == 3
+    assert profile["data_rows"] == 2
+    assert profile["quoted_terminators"] == 1
+    assert profile["open_quote_line"] is None
+    assert errors(profile) == []
+
+
+def test_escaped_quote_does_not_open_a_field(tmp_path):
+    profile = profile_file(write(tmp_path, b'a,b,c\n1,"x\\"y",3\n4,5,6\n'), build_index=False)
+    assert profile["records"] == 3
+    assert profile["open_quote_line"] is None
+    assert errors(profile) == []
+
+
+def test_unclosed_quote_is_reported_with_its_line(tmp_path):
+    profile = profile_file(write(tmp_path, b'a,b,c\n1,2,3\n4,"x,6\n7,8,9\n'), build_index=False)
+    assert profile["open_quote_line"] == 3
+    assert errors(profile) == ['" quoted field opened on line 3 is never closed']
+
+
+def test_row_index_holds_record_offsets_outside_the_input_directory(tmp_path):
+    index_dir = tmp_path / "index"
+    file_path = write(tmp_path, b'a,b,c\n1,"x\ny",3\n4,5,6\n')
+    profile = profile_file(file_path, stride=2, index_dir=str(index_dir))
+    assert profile["row_index"] == index_path(file_path, str(index_dir))
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["index", "input.csv"]
+
+    row_index = load_row_index(file_path, str(index_dir))
+    assert row_index["records"] == 3
+    assert read_records(file_path, row_index, 2, count=2) == ['1,"x\ny",3', "4,5,6"]
+    with pytest.raises(IndexError):
+        read_records(file_path, row_index, 4)
+
+    remove_row_index(file_path, str(index_dir))
+    assert list(index_dir.iterdir()) == []
+
+
+def test_default_index_is_not_written_next_to_the_input(tmp_path):
+    file_path = write(tmp_path, b"a,b\n1,2\n")
+    profile = profile_file(file_path)
+    try:
+        assert not profile["row_index"].startswith(str(tmp_path))
+        assert [p.name for p in tmp_path.iterdir()] == ["input.csv"]
+    finally:
+        remove_row_index(file_path)
@@ -0,0 +1,111 @@
+import csv
+from pathlib import Path
+
+import pytest
+
+from src.utils.base_ingestion import load_data_to_staging
+from src.utils.db_backend import SQLiteBackend
+from src.utils.holdings_aggregates import refresh_holdings_aggregates, file_slices
+
+HOLD_FILE = str(Path(__file__).parent / "data" / "holdweb-20241231.csv")
+
+# ImportWebHoldWorkflow.field_mappings
+FIELD_MAPPINGS = {
+    "date": "date",
+    "fund_name": "fund_name",
+    "sec_name": "sec_name",
+    "sector": "sector",
+    "currency": "currency",
+    "units": "units",
+    "cost": "cost",
+    "mv": "mv"
+}
+
+
+@pytest.fixture
+def db_config():
+    backend = SQLiteBackend()
+    yield {"backend": backend}
+    backend.close()
+
+
+def load_and_refresh(db_config, file_path):
+    """What ImportWebHoldWorkflow does with maintain_aggregates: truncate, load, refresh the file's slices."""
+    assert load_data_to_staging.fn(
+        file_path=file_path,
+        db_config=db_config,
+        target_table="borarch.holdweb",
+        field_mappings=FIELD_MAPPINGS,
+        truncate_before_load=True
+    )
+    assert refresh_holdings_aggregates.fn(
+        db_config=db_config,
+        slices=file_slices(file_path, FIELD_MAPPINGS)
+    )
+
+
+def fetch(db_config, query):
+    conn = db_config["backend"].connect()
+    try:
+        return conn.execute(query).fetchall()
+    finally:
+        conn.close()
+
+
+def aggregates(db_config):
+    return fetch(db_config, "SELECT * FROM borarch.holdweb_agg ORDER BY dimension, fund_name, date, dim_value")
+
+
+def test_file_slices():
+    slices = file_slices(HOLD_FILE, FIELD_MAPPINGS)
+    assert ("2024-12-31", "PFCM mini bond universe") in slices
+    assert {date for date, _ in slices} == {"2024-12-31"}
+
+
+def test_reload_leaves_aggregates_unchanged(db_config):
+    load_and_refresh(db_config, HOLD_FILE)
+    first = aggregates(db_config)
+    assert first
+
+    load_and_refresh(db_config, HOLD_FILE)
+
+    assert aggregates(db_config) == first
+
+
+def sector_aggregate(db_config, fund_name, sector):
+    return fetch(
+        db_config,
+        f"SELECT positions, units, mv FROM borarch.holdweb_agg "
+        f"WHERE dimension = 'sector' AND fund_name = '{fund_name}' AND dim_value = '{sector}'"
+    )[0]
+
+
+def test_identical_lots_are_both_counted(db_config, tmp_path):
+    lines = Path(HOLD_FILE).read_text().splitlines(keepends=True)
+    lot = next(csv.DictReader(lines))
+    lots = tmp_path / "holdweb-lots.csv"
+    lots.write_text("".join(lines[:2] + lines[1:]))
+
+    load_and_refresh(db_config, HOLD_FILE)
+    positions, units, mv = sector_aggregate(db_config, lot["fund_name"], lot["sector"])
+    load_and_refresh(db_config, str(lots))
+
+    assert sector_aggregate(db_config, lot["fund_name"], lot["sector"]) == (
+        positions + 1, units + int(lot["units"]), mv + int(lot["mv"])
+    )
+
+
+def test_refresh_only_touches_loaded_slices(db_config, tmp_path):
+    earlier = tmp_path / "holdweb-20241130.csv"
+    earlier.write_text(Path(HOLD_FILE).read_text().replace("2024-12-31", "2024-11-30"))
+    load_and_refresh(db_config, str(earlier))
+    conn = db_config["backend"].connect()
+    conn.execute("UPDATE borarch.holdweb_agg SET positions = -1")
+    conn.commit()
+    conn.close()
+
+    load_and_refresh(db_config, HOLD_FILE)
+
+    rows = fetch(db_config, "SELECT date, MIN(positions) FROM borarch.holdweb_agg GROUP BY date ORDER BY date")
+    assert rows[0] == ("2024-11-30", -1)
+    assert rows[1][0] == "2024-12-31" and rows[1][1] > 0
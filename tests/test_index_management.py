@@ -0,0 +1,74 @@
+import logging
+
+from src.utils.index_management import get_secondary_indexes, index_definition, parse_index_definitions
+
+CREATE_TABLE = """CREATE TABLE `holdweb` (
+  `id` int NOT NULL AUTO_INCREMENT,
+  `fund` varchar(100) NOT NULL,
+  `date` date NOT NULL,
+  `sec_name` varchar(255) DEFAULT NULL,
+  `parent_id` int DEFAULT NULL,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `uq_fund_date` (`fund`,`date` DESC) COMMENT 'one row per fund, latest first',
+  KEY `ix_sec``name` (`sec_name`(20)) /*!80000 INVISIBLE */,
+  KEY `ix_lower_sec` ((lower(`sec_name`))),
+  UNIQUE KEY `uq_lower_fund` ((lower(`fund`))),
+  KEY `fk_parent` (`parent_id`),
+  CONSTRAINT `fk_parent` FOREIGN KEY (`parent_id`) REFERENCES `holdweb` (`id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"""
+
+STATISTICS = [
+    ("fk_parent", 1, "parent_id", "BTREE"),
+    ("ix_lower_sec", 1, None, "BTREE"),
+    ("ix_sec`name", 1, "sec_name", "BTREE"),
+    ("uq_fund_date", 0, "fund", "BTREE"),
+    ("uq_fund_date", 0, "date", "BTREE"),
+    ("uq_lower_fund", 0, None, "BTREE"),
+    ("uq_missing", 0, "sec_name", "BTREE")
+]
+
+
+class FakeCursor:
+    """Answers the metadata queries of get_secondary_indexes in the order it runs them."""
+
+    def __init__(self):
+        self.results = [
+            [("borarch",)],
+            STATISTICS,
+            [("holdweb", CREATE_TABLE)],
+            [("borarch",)],
+            [("fk_parent", "parent_id", "borarch", "holdweb", "id")],
+            [("borarch",)],
+            [("borarch", "holdweb", "fk_parent", "id")]
+        ]
+
+    def execute(self, sql, params=None):
+        self.rows = self.results.pop(0)
+
+    def fetchone(self):
+        return self.rows[0]
+
+    def fetchall(self):
+        return self.rows
+
+
+def test_clauses_are_taken_verbatim():
+    assert parse_index_definitions(CREATE_TABLE) == {
+        "uq_fund_date": "UNIQUE KEY `uq_fund_date` (`fund`,`date` DESC) COMMENT 'one row per fund, latest first'",
+        "ix_sec`name": "KEY `ix_sec``name` (`sec_name`(20)) /*!80000 INVISIBLE */",
+        "ix_lower_sec": "KEY `ix_lower_sec` ((lower(`sec_name`)))",
+        "uq_lower_fund": "UNIQUE KEY `uq_lower_fund` ((lower(`fund`)))",
+        "fk_parent": "KEY `fk_parent` (`parent_id`)"
+    }
+
+
+def test_indexes_that_cannot_be_reproduced_are_kept(caplog):
+    with caplog.at_level(logging.WARNING, logger="src.utils.index_management"):
+        indexes = get_secondary_indexes(FakeCursor(), "holdweb")
+    assert [index["name"] for index in indexes] == ["ix_lower_sec", "ix_sec`name", "uq_fund_date"]
+    assert index_definition(indexes[0]) == "ADD KEY `ix_lower_sec` ((lower(`sec_name`)))"
+    assert indexes[2]["columns"] == ["fund", "date"]
+    assert sorted(record.getMessage() for record in caplog.records) == [
+        "Keeping index uq_lower_fund on holdweb: unique keys on an expression cannot be validated",
+        "Keeping index uq_missing on holdweb: its definition cannot be reproduced"
+    ]
@@ -0,0 +1,80 @@
+from pathlib import Path
+
+import pytest
+from prefect import flow, get_run_logger
+
+from src.utils.db_backend import SQLiteBackend
+from src.utils.ingestion_dag import ingestion_step, run_ingestion_dag
+from src.workflows.daily_ingestion import daily_ingestion_flow
+from src.workflows.import_web_classfees import ImportWebClassFeesWorkflow
+from src.workflows.import_web_hold import ImportWebHoldWorkflow
+
+DATA_DIR = Path(__file__).parent / "data"
+CLASSFEES_FILE = str(DATA_DIR / "fund-class-fees.csv")
+HOLD_FILE = str(DATA_DIR / "holdweb-20241231.csv")
+LOAD_OPTIONS = {"delimiter": ",", "quote_char": '"', "line_terminator": "\n", "skip_lines": 1}
+
+
+@pytest.fixture
+def db_host(tmp_path):
+    return f"sqlite:///{tmp_path}/bor.db"
+
+
+def count(db_host, table):
+    backend = SQLiteBackend.from_url(db_host)
+    conn = backend.connect()
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    finally:
+        conn.close()
+        backend.close()
+
+
+def data_rows(file_path):
+    with open(file_path) as f:
+        return sum(1 for line in f if line.strip()) - 1
+
+
+@flow
+def run_dag(db_host, classfees_file, hold_file):
+    classfees = ImportWebClassFeesWorkflow()
+    hold = ImportWebHoldWorkflow()
+    steps = [
+        ingestion_step("classfees", classfees, classfees_file, truncate_before_load=True, **LOAD_OPTIONS),
+        ingestion_step("hold", hold, hold_file, depends_on=["classfees"], truncate_before_load=True, **LOAD_OPTIONS)
+    ]
+    db_config = classfees.build_db_config(db_host, "0", "", "", "")
+    return run_ingestion_dag(steps, db_config, get_run_logger())
+
+
+def test_daily_ingestion_runs_to_the_end(db_host):
+    assert daily_ingestion_flow(
+        CLASSFEES_FILE, HOLD_FILE, db_host, "0", "", "", "",
+        procedure_dependencies={"hold": ["classfees"]},
+        reconcile=True
+    )
+
+    assert count(db_host, "borarch.FundClassFee") == data_rows(CLASSFEES_FILE)
+    assert count(db_host, "borarch.holdweb") == data_rows(HOLD_FILE)
+
+
+def test_procedures_wait_for_their_dependencies(db_host):
+    report = run_dag(db_host, CLASSFEES_FILE, HOLD_FILE)
+
+    assert report["failed"] == [] and report["skipped"] == []
+    timings = {t["node"]: t for t in report["timings"]}
+    assert set(timings) == {
+        "load:classfees", "after_load:classfees", "procedure:classfees",
+        "load:hold", "after_load:hold", "procedure:hold"
+    }
+    assert timings["procedure:hold"]["start"] >= timings["procedure:classfees"]["end"]
+    assert report["critical_path"][-1] == "procedure:hold"
+
+
+def test_failed_load_skips_its_dependents(db_host, tmp_path):
+    report = run_dag(db_host, str(tmp_path / "missing.csv"), HOLD_FILE)
+
+    assert report["failed"] == ["load:classfees"]
+    assert sorted(report["skipped"]) == ["after_load:classfees", "procedure:classfees", "procedure:hold"]
+    # The independent load still ran
+    assert count(db_host, "borarch.holdweb") == data_rows(HOLD_FILE)
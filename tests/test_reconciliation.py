@@ -0,0 +1,58 @@
+from pathlib import Path
+
+from prefect import flow
+
+from src.utils import file_profiler
+from src.utils.file_profiler import profile_file
+from src.utils.reconciliation import FileControlTotals
+from src.workflows.import_web_hold import ImportWebHoldWorkflow
+
+HOLD_FILE = Path(__file__).parent / "data" / "holdweb-20241231.csv"
+FUND = "PFCM mini bond universe"
+
+
+# The workflow logs through the run logger, so it is built inside a flow
+
+
+@flow
+def scan_and_check(file_path):
+    workflow = ImportWebHoldWorkflow()
+    totals = FileControlTotals(
+        str(file_path), workflow.field_mappings, workflow.control_totals,
+        field_transformations=workflow.field_transformations
+    )
+    profile = profile_file(str(file_path), build_index=False, on_records=totals.feed)
+    checked = None
+    if totals.unreadable:
+        db_config = workflow.build_db_config("sqlite:///:memory:", "0", "", "", "")
+        checked = workflow.check_control_totals(db_config, totals)
+    return profile, totals, checked
+
+
+def test_latin1_file_is_decoded_with_the_detected_encoding(tmp_path):
+    text = HOLD_FILE.read_text().replace(FUND, "Fonds Société")
+    path = tmp_path / "holdweb-latin1.csv"
+    path.write_bytes(text.encode("latin-1"))
+
+    profile, totals, _ = scan_and_check(path)
+
+    assert profile["encoding"] == "latin-1"
+    assert totals.unreadable is None
+    groups = totals.result()["groups"]
+    assert "Fonds Société" in groups and FUND not in groups
+    assert totals.result()["rows"] == profile["data_rows"]
+
+
+def test_undecodable_records_make_the_file_not_reconcilable(tmp_path, monkeypatch):
+    # The head is ASCII, a latin-1 name comes after the sample the encoding is detected from
+    lines = HOLD_FILE.read_text().splitlines(keepends=True)
+    path = tmp_path / "holdweb-mixed.csv"
+    path.write_bytes("".join(lines[:-1]).encode() + lines[-1].replace("Fairfax", "Société").encode("latin-1"))
+    monkeypatch.setattr(file_profiler, "SAMPLE_BYTES", 512)
+
+    profile, totals, checked = scan_and_check(path)
+
+    assert profile["encoding"] == "ascii"
+    assert "is not ascii" in totals.unreadable
+    # Warned about, not raised
+    assert checked is None
@@ -0,0 +1,209 @@
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+from prefect import flow
+
+from src.utils.db_backend import SQLiteBackend
+from src.utils.latency import file_arrival_time, format_timestamp
+from src.utils.reconciliation import ReconciliationError
+from src.workflows.import_web_classfees import ImportWebClassFeesWorkflow
+from src.workflows.import_web_hold import ImportWebHoldWorkflow, import_web_hold_flow
+
+DATA_DIR = Path(__file__).parent / "data"
+CLASSFEES_FILE = str(DATA_DIR / "fund-class-fees.csv")
+HOLD_FILE = str(DATA_DIR / "holdweb-20241231.csv")
+TEXT_FILE = DATA_DIR / "holdweb-copypaste-20241231.txt"
+
+
+@pytest.fixture
+def db_host(tmp_path):
+    return f"sqlite:///{tmp_path}/bor.db"
+
+
+def fetch(db_host, query):
+    backend = SQLiteBackend.from_url(db_host)
+    conn = backend.connect()
+    try:
+        return conn.execute(query).fetchall()
+    finally:
+        conn.close()
+        backend.close()
+
+
+def data_rows(file_path):
+    with open(file_path) as f:
+        return sum(1 for line in f if line.strip()) - 1
+
+
+# The workflows log through the run logger, so they are built and run inside a flow
+
+
+@flow
+def run_execute(workflow_class, file_path, db_host, **kwargs):
+    workflow = workflow_class()
+    return workflow.execute.fn(workflow, file_path, db_host, "0", "", "", "", **kwargs)
+
+
+@flow
+def run_execute_coalesced(file_paths, db_host, **kwargs):
+    workflow = ImportWebHoldWorkflow()
+    return workflow.execute_coalesced.fn(workflow, file_paths, db_host, "0", "", "", "", **kwargs)
+
+
+@flow
+def run_check_control_totals(db_host, file_path):
+    workflow = ImportWebHoldWorkflow()
+    db_config = workflow.build_db_config(db_host, "0", "", "", "")
+    load_options = {"delimiter": ",", "quote_char": '"', "line_terminator": "\n", "skip_lines": 1}
+    file_totals = workflow.scan_control_totals(file_path, load_options, True)
+    return workflow.check_control_totals(db_config, file_totals)
+
+
+@flow
+def run_publish_history(db_host, file_path):
+    workflow = ImportWebHoldWorkflow(publish_history=True)
+    return workflow.execute.fn(workflow, file_path, db_host, "0", "", "", "", truncate_before_load=True)
+
+
+@flow
+def run_maintain_aggregates(db_host, file_path, truncate_before_load):
+    workflow = ImportWebHoldWorkflow(maintain_aggregates=True)
+    return workflow.execute.fn(
+        workflow, file_path, db_host, "0", "", "", "", truncate_before_load=truncate_before_load
+    )
+
+
+def test_execute_applies_field_transformations(db_host, tmp_path):
+    assert run_execute(
+        ImportWebClassFeesWorkflow, CLASSFEES_FILE, db_host, result_output_dir=str(tmp_path / "out")
+    )
+
+    assert fetch(db_host, "SELECT COUNT(*) FROM borarch.FundClassFee")[0][0] == data_rows(CLASSFEES_FILE)
+    # NULLIF(@Trailer, '') turned empty fields into NULL
+    assert fetch(db_host, "SELECT COUNT(*) FROM borarch.FundClassFee WHERE Trailer = ''")[0][0] == 0
+    # The procedure stand-in streamed its result set to a file
+    assert list((tmp_path / "out").iterdir())
+
+
+def test_flow_runs_with_the_default_options(db_host):
+    # Through Prefect's parameter validation, unlike execute.fn
+    assert import_web_hold_flow(HOLD_FILE, db_host, "0", "", "", "", truncate_before_load=True)
+
+    assert fetch(db_host, "SELECT COUNT(*) FROM borarch.holdweb")[0][0] == data_rows(HOLD_FILE)
+
+
+def test_execute_truncates_before_load(db_host):
+    for _ in range(2):
+        assert run_execute(ImportWebHoldWorkflow, HOLD_FILE, db_host, truncate_before_load=True)
+
+    assert fetch(db_host, "SELECT COUNT(*) FROM borarch.holdweb")[0][0] == data_rows(HOLD_FILE)
+
+
+def test_execute_reconciles(db_host):
+    assert run_execute(ImportWebHoldWorkflow, HOLD_FILE, db_host, truncate_before_load=True, reconcile=True)
+
+
+def test_execute_reconciles_from_the_profile_scan(db_host, tmp_path):
+    # Fund names that differ only by case are separate groups on both sides
+    lines = Path(HOLD_FILE).read_text().splitlines(keepends=True)
+    variant = tmp_path / "holdweb-case.csv"
+    variant.write_text("".join(lines + [lines[1].replace("PFCM mini bond universe", "PFCM Mini Bond Universe")]))
+
+    assert run_execute(
+        ImportWebHoldWorkflow, str(variant), db_host, truncate_before_load=True, profile_input=True, reconcile=True
+    )
+
+
+def test_reconcile_reports_differences(db_host):
+    assert run_execute(ImportWebHoldWorkflow, HOLD_FILE, db_host, truncate_before_load=True)
+    backend = SQLiteBackend.from_url(db_host)
+    conn = backend.connect()
+    conn.execute("UPDATE borarch.holdweb SET mv = mv + 1 WHERE rowid = 3")
+    conn.execute("DELETE FROM borarch.holdweb WHERE rowid = 80")
+    conn.commit()
+    conn.close()
+    backend.close()
+
+    with pytest.raises(ReconciliationError):
+        run_check_control_totals(db_host, HOLD_FILE)
+
+
+def test_execute_coalesced_archives_sources(db_host, tmp_path):
+    incoming = tmp_path / "incoming"
+    incoming.mkdir()
+    lines = Path(HOLD_FILE).read_text().splitlines(keepends=True)
+    header, rows = lines[0], lines[1:]
+    sources = []
+    for i in range(3):
+        source = incoming / f"holdweb-{i}.csv"
+        source.write_text(header + "".join(rows[i::3]))
+        sources.append(str(source))
+
+    batches = run_execute_coalesced(sources, db_host, truncate_before_load=True, max_batch_bytes=4096)
+
+    assert len(batches) > 1
+    assert sum(item["rows"] for batch in batches for item in batch["lineage"]) == len(rows)
+    assert fetch(db_host, "SELECT COUNT(*) FROM borarch.holdweb")[0][0] == len(rows)
+    # Sources moved out of incoming, coalesced files staged next to it and removed
+    assert not list(incoming.iterdir())
+    assert sorted(p.name for p in (tmp_path / "archive").iterdir()) == [Path(s).name for s in sources]
+    assert not list((tmp_path / "staging").iterdir())
+
+
+def test_publish_history_is_refused_before_loading(db_host):
+    with pytest.raises(ValueError, match="publish_history"):
+        run_publish_history(db_host, HOLD_FILE)
+
+    assert fetch(db_host, "SELECT COUNT(*) FROM borarch.holdweb")[0][0] == 0
+
+
+def test_aggregates_require_truncate(db_host):
+    with pytest.raises(ValueError, match="maintain_aggregates"):
+        run_maintain_aggregates(db_host, HOLD_FILE, False)
+    assert fetch(db_host, "SELECT COUNT(*) FROM borarch.holdweb")[0][0] == 0
+
+    assert run_maintain_aggregates(db_host, HOLD_FILE, True)
+    assert fetch(db_host, "SELECT SUM(positions) FROM borarch.holdweb_agg WHERE dimension = 'sector'")[0][0] == (
+        data_rows(HOLD_FILE)
+    )
+
+
+def test_rerun_of_unchanged_file_is_not_recorded_again(db_host):
+    for _ in range(2):
+        assert run_execute(ImportWebHoldWorkflow, HOLD_FILE, db_host, truncate_before_load=True, track_latency=True)
+
+    assert fetch(db_host, "SELECT COUNT(*) FROM bormeta.ingest_latency WHERE success = 1")[0][0] == 1
+
+
+def test_statement_text_latency_counts_from_the_text_arrival(db_host, tmp_path):
+    incoming = tmp_path / "incoming"
+    incoming.mkdir()
+    source = incoming / TEXT_FILE.name
+    shutil.copy(TEXT_FILE, source)
+    arrived = file_arrival_time(str(source))
+    # The converted CSV is written later
+    time.sleep(0.05)
+
+    for _ in range(2):
+        assert import_web_hold_flow(
+            str(source), db_host, "0", "", "", "",
+            truncate_before_load=True, statement_text=True, track_latency=True
+        )
+
+    # Recorded once, against the arrival of the text rather than of the converted file
+    assert fetch(db_host, "SELECT arrived_at FROM bormeta.ingest_latency WHERE success = 1") == [
+        (format_timestamp(arrived),)
+    ]
+
+
+def test_workflows_import_without_the_mysql_driver():
+    # Runs on the SQLite backend must not need mysql-connector-python
+    code = (
+        "import sys; sys.modules['mysql'] = None; sys.modules['mysql.connector'] = None; "
+        "import src.workflows.import_web_hold, src.workflows.import_web_classfees, src.workflows.daily_ingestion"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=Path(__file__).parent.parent)
@@ -0,0 +1,160 @@
+import csv
+import shutil
+from pathlib import Path
+
+from prefect import flow
+
+from src.utils.statement_text import (
+    StatementTextParser,
+    parse_number,
+    parse_statement_date,
+    parse_statement_text,
+    split_forward,
+    split_holding
+)
+from src.workflows.import_web_hold import ImportWebHoldWorkflow
+
+TEXT_FILE = Path(__file__).parent / "data" / "holdweb-copypaste-20241231.txt"
+
+PAGE_HEADER = [
+    "Example Equity Fund",
+    "Schedule of Investment Portfolio",
+    "June 30, 2025",
+    "Issue",
+    "currency",
+    "Number of units /",
+    " Face value ($)",
+    "Cost",
+    "($)",
+    "Fair value",
+    "($)"
+]
+
+
+def parse(lines):
+    parser = StatementTextParser()
+    return list(parse_statement_text(lines, parser)), parser
+
+
+def test_parse_number():
+    assert parse_number("1,493,549") == "1493549"
+    assert parse_number("(1,004,212)") == "-1004212"
+    assert parse_number("12.50") == "12.50"
+
+
+def test_split_holding():
+    assert split_holding("Cameco Corporation, 2.95%, 2027/10/21 CAD 2,650,000 2,514,057 2,605,561") == (
+        "Cameco Corporation, 2.95%, 2027/10/21", "CAD", "2,650,000", "2,514,057", "2,605,561"
+    )
+    # Values of a wrapped name, on a line of their own
+    assert split_holding("CAD 2,000,000 1,899,600 1,982,807") == ("", "CAD", "2,000,000", "1,899,600", "1,982,807")
+    assert split_holding("Canadian National Railway Company, Callable, 3.20%,") is None
+
+
+def test_split_forward():
+    assert split_forward("settlement 2025/01/22 1.37 USD 15,227,525 CAD 20,868,700 (1,004,212)") == (
+        "settlement 2025/01/22", "1.37", "USD", "15,227,525", "CAD", "20,868,700", "(1,004,212)"
+    )
+    assert split_forward("Cameco Corporation CAD 2,650,000 2,514,057 2,605,561") is None
+
+
+def test_parse_statement_date():
+    assert parse_statement_date("December 31, 2024") == "2024-12-31"
+    assert parse_statement_date("Issue") is None
+
+
+def test_wrapped_names_sections_and_totals():
+    rows, parser = parse(PAGE_HEADER + [
+        "Equities:",
+        "Canada (60.0%):",
+        "Alpha Corp. CAD 100 1,000 1,200",
+        "Beta Holdings Limited, Callable, 3.20%,",
+        "2028/07/31",
+        "CAD 2,000 1,900 1,980",
+        "3,000 3,180",
+        "United States (40.0%):",
+        "Gamma Inc. USD 50 (500) 700",
+        "Total equities (100.0%) 3,500 3,880",
+        "Cash (1.0%) 40",
+        "Net assets (100%) 3,920"
+    ])
+    assert [(r["sec_name"], r["sector"], r["currency"], r["units"], r["cost"], r["mv"]) for r in rows] == [
+        ("Alpha Corp.", "Canada (60.0%)", "CAD", "100", "1000", "1200"),
+        ("Beta Holdings Limited, Callable, 3.20%, 2028/07/31", "Canada (60.0%)", "CAD", "2000", "1900", "1980"),
+        ("Gamma Inc.", "United States (40.0%)", "USD", "50", "-500", "700"),
+        ("Cash (1.0%)", "Cash", "CAD", "40", "40", "40")
+    ]
+    assert {(r["date"], r["fund_name"]) for r in rows} == {("2025-06-30", "Example Equity Fund")}
+    assert parser.unparsed_count == 0
+
+
+def test_continued_page_keeps_the_sector_and_a_new_fund_resets_it():
+    rows, parser = parse(PAGE_HEADER + [
+        "Equities:",
+        "Canada (100.0%):",
+        "Alpha Corp. CAD 100 1,000 1,200",
+        "Example Equity Fund",
+        "Schedule of Investment Portfolio (cont'd)",
+        "June 30, 2025",
+        "Fair value",
+        "($)",
+        "Delta Ltd. CAD 10 100 110",
+        "Example Income Fund",
+        "Schedule of Investment Portfolio",
+        "June 30, 2025",
+        "Fair value",
+        "($)",
+        "Epsilon Ltd. CAD 20 200 220"
+    ])
+    assert [(r["fund_name"], r["sec_name"], r["sector"]) for r in rows] == [
+        ("Example Equity Fund", "Alpha Corp.", "Canada (100.0%)"),
+        ("Example Equity Fund", "Delta Ltd.", "Canada (100.0%)"),
+        ("Example Income Fund", "Epsilon Ltd.", "")
+    ]
+    assert parser.funds == {"Example Equity Fund", "Example Income Fund"}
+
+
+def test_unplaced_lines_are_reported():
+    rows, parser = parse([
+        "Schedule of Investment Portfolio",
+        "not a date"
+    ] + PAGE_HEADER[3:] + [
+        "Alpha Corp. CAD 100 1,000 1,200",
+        "Dangling issue name without values"
+    ])
+    assert rows == []
+    assert parser.unparsed == [
+        (1, "Schedule of Investment Portfolio without a fund name"),
+        (2, "expected a date: not a date"),
+        (11, "holding outside a fund schedule: Alpha Corp."),
+        (12, "Dangling issue name without values")
+    ]
+
+
+def test_statement_file():
+    with open(TEXT_FILE, encoding="utf-8-sig", newline="") as f:
+        rows, parser = parse(f)
+    assert len(rows) == 34
+    assert parser.funds == {"Pender Bond Universe Fund"}
+    assert parser.unparsed_count == 0
+    forward = [r for r in rows if r["sector"] == "Derivative liabilities"]
+    assert forward[0]["sec_name"].endswith("1.37 USD:CAD")
+    assert forward[0]["mv"] == "-1004212"
+
+
+@flow
+def run_convert(file_path, output_dir=None):
+    return ImportWebHoldWorkflow().convert_statement_text(file_path, output_dir)
+
+
+def test_conversion_is_staged_outside_incoming(tmp_path):
+    incoming = tmp_path / "incoming"
+    incoming.mkdir()
+    source = incoming / "holdweb-copypaste-20241231.txt"
+    shutil.copy(TEXT_FILE, source)
+
+    output_path = Path(run_convert(str(source)))
+    assert output_path == tmp_path.resolve() / "staging" / "holdweb-copypaste-20241231.csv"
+    assert [p.name for p in incoming.iterdir()] == [source.name]
+    with open(output_path, newline="") as f:
+        assert sum(1 for _ in csv.DictReader(f)) == 34